@@ -1,7 +1,17 @@
 from ._factories import (
     alembic_config_factory,
+    environments_factory,
+    ephemeral_db_uri_factory,
+    migrated_db_factory,
     new_db_factory,
+    temporary_db_uri_factory,
+    transaction_factory,
 )
+from .bisection import BisectResult, bisect_migrations
+from .graph import RevisionGraph
+from .pgcluster import EphemeralPostgres
+from .registry import EngineRegistry
+from .tempdb import TemporaryUris, get_temporary_uri
 from .util import (
     get_current_revision,
     get_head_revision,
@@ -12,7 +22,19 @@ from .util import (
 
 __all__ = [
     "alembic_config_factory",
+    "environments_factory",
+    "ephemeral_db_uri_factory",
+    "migrated_db_factory",
     "new_db_factory",
+    "temporary_db_uri_factory",
+    "transaction_factory",
+    "RevisionGraph",
+    "BisectResult",
+    "bisect_migrations",
+    "EngineRegistry",
+    "EphemeralPostgres",
+    "TemporaryUris",
+    "get_temporary_uri",
     "get_current_revision",
     "get_head_revision",
     "prepare_schema_from_migrations",
@@ -0,0 +1,85 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import make_url
+
+from alembicverify.fingerprint import environment_fingerprint, revision_fingerprints
+
+
+VERIFIED_CACHE_KEY = "alembicverify/verified"
+
+
+class VerificationCache:
+    """Remember which tests passed, and against which migration content.
+
+    Entries are stored in the pytest cache, keyed by test node id. The value is a hash of the
+    verified revision, its ancestry, the ``env.py`` file, the dialect and the source file of the
+    test, so a test is only skipped while none of those change.
+
+    This is an internal class and is not part of the public API.
+    """
+
+    def __init__(self, cache: pytest.Cache):
+        self._cache = cache
+        self._verified: dict[str, str] = cache.get(VERIFIED_CACHE_KEY, {})
+        self._changes: dict[str, str | None] = {}
+        self._fingerprints: dict[tuple[str, str], tuple[ScriptDirectory, dict[str, str], str]] = {}
+        self._sources: dict[str, str] = {}
+
+    def key(
+        self, config: Config, revision: str, test_path: str | os.PathLike[str] | None = None
+    ) -> str:
+        """Return the hash that identifies ``revision`` as configured in ``config``, as verified by
+        the tests of the file at ``test_path``."""
+        script_location = config.get_main_option("script_location") or ""
+        uri = config.get_main_option("sqlalchemy.url") or ""
+        # the environment only depends on the driver, and each test usually gets a new database
+        cache_key = (script_location, make_url(uri).drivername)
+
+        if cache_key not in self._fingerprints:
+            script = ScriptDirectory.from_config(config)
+            self._fingerprints[cache_key] = (
+                script,
+                revision_fingerprints(script),
+                environment_fingerprint(script, uri),
+            )
+        script, fingerprints, environment = self._fingerprints[cache_key]
+
+        script_revision = script.get_revision(revision)
+        if script_revision is None:
+            raise ValueError(f"Unknown revision {revision!r}")
+        digest = hashlib.sha256(fingerprints[script_revision.revision].encode())
+        digest.update(environment.encode())
+        if test_path is not None:
+            digest.update(self._source_fingerprint(test_path).encode())
+        return digest.hexdigest()
+
+    def _source_fingerprint(self, path: str | os.PathLike[str]) -> str:
+        path = os.fspath(path)
+        if path not in self._sources:
+            self._sources[path] = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+        return self._sources[path]
+
+    def is_verified(self, nodeid: str, key: str) -> bool:
+        return self._verified.get(nodeid) == key
+
+    def record(self, nodeid: str, key: str | None) -> None:
+        """Record a passed verification, or forget it when ``key`` is ``None``."""
+        self._changes[nodeid] = key
+
+    def save(self) -> None:
+        if not self._changes:
+            return
+        # re-read the cache so that concurrent workers don't drop each other's entries
+        verified: dict[str, str] = self._cache.get(VERIFIED_CACHE_KEY, {})
+        for nodeid, key in self._changes.items():
+            if key is None:
+                verified.pop(nodeid, None)
+            else:
+                verified[nodeid] = key
+        self._cache.set(VERIFIED_CACHE_KEY, verified)
+        self._changes.clear()
@@ -1,12 +1,29 @@
+import multiprocessing
 import warnings
-from collections.abc import Callable, Generator
-from contextlib import contextmanager
+from collections.abc import Callable, Generator, Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from os import PathLike
 from typing import Any
+from uuid import uuid4
 
+import pytest
+from alembic import command
 from alembic.config import Config
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy_utils import create_database, drop_database
 
-from alembicverify.util import make_alembic_config
+from alembicverify.baseline import BASELINE_ATTRIBUTE, upgrade_from_baseline
+from alembicverify.cloning import clone_migrated_database, strategy_for
+from alembicverify.durability import relaxed_durability
+from alembicverify.leaks import LeakTracker
+from alembicverify.pgcluster import EphemeralPostgres
+from alembicverify.registry import EngineRegistry
+from alembicverify.reusedb import ensure_migrated, reusable_uri
+from alembicverify.tempdb import TemporaryUris
+from alembicverify.util import config_from_ini
 
 
 def create_alembic_config_fixture_factory(
@@ -36,9 +53,14 @@ def create_alembic_config_fixture_factory(
 
             db_uri: str = request.getfixturevalue(alembic_db_uri_fixture_name)
             alembic_ini_location: str = request.getfixturevalue(alembic_ini_location_fixture_name)
-            config = Config(alembic_ini_location)
-            script_location: str | None = config.get_section_option("alembic", "script_location")
-            return make_alembic_config(db_uri, script_location or "")
+            revision = _reuse_revision(request)
+            if revision is not None:
+                db_uri = _reusable_uri(request, db_uri, alembic_ini_location, revision)
+            config = config_from_ini(db_uri, alembic_ini_location)
+            baseline = request.config.getoption("alembic_baseline", None)
+            if baseline:
+                config.attributes[BASELINE_ATTRIBUTE] = baseline
+            return config
 
         fixture.__name__ = fixture_kwargs["name"]
         return fixture
@@ -48,17 +70,40 @@ def create_alembic_config_fixture_factory(
 
 def create_db_fixture_factory(
     deprecated: bool = False,
-) -> Callable[..., Callable[[pytest.FixtureRequest], Generator[None, None, None]]]:
+) -> Callable[..., Callable[[pytest.FixtureRequest], Generator[str, None, None]]]:
     """Create a factory for creating database fixtures."""
 
     def factory(
-        alembic_db_uri_fixture_name: str = "alembic_db_uri", **fixture_kwargs: Any
-    ) -> Callable[[pytest.FixtureRequest], Generator[None, None, None]]:
-        """Create a database fixture."""
+        alembic_db_uri_fixture_name: str = "alembic_db_uri",
+        fast: bool | None = None,
+        alembic_ini_location_fixture_name: str = "alembic_ini_location",
+        **fixture_kwargs: Any,
+    ) -> Callable[[pytest.FixtureRequest], Generator[str, None, None]]:
+        """Create a database fixture, which yields the URI of the database.
+
+        With ``fast``, durability is relaxed on the new database to speed up migrations (see
+        :func:`~alembicverify.durability.relaxed_durability`). It defaults to the value of the
+        ``--alembic-fast-db`` option. Databases kept by ``--alembic-reuse-db`` are never relaxed.
+
+        With ``--alembic-reuse-db``, tests marked with ``alembic_db_revision`` get a database
+        already migrated to that revision, which is kept for the next runs (see
+        :func:`~alembicverify.reusedb.reusable_uri`). With ``--alembic-clone-db``, they get a new
+        database copied from a template migrated to that revision instead (see
+        :func:`~alembicverify.cloning.clone_migrated_database`). With ``--alembic-baseline``,
+        they get a new database loaded from the baseline and migrated to that revision (see
+        :func:`~alembicverify.baseline.upgrade_from_baseline`).
+
+        The engines of the ``alembic_engine_registry`` fixture for the database, when the test
+        uses it, are released before the database is dropped.
+
+        With ``--alembic-detect-leaks``, the connections to the database still open at the end
+        of the test are reported, as warnings or as errors (see
+        :class:`~alembicverify.leaks.LeakTracker`).
+        """
         fixture_kwargs.setdefault("name", "new_db")
 
         @pytest.fixture(**fixture_kwargs)
-        def fixture(request: pytest.FixtureRequest) -> Generator[None, None, None]:
+        def fixture(request: pytest.FixtureRequest) -> Generator[str, None, None]:
             """Create a new database."""
 
             if deprecated:
@@ -70,8 +115,214 @@ def create_db_fixture_factory(
                 )
 
             db_uri: str = request.getfixturevalue(alembic_db_uri_fixture_name)
-            with _new_db(db_uri):
-                yield
+            fast_db = request.config.getoption("alembic_fast_db", False) if fast is None else fast
+            unlogged_tables = request.config.getoption("alembic_unlogged_tables", False)
+            revision = _reuse_revision(request)
+            if revision is not None:
+                alembic_ini_location: str = request.getfixturevalue(
+                    alembic_ini_location_fixture_name
+                )
+                db_uri = _reusable_uri(request, db_uri, alembic_ini_location, revision)
+                new_db = _reused_db(db_uri, alembic_ini_location, revision)
+            else:
+                detect_leaks = request.config.getoption("alembic_detect_leaks", None)
+                create: Callable[[str], Any] = create_database
+                clone_revision = _marked_revision(request, "alembic_clone_db")
+                baseline_revision = _marked_revision(request, "alembic_baseline")
+                if clone_revision is not None:
+                    strategy = strategy_for(db_uri)
+                    request.node.user_properties.append(("alembic_clone_db", strategy.name))
+                    create = partial(
+                        clone_migrated_database,
+                        alembic_ini_location=request.getfixturevalue(
+                            alembic_ini_location_fixture_name
+                        ),
+                        revision=clone_revision,
+                        strategy=strategy,
+                        worker_id=_worker_id(request),
+                    )
+                elif baseline_revision is not None:
+                    create = partial(
+                        _baseline_db,
+                        alembic_ini_location=request.getfixturevalue(
+                            alembic_ini_location_fixture_name
+                        ),
+                        directory=request.config.getoption("alembic_baseline"),
+                        revision=baseline_revision,
+                    )
+                new_db = _new_db(db_uri, fast_db, unlogged_tables, detect_leaks, create)
+
+            with new_db as (settings, reused):
+                if settings:
+                    applied = ", ".join(f"{name}={value}" for name, value in settings.items())
+                    request.node.user_properties.append(("alembic_fast_db", applied))
+                if revision is not None:
+                    state = "reused" if reused else "created"
+                    request.node.user_properties.append(("alembic_reuse_db", state))
+                yield db_uri
+                # pooled connections of the registry would keep the database from being dropped,
+                # and be reported as leaks
+                if "alembic_engine_registry" in request.fixturenames:
+                    registry: EngineRegistry = request.getfixturevalue("alembic_engine_registry")
+                    registry.release(db_uri)
+
+        fixture.__name__ = fixture_kwargs["name"]
+        return fixture
+
+    return factory
+
+
+def create_environments_fixture_factory() -> Callable[
+    ..., Callable[[pytest.FixtureRequest], Generator[dict[str, Engine], None, None]]
+]:
+    """Create a factory for creating fixtures that provision several alembic environments."""
+
+    def factory(
+        alembic_environments_fixture_name: str = "alembic_environments",
+        revision: str = "head",
+        max_workers: int | None = None,
+        **fixture_kwargs: Any,
+    ) -> Callable[[pytest.FixtureRequest], Generator[dict[str, Engine], None, None]]:
+        """Create a fixture that provisions several alembic environments concurrently.
+
+        The ``alembic_environments_fixture_name`` fixture must return a mapping of names to
+        ``(db_uri, alembic_ini_location)`` pairs. The fixture yields a mapping of the same names
+        to engines bound to the migrated databases.
+        """
+        fixture_kwargs.setdefault("name", "alembic_engines")
+
+        @pytest.fixture(**fixture_kwargs)
+        def fixture(request: pytest.FixtureRequest) -> Generator[dict[str, Engine], None, None]:
+            """Create and migrate a new database for each environment."""
+            environments: Mapping[str, tuple[str, str | PathLike[str]]] = request.getfixturevalue(
+                alembic_environments_fixture_name
+            )
+            with _new_environments(environments, revision, max_workers) as engines:
+                yield engines
+
+        fixture.__name__ = fixture_kwargs["name"]
+        return fixture
+
+    return factory
+
+
+def create_ephemeral_db_uri_fixture_factory() -> Callable[
+    ..., Callable[[pytest.FixtureRequest], str]
+]:
+    """Create a factory for creating fixtures of temporary database URIs on a private cluster."""
+
+    def factory(
+        cluster_fixture_name: str = "alembic_postgres_cluster", **fixture_kwargs: Any
+    ) -> Callable[[pytest.FixtureRequest], str]:
+        """Create a fixture that returns the URI of a new temporary database on the cluster."""
+        fixture_kwargs.setdefault("name", "alembic_db_uri")
+
+        @pytest.fixture(**fixture_kwargs)
+        def fixture(request: pytest.FixtureRequest) -> str:
+            """Return the URI of a new temporary database on the cluster."""
+            cluster: EphemeralPostgres = request.getfixturevalue(cluster_fixture_name)
+            return cluster.database_uri(f"temp_{uuid4().hex}")
+
+        fixture.__name__ = fixture_kwargs["name"]
+        return fixture
+
+    return factory
+
+
+def create_temporary_db_uri_fixture_factory() -> Callable[
+    ..., Callable[[pytest.FixtureRequest], str]
+]:
+    """Create a factory for creating fixtures of temporary database URIs on configured servers."""
+
+    def factory(
+        temporary_uris_fixture_name: str = "alembic_temporary_uris", **fixture_kwargs: Any
+    ) -> Callable[[pytest.FixtureRequest], str]:
+        """Create a fixture that returns the URI of a new temporary database.
+
+        Names are derived from the test run and the xdist worker, and databases are spread
+        round-robin over the configured servers (see :class:`~alembicverify.tempdb.TemporaryUris`).
+        """
+        fixture_kwargs.setdefault("name", "alembic_db_uri")
+
+        @pytest.fixture(**fixture_kwargs)
+        def fixture(request: pytest.FixtureRequest) -> str:
+            """Return the URI of a new temporary database."""
+            temporary_uris: TemporaryUris = request.getfixturevalue(temporary_uris_fixture_name)
+            return temporary_uris()
+
+        fixture.__name__ = fixture_kwargs["name"]
+        return fixture
+
+    return factory
+
+
+def create_migrated_db_fixture_factory() -> Callable[
+    ..., Callable[[pytest.FixtureRequest], Generator[Engine, None, None]]
+]:
+    """Create a factory for creating fixtures of databases migrated once per module or session."""
+
+    def factory(
+        alembic_db_uri_fixture_name: str = "alembic_migrated_db_uri",
+        alembic_ini_location_fixture_name: str = "alembic_ini_location",
+        revision: str = "head",
+        **fixture_kwargs: Any,
+    ) -> Callable[[pytest.FixtureRequest], Generator[Engine, None, None]]:
+        """Create a fixture that creates a database and migrates it to ``revision``.
+
+        The fixture is module-scoped unless another ``scope`` is given, and yields an engine
+        bound to the database, which is dropped at the end of the scope. The URI and ini location
+        fixtures must have the same scope or a broader one. Use it with the fixtures of
+        ``transaction_factory`` to roll back what each test does.
+        """
+        fixture_kwargs.setdefault("name", "alembic_migrated_db")
+        fixture_kwargs.setdefault("scope", "module")
+
+        @pytest.fixture(**fixture_kwargs)
+        def fixture(request: pytest.FixtureRequest) -> Generator[Engine, None, None]:
+            """Create a database migrated to the revision."""
+            db_uri: str = request.getfixturevalue(alembic_db_uri_fixture_name)
+            alembic_ini_location: str = request.getfixturevalue(alembic_ini_location_fixture_name)
+            _provision_environment(db_uri, str(alembic_ini_location), revision)
+            engine = _savepoint_engine(db_uri)
+            try:
+                yield engine
+            finally:
+                engine.dispose()
+                drop_database(db_uri)
+
+        fixture.__name__ = fixture_kwargs["name"]
+        return fixture
+
+    return factory
+
+
+def create_transaction_fixture_factory() -> Callable[
+    ..., Callable[[pytest.FixtureRequest], Generator[Connection, None, None]]
+]:
+    """Create a factory for creating fixtures of connections rolled back after each test."""
+
+    def factory(
+        migrated_db_fixture_name: str = "alembic_migrated_db", **fixture_kwargs: Any
+    ) -> Callable[[pytest.FixtureRequest], Generator[Connection, None, None]]:
+        """Create a fixture that yields a connection to the migrated database in a transaction.
+
+        The transaction is rolled back after the test. Sessions created from the connection with
+        :func:`~alembicverify.util.session_for_engine` join it through a SAVEPOINT, so tests can
+        commit them.
+        """
+        fixture_kwargs.setdefault("name", "alembic_connection")
+
+        @pytest.fixture(**fixture_kwargs)
+        def fixture(request: pytest.FixtureRequest) -> Generator[Connection, None, None]:
+            """Begin a transaction on the migrated database, and roll it back after the test."""
+            engine: Engine = request.getfixturevalue(migrated_db_fixture_name)
+            with engine.connect() as connection:
+                transaction = connection.begin()
+                try:
+                    yield connection
+                finally:
+                    if transaction.is_active:
+                        transaction.rollback()
 
         fixture.__name__ = fixture_kwargs["name"]
         return fixture
@@ -80,11 +331,134 @@ def create_db_fixture_factory(
 
 
 @contextmanager
-def _new_db(db_uri: str) -> Generator[None, None, None]:
-    create_database(db_uri)
-    yield
+def _new_db(
+    db_uri: str,
+    fast: bool = False,
+    unlogged_tables: bool = False,
+    detect_leaks: str | None = None,
+    create: Callable[[str], Any] = create_database,
+) -> Generator[tuple[dict[str, str], bool], None, None]:
+    create(db_uri)
+    tracker = LeakTracker(db_uri) if detect_leaks else None
+    with relaxed_durability(db_uri, unlogged_tables) if fast else nullcontext({}) as settings:
+        with tracker or nullcontext():
+            yield settings, False
+    leaks = []
+    if tracker is not None:
+        leaks = tracker.leaks()
+        # leaked connections would make dropping the database hang
+        tracker.close()
     drop_database(db_uri)
 
+    if leaks:
+        message = f"{len(leaks)} connection leaks on {db_uri}:\n" + "\n".join(map(str, leaks))
+        if detect_leaks == "fail":
+            pytest.fail(message, pytrace=False)
+        warnings.warn(message, stacklevel=2)
+
+
+@contextmanager
+def _reused_db(
+    db_uri: str, alembic_ini_location: str, revision: str
+) -> Generator[tuple[dict[str, str], bool], None, None]:
+    # unlike _new_db, the database is left behind for the next runs, so its durability is never
+    # relaxed: a crash would lose the data of unlogged tables without changing its revision
+    reused = ensure_migrated(db_uri, config_from_ini(db_uri, alembic_ini_location), revision)
+    yield {}, reused
+
+
+def _reuse_revision(request: pytest.FixtureRequest) -> str | None:
+    return _marked_revision(request, "alembic_reuse_db")
+
+
+def _marked_revision(request: pytest.FixtureRequest, option: str) -> str | None:
+    if not request.config.getoption(option, False):
+        return None
+    marker = request.node.get_closest_marker("alembic_db_revision")
+    return marker.args[0] if marker is not None else None
+
+
+def _worker_id(request: pytest.FixtureRequest) -> str:
+    return getattr(request.config, "workerinput", {}).get("workerid", "main")
+
+
+def _reusable_uri(
+    request: pytest.FixtureRequest, db_uri: str, alembic_ini_location: str, revision: str
+) -> str:
+    config = config_from_ini(db_uri, alembic_ini_location)
+    return reusable_uri(db_uri, config, revision, _worker_id(request))
+
+
+@contextmanager
+def _new_environments(
+    environments: Mapping[str, tuple[str, str | PathLike[str]]],
+    revision: str,
+    max_workers: int | None,
+) -> Generator[dict[str, Engine], None, None]:
+    # alembic installs the migration context in module-level proxies, so migrations running in
+    # the same process would step on each other: each environment is migrated in a subprocess
+    with _migration_executor(max_workers or len(environments) or 1) as executor:
+        futures = {
+            name: executor.submit(_provision_environment, db_uri, str(ini_location), revision)
+            for name, (db_uri, ini_location) in environments.items()
+        }
+        wait(futures.values())
+
+    provisioned = [environments[name][0] for name, f in futures.items() if f.exception() is None]
+    try:
+        for future in futures.values():
+            future.result()
+        engines = {name: create_engine(db_uri) for name, (db_uri, _) in environments.items()}
+        try:
+            yield engines
+        finally:
+            for engine in engines.values():
+                engine.dispose()
+    finally:
+        with ThreadPoolExecutor(max_workers=max_workers or len(provisioned) or 1) as executor:
+            list(executor.map(drop_database, provisioned))
+
+
+def _migration_executor(max_workers: int) -> Executor:
+    return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _savepoint_engine(db_uri: str) -> Engine:
+    engine = create_engine(db_uri)
+    if engine.dialect.name == "sqlite":
+        # pysqlite begins transactions lazily, which breaks SAVEPOINTs: let SQLAlchemy begin them
+        event.listen(engine, "connect", _disable_pysqlite_transactions)
+        event.listen(engine, "begin", _begin_sqlite_transaction)
+    return engine
+
+
+def _disable_pysqlite_transactions(dbapi_connection: Any, connection_record: Any) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def _begin_sqlite_transaction(connection: Connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+def _baseline_db(db_uri: str, alembic_ini_location: str, directory: str, revision: str) -> None:
+    create_database(db_uri)
+    try:
+        upgrade_from_baseline(
+            db_uri, config_from_ini(db_uri, alembic_ini_location), directory, revision
+        )
+    except BaseException:
+        drop_database(db_uri)
+        raise
+
+
+def _provision_environment(db_uri: str, alembic_ini_location: str, revision: str) -> None:
+    create_database(db_uri)
+    try:
+        command.upgrade(config_from_ini(db_uri, alembic_ini_location), revision)
+    except BaseException:
+        drop_database(db_uri)
+        raise
+
 
 ## FIXTURE FACTORIES
 
@@ -93,3 +467,12 @@ alembic_config_deprecated_factory = create_alembic_config_fixture_factory(deprec
 
 new_db_factory = create_db_fixture_factory()
 new_db_deprecated_factory = create_db_fixture_factory(deprecated=True)
+
+environments_factory = create_environments_fixture_factory()
+
+ephemeral_db_uri_factory = create_ephemeral_db_uri_fixture_factory()
+
+temporary_db_uri_factory = create_temporary_db_uri_fixture_factory()
+
+migrated_db_factory = create_migrated_db_fixture_factory()
+transaction_factory = create_transaction_fixture_factory()
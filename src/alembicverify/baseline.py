@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import subprocess
+import warnings
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, pool
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy_utils import create_database, drop_database
+
+from alembicverify.fingerprint import revision_fingerprints
+from alembicverify.graph import RevisionGraph
+
+
+# the key of the baseline directory in the attributes of an alembic config
+BASELINE_ATTRIBUTE = "alembic_verify_baseline"
+
+
+class SchemaDumper(ABC):
+    """A way of dumping a database to SQL, schema and rows, and of loading the dump."""
+
+    @abstractmethod
+    def dump(self, uri: str) -> str:
+        """Dump the database at ``uri``."""
+
+    @abstractmethod
+    def load(self, uri: str, sql: str) -> None:
+        """Load a dump into the empty database at ``uri``."""
+
+
+class PostgresDumper(SchemaDumper):
+    """Dump with ``pg_dump``, and load with ``psql``, in a single transaction.
+
+    The password is passed to them in ``PGPASSWORD``.
+    """
+
+    def __init__(self, pg_dump: str = "pg_dump", psql: str = "psql") -> None:
+        self.pg_dump = pg_dump
+        self.psql = psql
+
+    def dump(self, uri: str) -> str:
+        return _run(*_postgres_command(self.pg_dump, uri, ["--no-owner", "--no-privileges"]))
+
+    def load(self, uri: str, sql: str) -> None:
+        options = ["--quiet", "--no-psqlrc", "--single-transaction", "--set", "ON_ERROR_STOP=1"]
+        _run(*_postgres_command(self.psql, uri, options), input=sql)
+
+
+class MySQLDumper(SchemaDumper):
+    """Dump with ``mysqldump``, triggers and stored routines included, and load with ``mysql``."""
+
+    def __init__(self, mysqldump: str = "mysqldump", mysql: str = "mysql") -> None:
+        self.mysqldump = mysqldump
+        self.mysql = mysql
+
+    def dump(self, uri: str) -> str:
+        options = ["--routines", "--triggers", "--single-transaction", "--skip-comments"]
+        return _run(*_mysql_command(self.mysqldump, uri, options))
+
+    def load(self, uri: str, sql: str) -> None:
+        _run(*_mysql_command(self.mysql, uri), input=sql)
+
+
+class SQLiteDumper(SchemaDumper):
+    """Dump with the ``iterdump`` of the ``sqlite3`` module."""
+
+    def dump(self, uri: str) -> str:
+        connection = sqlite3.connect(make_url(uri).database or "")
+        try:
+            return "\n".join(connection.iterdump()) + "\n"
+        finally:
+            connection.close()
+
+    def load(self, uri: str, sql: str) -> None:
+        connection = sqlite3.connect(make_url(uri).database or "")
+        try:
+            connection.executescript(sql)
+        finally:
+            connection.close()
+
+
+DUMPERS: dict[str, SchemaDumper] = {
+    "postgresql": PostgresDumper(),
+    "mysql": MySQLDumper(),
+    "mariadb": MySQLDumper(),
+    "sqlite": SQLiteDumper(),
+}
+
+
+def dumper_for(uri: str) -> SchemaDumper | None:
+    """Return the dumper of :data:`DUMPERS` for the backend of ``uri``, if there is one.
+
+    Register a dumper for another backend, or replace one, by setting it in :data:`DUMPERS`.
+    """
+    return DUMPERS.get(make_url(uri).get_backend_name())
+
+
+@dataclass(frozen=True)
+class Baseline:
+    """A dump of a database migrated to ``revision``, recorded by :func:`record_baseline`.
+
+    ``fingerprint`` is the content hash of the revision and its ancestry when it was recorded
+    (see :func:`~alembicverify.fingerprint.revision_fingerprints`).
+    """
+
+    revision: str
+    fingerprint: str
+    path: Path
+
+
+def record_baseline(
+    uri: str, config: Config, revision: str, directory: str | os.PathLike[str]
+) -> Baseline:
+    """Record a baseline of the migrations of ``config`` at ``revision`` in ``directory``.
+
+    The database at ``uri`` is created, migrated to ``revision``, dumped and dropped. The dump
+    holds the schema, the rows inserted by the migrations and the ``alembic_version`` stamp.
+    Each backend has a baseline of its own in ``directory``: ``<backend>.sql`` holds the dump,
+    and ``<backend>.json`` its revision and fingerprint. ``config`` must point to ``uri``.
+    """
+    dumper = dumper_for(uri)
+    if dumper is None:
+        raise ValueError(f"No dumper for the {make_url(uri).get_backend_name()} backend")
+    script = ScriptDirectory.from_config(config)
+    script_revision = script.get_revision(revision)
+    if script_revision is None:
+        raise ValueError(f"Unknown revision {revision!r}")
+
+    create_database(uri)
+    try:
+        command.upgrade(config, script_revision.revision)
+        sql = dumper.dump(uri)
+    finally:
+        drop_database(uri)
+
+    path, info_path = _baseline_paths(directory, uri)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fingerprint = revision_fingerprints(script)[script_revision.revision]
+    path.write_text(sql)
+    info = {"revision": script_revision.revision, "fingerprint": fingerprint}
+    info_path.write_text(json.dumps(info, indent=2) + "\n")
+    return Baseline(script_revision.revision, fingerprint, path)
+
+
+def read_baseline(directory: str | os.PathLike[str], uri: str) -> Baseline | None:
+    """Return the baseline of ``directory`` for the backend of ``uri``, if there is one."""
+    path, info_path = _baseline_paths(directory, uri)
+    if not info_path.exists():
+        return None
+    info = json.loads(info_path.read_text())
+    return Baseline(info["revision"], info["fingerprint"], path)
+
+
+def load_baseline(
+    uri: str, config: Config, directory: str | os.PathLike[str], revision: str = "heads"
+) -> Baseline | None:
+    """Load the baseline of ``directory`` into the database at ``uri``, to migrate to ``revision``.
+
+    The baseline is loaded only when the database has no tables and the baseline revision is
+    ``revision`` or one of its ancestors, and it is returned. Otherwise, and when the baseline is
+    out of date, because the file of its revision or of one of their ancestors changed since it
+    was recorded, nothing is loaded and ``None`` is returned. Out of date baselines are warned
+    about, to be recorded again.
+    """
+    dumper = dumper_for(uri)
+    baseline = read_baseline(directory, uri)
+    if dumper is None or baseline is None:
+        return None
+
+    script = ScriptDirectory.from_config(config)
+    graph = RevisionGraph.from_script(script)
+    if (
+        baseline.revision not in graph
+        or revision_fingerprints(script, graph)[baseline.revision] != baseline.fingerprint
+    ):
+        warnings.warn(
+            f"The baseline {baseline.path} is out of date: revision {baseline.revision} or one "
+            "of its ancestors changed since it was recorded. Record it again to use it.",
+            stacklevel=2,
+        )
+        return None
+
+    targets = [script_revision.revision for script_revision in script.get_revisions(revision)]
+    if not any(
+        target == baseline.revision or graph.is_ancestor(baseline.revision, target)
+        for target in targets
+    ):
+        return None
+    if not _is_empty(uri):
+        return None
+
+    dumper.load(uri, baseline.path.read_text())
+    return baseline
+
+
+def upgrade_from_baseline(
+    uri: str, config: Config, directory: str | os.PathLike[str], revision: str = "heads"
+) -> Baseline | None:
+    """Migrate the database at ``uri`` to ``revision``, starting from the baseline of
+    ``directory`` when it can be loaded (see :func:`load_baseline`), and return the baseline."""
+    baseline = load_baseline(uri, config, directory, revision)
+    command.upgrade(config, revision)
+    return baseline
+
+
+def _baseline_paths(directory: str | os.PathLike[str], uri: str) -> tuple[Path, Path]:
+    backend = make_url(uri).get_backend_name()
+    return Path(directory) / f"{backend}.sql", Path(directory) / f"{backend}.json"
+
+
+def _is_empty(uri: str) -> bool:
+    engine = create_engine(uri, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as conn:
+            return not inspect(conn).get_table_names()
+    finally:
+        engine.dispose()
+
+
+def _postgres_command(
+    executable: str, uri: str, options: list[str]
+) -> tuple[list[str], dict[str, str]]:
+    url = make_url(uri)
+    libpq_uri = URL.create(
+        "postgresql", url.username, None, url.host, url.port, url.database, url.query
+    ).render_as_string()
+    # the password is passed in the environment, out of sight of ps
+    env = dict(os.environ)
+    if url.password is not None:
+        env["PGPASSWORD"] = str(url.password)
+    return [executable, *options, "--dbname", libpq_uri], env
+
+
+def _mysql_command(
+    executable: str, uri: str, options: list[str] | None = None
+) -> tuple[list[str], dict[str, str]]:
+    url = make_url(uri)
+    args = [executable, *(options or [])]
+    if url.host:
+        args.append(f"--host={url.host}")
+    if url.port:
+        args.append(f"--port={url.port}")
+    if url.username:
+        args.append(f"--user={url.username}")
+    args.append(url.database or "")
+    # the password is passed in the environment, out of sight of ps
+    env = dict(os.environ)
+    if url.password is not None:
+        env["MYSQL_PWD"] = str(url.password)
+    return args, env
+
+
+def _run(args: list[str], env: dict[str, str] | None = None, input: str | None = None) -> str:
+    result = subprocess.run(args, input=input, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{args[0]} failed with exit code {result.returncode}: {result.stderr.strip()}"
+        )
+    return result.stdout
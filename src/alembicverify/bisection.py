@@ -0,0 +1,116 @@
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from itertools import pairwise
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Engine
+from sqlalchemy_utils import create_database, drop_database
+
+from alembicverify.graph import RevisionGraph
+from alembicverify.registry import EngineRegistry
+from alembicverify.util import prepare_schema_from_migrations
+
+
+@dataclass(frozen=True)
+class BisectResult:
+    """The outcome of :func:`bisect_migrations`.
+
+    ``last_good`` is ``None`` when the first revision after ``good`` is already bad and ``good``
+    is the empty database. ``probes`` lists the revisions checked, in order, with their outcome.
+    """
+
+    first_bad: str
+    last_good: str | None
+    probes: tuple[tuple[str, bool], ...] = field(default_factory=tuple)
+
+
+def bisect_migrations(
+    uri: str,
+    config: Config,
+    check: Callable[[Engine], bool | None],
+    good: str | None = "base",
+    bad: str = "head",
+    downgrade: bool = False,
+    registry: EngineRegistry | None = None,
+) -> BisectResult:
+    """Find the first revision between ``good`` and ``bad`` for which ``check`` fails.
+
+    ``check`` is called with an engine bound to the database migrated to the probed revision. A
+    revision is bad when the check returns ``False`` or raises ``AssertionError``: any other
+    exception stops the search. ``good`` is assumed to pass and ``bad`` to fail. ``good`` must be
+    an ancestor of ``bad``, and the revisions between them must form a linear path.
+
+    The database at ``uri`` is created, moved from probe to probe, and dropped at the end. When
+    a probe is older than the current state, the database is rebuilt from scratch, or with
+    ``downgrade``, downgraded to it. Finding the culprit in a path of ``n`` revisions takes
+    about ``log2(n)`` checks.
+    """
+    script = ScriptDirectory.from_config(config)
+    graph = RevisionGraph.from_script(script)
+    good_revision = _resolve(script, good)
+    bad_revision = _resolve(script, bad)
+    if bad_revision is None:
+        raise ValueError("The bad revision can't be the empty database")
+
+    if good_revision is not None and not graph.is_ancestor(good_revision, bad_revision):
+        raise ValueError(f"{good!r} is not an ancestor of {bad!r}")
+    path = graph.upgrade_path(good_revision, bad_revision)
+    for earlier, later in pairwise(path):
+        if not graph.is_ancestor(earlier, later):
+            raise ValueError(f"The revisions between {good!r} and {bad!r} are not linear")
+
+    own_registry = registry is None
+    registry = registry or EngineRegistry()
+    current: str | None = None
+    probes: list[tuple[str, bool]] = []
+    # path[lo] is known to be good (or lo is -1, for good itself) and path[hi] known to be bad
+    lo, hi = -1, len(path) - 1
+    create_database(uri)
+    try:
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            target = path[mid]
+            if current is not None and not graph.is_ancestor(current, target):
+                if downgrade:
+                    command.downgrade(config, target)
+                    current = target
+                else:
+                    registry.release(uri)
+                    drop_database(uri)
+                    create_database(uri)
+                    current = None
+            if current != target:
+                prepare_schema_from_migrations(uri, config, target, registry=registry)
+                current = target
+
+            passed = _passes(check, registry.get_engine(uri))
+            probes.append((target, passed))
+            if passed:
+                lo = mid
+            else:
+                hi = mid
+    finally:
+        registry.release(uri)
+        if own_registry:
+            registry.dispose()
+        drop_database(uri)
+
+    return BisectResult(
+        first_bad=path[hi], last_good=path[lo] if lo >= 0 else good_revision, probes=tuple(probes)
+    )
+
+
+def _resolve(script: ScriptDirectory, revision: str | None) -> str | None:
+    if revision is None or revision == "base":
+        return None
+    resolved = script.get_revision(revision)
+    return resolved.revision if resolved is not None else None
+
+
+def _passes(check: Callable[[Engine], bool | None], engine: Engine) -> bool:
+    try:
+        return check(engine) is not False
+    except AssertionError:
+        return False
@@ -0,0 +1,171 @@
+import hashlib
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import MetaData, Table, func, literal_column, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from alembicverify.util import session_for_engine
+
+
+_MODULUS = 2**64
+
+
+@dataclass(frozen=True)
+class TableChecksum:
+    """The checksum of the content of a table.
+
+    Each column checksum is an order independent hash of the ``(primary key, value)`` pairs of
+    the column, so values are tied to their rows but no sorting is needed to compute it.
+    Checksums computed with different methods are not comparable with each other.
+    """
+
+    table: str
+    row_count: int
+    columns: dict[str, str] = field(default_factory=dict)
+    method: str = "client"
+
+
+def table_checksums(
+    engine: Engine,
+    tables: Iterable[str] | None = None,
+    *,
+    schema: str | None = None,
+    exclude: Iterable[str] = ("alembic_version",),
+    chunk_size: int = 10_000,
+    method: str = "auto",
+) -> dict[str, TableChecksum]:
+    """Compute a checksum of every column of every table, over all rows.
+
+    Memory stays constant regardless of the size of the tables: with the ``"client"`` method
+    rows are streamed with a server-side cursor and hashed ``chunk_size`` rows at a time, while
+    with the ``"server"`` method (PostgreSQL only) hashes are aggregated by the database. The
+    default, ``"auto"``, uses the server method where it is supported.
+    """
+    if method == "auto":
+        method = "server" if engine.dialect.name == "postgresql" else "client"
+    if method not in ("client", "server"):
+        raise ValueError(f"Unknown checksum method {method!r}")
+    if method == "server" and engine.dialect.name != "postgresql":
+        raise ValueError(f"Server-side checksums are not supported on {engine.dialect.name}")
+
+    metadata = MetaData()
+    metadata.reflect(bind=engine, schema=schema, only=list(tables) if tables is not None else None)
+    excluded = set(exclude)
+
+    checksums = {}
+    with session_for_engine(engine) as session:
+        for table in metadata.sorted_tables:
+            if table.name in excluded:
+                continue
+            if method == "server":
+                checksums[table.name] = _server_checksum(session, table)
+            else:
+                checksums[table.name] = _client_checksum(session, table, chunk_size)
+    return checksums
+
+
+def diff_checksums(
+    before: dict[str, TableChecksum], after: dict[str, TableChecksum]
+) -> dict[str, list[str]]:
+    """Compare two sets of checksums, returning the differences found in each table.
+
+    Only the columns present in both sets are compared, so columns added or dropped by the
+    migrations under test don't show up as differences.
+    """
+    differences: dict[str, list[str]] = {}
+    for name in sorted(before.keys() | after.keys()):
+        if name not in after:
+            differences[name] = ["table is missing after"]
+            continue
+        if name not in before:
+            differences[name] = ["table is missing before"]
+            continue
+
+        left, right = before[name], after[name]
+        if left.method != right.method:
+            raise ValueError(
+                f"Checksums of {name!r} were computed with different methods: "
+                f"{left.method!r} and {right.method!r}"
+            )
+
+        problems = []
+        if left.row_count != right.row_count:
+            problems.append(f"row count changed from {left.row_count} to {right.row_count}")
+        for column in sorted(left.columns.keys() & right.columns.keys()):
+            if left.columns[column] != right.columns[column]:
+                problems.append(f"column {column!r} changed")
+        if problems:
+            differences[name] = problems
+    return differences
+
+
+def _client_checksum(session: Session, table: Table, chunk_size: int) -> TableChecksum:
+    key_columns = list(table.primary_key.columns)
+    key_count = len(key_columns)
+    columns = list(table.columns)
+    sums = [0] * len(columns)
+    row_count = 0
+
+    result = session.execute(
+        select(*key_columns, *columns), execution_options={"stream_results": True}
+    )
+    for rows in result.partitions(chunk_size):
+        row_count += len(rows)
+        for row in rows:
+            key = _encode(tuple(row[:key_count]))
+            for i, value in enumerate(row[key_count:]):
+                sums[i] = (sums[i] + _hash(key + b"\x1f" + _encode(value))) % _MODULUS
+
+    return TableChecksum(
+        table=table.name,
+        row_count=row_count,
+        columns={column.name: f"{total:016x}" for column, total in zip(columns, sums, strict=True)},
+        method="client",
+    )
+
+
+def _server_checksum(session: Session, table: Table) -> TableChecksum:
+    quote = session.get_bind().dialect.identifier_preparer.quote
+    keys = [quote(column.name) for column in table.primary_key.columns]
+
+    aggregates = [func.count()]
+    for column in table.columns:
+        row = ", ".join([*keys, quote(column.name)])
+        aggregates.append(
+            func.coalesce(
+                func.sum(
+                    literal_column(
+                        f"('x' || substr(md5(CAST(ROW({row}) AS text)), 1, 16))::bit(64)::bigint"
+                    )
+                ),
+                0,
+            )
+        )
+
+    row_count, *sums = session.execute(select(*aggregates).select_from(table)).one()
+    return TableChecksum(
+        table=table.name,
+        row_count=row_count,
+        columns={
+            column.name: f"{int(total) % _MODULUS:016x}"
+            for column, total in zip(table.columns, sums, strict=True)
+        },
+        method="server",
+    )
+
+
+def _encode(value: Any) -> bytes:
+    if value is None:
+        return b"\x00"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return b"\x01" + bytes(value)
+    if isinstance(value, tuple):
+        return b"\x1e".join(_encode(item) for item in value)
+    return b"\x02" + str(value).encode()
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
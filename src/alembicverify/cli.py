@@ -0,0 +1,410 @@
+import argparse
+import importlib
+import os
+import sys
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from alembic.config import Config
+from sqlalchemy.engine import make_url
+
+from alembicverify.baseline import record_baseline
+from alembicverify.bisection import bisect_migrations
+from alembicverify.jobqueue import JobQueue, run_worker, wait_for_results
+from alembicverify.lint import lint_golden_files, lint_migrations
+from alembicverify.loading import profile_imports
+from alembicverify.offline import diff_golden_files, render_migrations, write_golden_files
+from alembicverify.runner import (
+    CHECKS,
+    CheckResult,
+    verify_migrations,
+    write_json,
+    write_junit_xml,
+)
+from alembicverify.tempdb import get_temporary_uri
+from alembicverify.util import config_from_ini
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run the ``alembic-verify`` command line tool."""
+    parser = _parser()
+    args = parser.parse_args(argv)
+    return args.command(parser, args)
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="alembic-verify", description="Verify alembic migrations."
+    )
+    subparsers = parser.add_subparsers(required=True, metavar="COMMAND")
+
+    bisect = subparsers.add_parser(
+        "bisect",
+        help="Find the first revision that fails a check.",
+        description="Binary search the revisions between --good and --bad for the first one "
+        "that fails the check. The check is called with an engine bound to a temporary "
+        "database migrated to the probed revision, and fails by returning False or raising "
+        "AssertionError.",
+    )
+    _add_config_argument(bisect)
+    bisect.add_argument(
+        "--db-uri",
+        help="The temporary database to use. Defaults to a temp_ database on the server of the "
+        "sqlalchemy.url of the ini file.",
+    )
+    bisect.add_argument(
+        "--check", required=True, metavar="MODULE:FUNCTION", help="The check to run."
+    )
+    bisect.add_argument("--good", default="base", help="A revision that passes the check.")
+    bisect.add_argument("--bad", default="head", help="A revision that fails the check.")
+    bisect.add_argument(
+        "--downgrade",
+        action="store_true",
+        help="Step back to earlier revisions by downgrading, rather than by rebuilding the "
+        "database.",
+    )
+    bisect.set_defaults(command=_bisect)
+
+    run = subparsers.add_parser(
+        "run",
+        help="Run verification checks on the migrations.",
+        description="Run verification checks on the migrations, each on its own temporary "
+        "database, and exit with a non-zero status if any of them does not pass.",
+    )
+    _add_config_argument(run)
+    run.add_argument(
+        "--server-uri",
+        help="The server to create the temporary databases on. Defaults to the sqlalchemy.url "
+        "of the ini file.",
+    )
+    run.add_argument(
+        "--check",
+        action="append",
+        choices=CHECKS,
+        dest="checks",
+        help="A check to run. Repeat the option to run several checks. Defaults to all of them.",
+    )
+    run.add_argument(
+        "-j", "--jobs", type=int, default=1, help="The number of checks to run in parallel."
+    )
+    subset = run.add_mutually_exclusive_group()
+    subset.add_argument(
+        "--revision",
+        action="append",
+        dest="revisions",
+        help="A revision to verify. Repeat the option to verify several revisions. Defaults to "
+        "all of them.",
+    )
+    subset.add_argument(
+        "--changed-from-golden",
+        metavar="DIRECTORY",
+        help="Only verify the revisions whose offline SQL differs from the golden files of the "
+        "render command, rendered for the dialect of the server.",
+    )
+    run.add_argument("--junit-xml", metavar="PATH", help="Write a JUnit XML report.")
+    run.add_argument("--json", metavar="PATH", help="Write a JSON report.")
+    run.set_defaults(command=_run)
+
+    render = subparsers.add_parser(
+        "render",
+        help="Compare the offline SQL of the revisions with golden files.",
+        description="Render the upgrade and downgrade SQL of every revision in offline mode, "
+        "without a database, and compare it with the golden files, exiting with a non-zero "
+        "status if any revision changed. With --update, write the golden files instead.",
+    )
+    _add_config_argument(render)
+    render.add_argument(
+        "--dialect",
+        help="The dialect to render the SQL for. Defaults to the one of the sqlalchemy.url of "
+        "the ini file.",
+    )
+    render.add_argument(
+        "--golden", required=True, metavar="DIRECTORY", help="The directory of the golden files."
+    )
+    render.add_argument("--update", action="store_true", help="Write the golden files.")
+    render.add_argument(
+        "-j", "--jobs", type=int, default=1, help="The number of processes rendering revisions."
+    )
+    render.set_defaults(command=_render)
+
+    lint = subparsers.add_parser(
+        "lint",
+        help="Find operations that are slow or blocking on large tables.",
+        description="Render the upgrade SQL of every revision in offline mode, without a "
+        "database, and report the operations known to be slow or blocking on large tables. "
+        "Exit with a non-zero status if any of them is an error.",
+    )
+    _add_config_argument(lint)
+    lint.add_argument(
+        "--dialect",
+        help="The dialect to render the SQL for. Defaults to the one of the sqlalchemy.url of "
+        "the ini file.",
+    )
+    lint.add_argument(
+        "--golden",
+        metavar="DIRECTORY",
+        help="Lint the golden files written by the render command, rather than rendering the "
+        "revisions.",
+    )
+    lint.add_argument(
+        "-j", "--jobs", type=int, default=1, help="The number of processes rendering revisions."
+    )
+    lint.set_defaults(command=_lint)
+
+    baseline = subparsers.add_parser(
+        "baseline",
+        help="Record a baseline to start the migrations from.",
+        description="Migrate a temporary database to --revision, and dump it to the baseline "
+        "directory, for --alembic-baseline to load it instead of applying the revisions up to "
+        "--revision.",
+    )
+    _add_config_argument(baseline)
+    baseline.add_argument(
+        "--db-uri",
+        help="The temporary database to use. Defaults to a temp_ database on the server of the "
+        "sqlalchemy.url of the ini file.",
+    )
+    baseline.add_argument("--revision", required=True, help="The revision of the baseline.")
+    baseline.add_argument(
+        "--directory", required=True, help="The directory to record the baseline in."
+    )
+    baseline.set_defaults(command=_baseline)
+
+    imports = subparsers.add_parser(
+        "imports",
+        help="Measure the time and memory spent importing each revision file.",
+        description="Import the file of every revision, and report the time and the memory "
+        "each import took, slowest first.",
+    )
+    _add_config_argument(imports)
+    imports.add_argument("--top", type=int, default=None, help="Report only the TOP slowest files.")
+    imports.set_defaults(command=_imports)
+
+    submit = subparsers.add_parser(
+        "submit",
+        help="Queue the verification checks of one or more alembic trees.",
+        description="Queue the verification checks of the migrations of each ini file in a "
+        "job queue, for workers started with the work command to run.",
+    )
+    _add_queue_argument(submit)
+    submit.add_argument(
+        "-c",
+        "--config",
+        action="append",
+        dest="configs",
+        help="An alembic.ini file to verify. Repeat the option to queue several trees. "
+        "Defaults to alembic.ini.",
+    )
+    submit.add_argument(
+        "--check",
+        action="append",
+        choices=CHECKS,
+        dest="checks",
+        help="A check to run. Repeat the option to run several checks. Defaults to all of them.",
+    )
+    submit.set_defaults(command=_submit)
+
+    work = subparsers.add_parser(
+        "work",
+        help="Run the checks of a job queue.",
+        description="Take the checks of a job queue one at a time and run each on its own "
+        "temporary database, until the queue stays empty.",
+    )
+    _add_queue_argument(work)
+    work.add_argument(
+        "--server-uri", required=True, help="The server to create the temporary databases on."
+    )
+    work.add_argument("--worker-id", help="The name of the worker. Defaults to host:pid.")
+    work.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="How long to wait for new checks once the queue is empty.",
+    )
+    work.set_defaults(command=_work)
+
+    collect = subparsers.add_parser(
+        "collect",
+        help="Wait for the checks of a job queue and report their results.",
+        description="Wait until every check of a job queue has run, report the results of all "
+        "the trees, and exit with a non-zero status if any of them does not pass.",
+    )
+    _add_queue_argument(collect)
+    collect.add_argument(
+        "--timeout", type=float, metavar="SECONDS", help="How long to wait for the checks."
+    )
+    collect.add_argument(
+        "--stale-after",
+        type=float,
+        metavar="SECONDS",
+        help="Give checks claimed longer ago than this back to the queue, in case their worker "
+        "died.",
+    )
+    collect.add_argument("--junit-xml", metavar="PATH", help="Write a JUnit XML report.")
+    collect.add_argument("--json", metavar="PATH", help="Write a JSON report.")
+    collect.set_defaults(command=_collect)
+    return parser
+
+
+def _add_config_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-c", "--config", default="alembic.ini", help="The alembic.ini file to read."
+    )
+
+
+def _add_queue_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--queue",
+        required=True,
+        metavar="URI",
+        help="The SQLAlchemy URI of the database of the job queue, or the path of a SQLite file.",
+    )
+
+
+def _bisect(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    db_uri, config = _load_config(parser, args)
+    result = bisect_migrations(
+        db_uri,
+        config,
+        _load_callable(parser, args.check),
+        good=args.good,
+        bad=args.bad,
+        downgrade=args.downgrade,
+    )
+    for revision, passed in result.probes:
+        print(f"{revision} {'good' if passed else 'bad'}")
+    print(f"first bad revision: {result.first_bad}")
+    print(f"last good revision: {result.last_good or 'base'}")
+    return 0
+
+
+def _run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    server_uri = args.server_uri or _ini_uri(parser, args, "--server-uri")
+    revisions = args.revisions
+    if args.changed_from_golden:
+        dialect = make_url(server_uri).get_backend_name()
+        rendered = render_migrations(args.config, dialect, jobs=args.jobs)
+        revisions = list(diff_golden_files(rendered, args.changed_from_golden))
+        print(f"changed revisions: {' '.join(revisions) or 'none'}")
+    results = verify_migrations(
+        args.config, server_uri, args.checks or CHECKS, args.jobs, revisions
+    )
+    return _report(results, args)
+
+
+def _submit(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    queue = JobQueue(args.queue)
+    for config in args.configs or ["alembic.ini"]:
+        jobs = queue.submit(config, args.checks or CHECKS)
+        print(f"queued {len(jobs)} checks of {config}")
+    return 0
+
+
+def _work(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    done = run_worker(
+        JobQueue(args.queue), args.server_uri, args.worker_id, idle_timeout=args.idle_timeout
+    )
+    print(f"ran {done} checks")
+    return 0
+
+
+def _collect(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    try:
+        results = wait_for_results(
+            JobQueue(args.queue), timeout=args.timeout, stale_after=args.stale_after
+        )
+    except TimeoutError as exc:
+        print(f"timed out: {exc}")
+        return 1
+    return _report(results, args)
+
+
+def _report(results: Sequence[CheckResult], args: argparse.Namespace) -> int:
+    for result in results:
+        print(f"{result.outcome.upper():6} {result.name} ({result.duration:.2f}s)")
+        if result.message:
+            print(f"       {result.message}")
+        if result.warning:
+            print(f"       warning: {result.warning}")
+    if args.junit_xml:
+        write_junit_xml(results, args.junit_xml)
+    if args.json:
+        write_json(results, args.json)
+    return 0 if all(result.passed for result in results) else 1
+
+
+def _render(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    dialect = args.dialect or make_url(_ini_uri(parser, args, "--dialect")).get_backend_name()
+    rendered = render_migrations(args.config, dialect, jobs=args.jobs)
+    if args.update:
+        write_golden_files(rendered, args.golden)
+        print(f"wrote the SQL of {len(rendered)} revisions to {args.golden}")
+        return 0
+
+    diffs = diff_golden_files(rendered, args.golden)
+    for diff in diffs.values():
+        print(diff, end="")
+    if diffs:
+        print(f"changed revisions: {' '.join(diffs)}")
+        return 1
+    print("no changes")
+    return 0
+
+
+def _lint(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    dialect = args.dialect or make_url(_ini_uri(parser, args, "--dialect")).get_backend_name()
+    if args.golden:
+        hazards = lint_golden_files(args.golden, dialect)
+    else:
+        hazards = lint_migrations(args.config, dialect, jobs=args.jobs)
+    for hazard in hazards:
+        print(hazard)
+        if hazard.statement:
+            print(f"    {hazard.statement}")
+    errors = sum(hazard.severity == "error" for hazard in hazards)
+    print(f"{errors} errors, {len(hazards) - errors} warnings")
+    return 1 if errors else 0
+
+
+def _baseline(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    db_uri, config = _load_config(parser, args)
+    baseline = record_baseline(db_uri, config, args.revision, args.directory)
+    print(f"recorded the baseline of {baseline.revision} in {baseline.path}")
+    return 0
+
+
+def _imports(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    profiles = profile_imports(config_from_ini("sqlite://", args.config))
+    for profile in profiles[: args.top]:
+        megabytes = profile.memory / 2**20
+        print(f"{profile.seconds:8.3f}s {megabytes:8.1f} MiB  {profile.revision}  {profile.path}")
+    seconds = sum(profile.seconds for profile in profiles)
+    megabytes = sum(profile.memory for profile in profiles) / 2**20
+    print(f"imported {len(profiles)} revision files in {seconds:.3f}s, using {megabytes:.1f} MiB")
+    return 0
+
+
+def _load_config(parser: argparse.ArgumentParser, args: argparse.Namespace) -> tuple[str, Config]:
+    db_uri = args.db_uri or get_temporary_uri(_ini_uri(parser, args, "--db-uri"))
+    return db_uri, config_from_ini(db_uri, args.config)
+
+
+def _ini_uri(parser: argparse.ArgumentParser, args: argparse.Namespace, option: str) -> str:
+    uri = Config(args.config).get_main_option("sqlalchemy.url")
+    if not uri:
+        parser.error(f"{option} is needed, as {args.config} has no sqlalchemy.url")
+    return uri
+
+
+def _load_callable(parser: argparse.ArgumentParser, path: str) -> Callable[..., Any]:
+    module_name, _, name = path.partition(":")
+    if not name:
+        parser.error(f"{path!r} is not in the MODULE:FUNCTION form")
+    # like python -m, make the modules of the current directory importable
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    try:
+        return getattr(importlib.import_module(module_name), name)
+    except (ImportError, AttributeError) as exc:
+        parser.error(f"Could not load {path!r}: {exc}")
@@ -0,0 +1,207 @@
+import os
+import re
+import shutil
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar
+
+from alembic import command
+from sqlalchemy import create_engine, pool, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy_utils import create_database, drop_database
+
+from alembicverify.reusedb import ensure_migrated, reusable_uri
+from alembicverify.util import config_from_ini
+
+
+TEMPLATE_PREFIX = "tmpl_"
+_DEFINER = re.compile(r"\bDEFINER=`(?:[^`]|``)*`@`(?:[^`]|``)*`\s*")
+
+
+class CloneStrategy(ABC):
+    """A way of copying a database migrated to a revision.
+
+    :meth:`create` migrates a template database once, and :meth:`clone` creates the database at
+    ``target_uri`` as a copy of the database at ``source_uri``, that template.
+    """
+
+    name: ClassVar[str]
+
+    def supports(self, uri: str) -> bool:
+        """Tell whether the database at ``uri`` can be cloned with this strategy."""
+        return True
+
+    def create(
+        self,
+        db_uri: str,
+        alembic_ini_location: str | os.PathLike[str],
+        revision: str = "head",
+        worker_id: str = "main",
+    ) -> None:
+        """Create the database at ``db_uri`` as a copy of a template migrated to ``revision``."""
+        config = config_from_ini(db_uri, alembic_ini_location)
+        template_uri = reusable_uri(db_uri, config, revision, worker_id, TEMPLATE_PREFIX)
+        ensure_migrated(template_uri, config_from_ini(template_uri, alembic_ini_location), revision)
+        self.clone(template_uri, db_uri)
+
+    @abstractmethod
+    def clone(self, source_uri: str, target_uri: str) -> None:
+        """Create the database at ``target_uri`` as a copy of the database at ``source_uri``."""
+
+
+class ReplayStrategy(CloneStrategy):
+    """Create an empty database and run all the migrations on it, on any backend.
+
+    Used where databases cannot be cloned. No template is made, so there is nothing to
+    :meth:`clone`.
+    """
+
+    name = "replay"
+
+    def create(
+        self,
+        db_uri: str,
+        alembic_ini_location: str | os.PathLike[str],
+        revision: str = "head",
+        worker_id: str = "main",
+    ) -> None:
+        create_database(db_uri)
+        try:
+            command.upgrade(config_from_ini(db_uri, alembic_ini_location), revision)
+        except BaseException:
+            drop_database(db_uri)
+            raise
+
+    def clone(self, source_uri: str, target_uri: str) -> None:
+        raise NotImplementedError("Replayed databases are migrated, not copied from a template")
+
+
+class PostgresTemplateStrategy(CloneStrategy):
+    """Create the database with ``CREATE DATABASE ... TEMPLATE``, a file-level copy.
+
+    Nobody may be connected to the template while it is copied.
+    """
+
+    name = "template"
+
+    def clone(self, source_uri: str, target_uri: str) -> None:
+        create_database(target_uri, template=make_url(source_uri).database)
+
+
+class MySQLCopyStrategy(CloneStrategy):
+    """Copy the definitions then the rows of the tables, ``jobs`` tables at a time.
+
+    Foreign keys are checked neither while the tables are created nor while they are filled.
+    Views are copied after the tables; triggers and stored routines are not copied.
+    """
+
+    name = "copy"
+
+    def __init__(self, jobs: int = 4) -> None:
+        self.jobs = jobs
+
+    def clone(self, source_uri: str, target_uri: str) -> None:
+        create_database(target_uri)
+        engine = create_engine(target_uri, poolclass=pool.NullPool)
+        try:
+            self._copy(engine, make_url(source_uri).database or "")
+        except BaseException:
+            engine.dispose()
+            drop_database(target_uri)
+            raise
+        finally:
+            engine.dispose()
+
+    def _copy(self, engine: Engine, source: str) -> None:
+        quote = engine.dialect.identifier_preparer.quote
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT table_name, table_type FROM information_schema.tables "
+                    "WHERE table_schema = :schema ORDER BY table_name"
+                ),
+                {"schema": source},
+            ).all()
+        tables = [name for name, kind in rows if kind == "BASE TABLE"]
+        views = [name for name, kind in rows if kind == "VIEW"]
+
+        def copy_table(table: str) -> None:
+            # SHOW CREATE TABLE names the table without its schema, so it is created in the
+            # database of the connection
+            source_table = f"{quote(source)}.{quote(table)}"
+            with engine.begin() as conn:
+                conn.exec_driver_sql("SET FOREIGN_KEY_CHECKS = 0")
+                conn.exec_driver_sql(
+                    conn.exec_driver_sql(f"SHOW CREATE TABLE {source_table}").one()[1]
+                )
+                conn.exec_driver_sql(f"INSERT INTO {quote(table)} SELECT * FROM {source_table}")
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            list(executor.map(copy_table, tables))
+
+        # SHOW CREATE VIEW always quotes the names of the schema of the view and its tables,
+        # and names its definer, who may not exist on the server of the copy
+        schema = f"{engine.dialect.identifier_preparer.quote_identifier(source)}."
+        with engine.begin() as conn:
+            for view in views:
+                source_view = f"{quote(source)}.{quote(view)}"
+                create = conn.exec_driver_sql(f"SHOW CREATE VIEW {source_view}").one()[1]
+                conn.exec_driver_sql(_DEFINER.sub("", create).replace(schema, ""))
+
+
+class SQLiteFileStrategy(CloneStrategy):
+    """Copy the database file. In-memory databases cannot be cloned."""
+
+    name = "file"
+
+    def supports(self, uri: str) -> bool:
+        database = make_url(uri).database
+        return bool(database) and database != ":memory:" and not database.startswith("file:")
+
+    def clone(self, source_uri: str, target_uri: str) -> None:
+        shutil.copyfile(_sqlite_path(source_uri), _sqlite_path(target_uri))
+
+
+CLONE_STRATEGIES: dict[str, CloneStrategy] = {
+    "postgresql": PostgresTemplateStrategy(),
+    "mysql": MySQLCopyStrategy(),
+    "mariadb": MySQLCopyStrategy(),
+    "sqlite": SQLiteFileStrategy(),
+}
+
+
+def strategy_for(uri: str) -> CloneStrategy:
+    """Return the strategy of :data:`CLONE_STRATEGIES` for the backend of ``uri``.
+
+    Backends without a strategy, and databases the strategy does not support, fall back to
+    :class:`ReplayStrategy`. Register a strategy for another backend, or replace one, by
+    setting it in :data:`CLONE_STRATEGIES`.
+    """
+    strategy = CLONE_STRATEGIES.get(make_url(uri).get_backend_name())
+    if strategy is None or not strategy.supports(uri):
+        return ReplayStrategy()
+    return strategy
+
+
+def clone_migrated_database(
+    db_uri: str,
+    alembic_ini_location: str | os.PathLike[str],
+    revision: str = "head",
+    strategy: CloneStrategy | None = None,
+    worker_id: str = "main",
+) -> CloneStrategy:
+    """Create the database at ``db_uri``, migrated to ``revision``, and return the strategy used.
+
+    The migrations run once, on a template database kept between runs on the same server, named
+    like the databases of ``--alembic-reuse-db`` with a ``tmpl_`` prefix (see
+    :func:`~alembicverify.reusedb.reusable_uri`), and each new database is a copy of the
+    template, made by ``strategy``, or the strategy of the backend (see :func:`strategy_for`).
+    With :class:`ReplayStrategy`, the migrations run on the new database instead.
+    """
+    strategy = strategy or strategy_for(db_uri)
+    strategy.create(db_uri, alembic_ini_location, revision, worker_id)
+    return strategy
+
+
+def _sqlite_path(uri: str) -> str:
+    return make_url(uri).database or ""
@@ -0,0 +1,164 @@
+import hashlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Protocol
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from alembicverify.fingerprint import environment_fingerprint, revision_fingerprints
+from alembicverify.graph import RevisionGraph
+from alembicverify.reflection import (
+    ColumnDescriptor,
+    TableDescriptor,
+    diff_table_descriptors,
+    iter_table_descriptors,
+)
+from alembicverify.registry import EngineRegistry
+from alembicverify.util import prepare_schema_from_migrations
+
+
+DRIFT_CACHE_KEY = "alembicverify/drift"
+
+
+class Cache(Protocol):
+    """The subset of the :class:`pytest.Cache` interface used to store reflected schemas."""
+
+    def get(self, key: str, default: Any) -> Any: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+
+@dataclass(frozen=True)
+class DriftReport:
+    """The outcome of :func:`detect_drift`.
+
+    ``differences`` maps the tables that differ to their problems, as seen from the migrations:
+    a column "is missing" when the models have it but the migrations don't create it.
+    ``compared`` lists the tables whose definitions differed and were compared in detail, and
+    ``migrations_cached`` and ``models_cached`` tell which sides were read from the cache.
+    """
+
+    differences: dict[str, list[str]] = field(default_factory=dict)
+    compared: tuple[str, ...] = ()
+    migrations_cached: bool = False
+    models_cached: bool = False
+
+    @property
+    def has_drift(self) -> bool:
+        return bool(self.differences)
+
+
+def detect_drift(
+    uri: str,
+    config: Config,
+    metadata: MetaData,
+    models_uri: str,
+    cache: Cache | None = None,
+    registry: EngineRegistry | None = None,
+) -> DriftReport:
+    """Compare the schema created by the migrations at head with the one of the models.
+
+    The migrations are applied with :func:`~alembicverify.util.prepare_schema_from_migrations`
+    to the empty database at ``uri``, which ``config`` must point to, and ``metadata`` is created
+    on the empty database at ``models_uri``, which should use the same backend. Both schemas are
+    then reflected and compared table by table, only looking in detail at the tables whose
+    definitions differ.
+
+    With a ``cache`` (such as ``request.config.cache`` in pytest), each reflected schema is
+    stored under a hash of what produced it: the revision files and ``env.py`` for the
+    migrations, and the DDL compiled from ``metadata`` for the models. A side that didn't change
+    since it was last reflected is read from the cache, and its database is left untouched.
+    """
+    script = ScriptDirectory.from_config(config)
+    migrations_key = f"{DRIFT_CACHE_KEY}/migrations/{_migrations_hash(script, uri)}"
+    models_engine = create_engine(models_uri)
+    try:
+        models_key = f"{DRIFT_CACHE_KEY}/models/{_models_hash(metadata, models_engine.dialect)}"
+
+        migrated = _load(cache, migrations_key)
+        migrations_cached = migrated is not None
+        if migrated is None:
+            with prepare_schema_from_migrations(uri, config, "heads", registry=registry) as (
+                engine,
+                _,
+            ):
+                migrated = _reflect(engine)
+            _store(cache, migrations_key, migrated)
+
+        models = _load(cache, models_key)
+        models_cached = models is not None
+        if models is None:
+            metadata.create_all(models_engine)
+            models = _reflect(models_engine)
+            _store(cache, models_key, models)
+    finally:
+        models_engine.dispose()
+
+    differences: dict[str, list[str]] = {}
+    compared = []
+    for name in sorted(migrated.keys() | models.keys()):
+        if name not in models:
+            differences[name] = ["unexpected table"]
+        elif name not in migrated:
+            differences[name] = ["table is missing"]
+        elif migrated[name].fingerprint != models[name].fingerprint:
+            compared.append(name)
+            problems = diff_table_descriptors(migrated[name], models[name])
+            if problems:
+                differences[name] = problems
+
+    return DriftReport(
+        differences=differences,
+        compared=tuple(compared),
+        migrations_cached=migrations_cached,
+        models_cached=models_cached,
+    )
+
+
+def _migrations_hash(script: ScriptDirectory, uri: str) -> str:
+    graph = RevisionGraph.from_script(script)
+    fingerprints = revision_fingerprints(script, graph)
+    digest = hashlib.sha256(environment_fingerprint(script, uri).encode())
+    for head in sorted(graph.heads):
+        digest.update(fingerprints[head].encode())
+    return digest.hexdigest()
+
+
+def _models_hash(metadata: MetaData, dialect: Dialect) -> str:
+    digest = hashlib.sha256(dialect.name.encode())
+    for table in sorted(metadata.tables.values(), key=lambda table: table.fullname):
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: str(index.name)):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def _reflect(engine: Engine) -> dict[str, TableDescriptor]:
+    return {table.name: table for table in iter_table_descriptors(engine)}
+
+
+def _load(cache: Cache | None, key: str) -> dict[str, TableDescriptor] | None:
+    if cache is None:
+        return None
+    tables: dict[str, Any] | None = cache.get(key, None)
+    if tables is None:
+        return None
+    return {
+        name: TableDescriptor(
+            name=table["name"],
+            columns=tuple(ColumnDescriptor(**column) for column in table["columns"]),
+            primary_key=tuple(table["primary_key"]),
+            foreign_keys=tuple(table["foreign_keys"]),
+            indexes=tuple(table["indexes"]),
+            unique_constraints=tuple(table["unique_constraints"]),
+        )
+        for name, table in tables.items()
+    }
+
+
+def _store(cache: Cache | None, key: str, tables: dict[str, TableDescriptor]) -> None:
+    if cache is not None:
+        cache.set(key, {name: asdict(table) for name, table in tables.items()})
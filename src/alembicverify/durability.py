@@ -0,0 +1,92 @@
+import re
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import create_engine, event, pool
+from sqlalchemy.engine import Connection, Engine, make_url
+
+from alembicverify.util import same_database
+
+
+_CREATE_TABLE = re.compile(r"^(\s*CREATE\s+)(TABLE\s)", re.IGNORECASE)
+
+
+@contextmanager
+def relaxed_durability(
+    db_uri: str, unlogged_tables: bool = False
+) -> Generator[dict[str, str], None, None]:
+    """Trade durability for speed on a throwaway database.
+
+    The settings apply to every connection made to the database while the context is active,
+    including those made by ``env.py`` while running migrations, and are yielded as a mapping
+    of setting names to values:
+
+    - PostgreSQL: ``synchronous_commit`` is turned off for the database. With
+      ``unlogged_tables``, tables are also created ``UNLOGGED``, which skips the WAL entirely.
+    - SQLite: the journal is kept in memory and ``synchronous`` is turned off.
+
+    Other dialects are left untouched. Never use this on a database you want to keep: a crash
+    can lose committed transactions, and unlogged tables are truncated on recovery.
+    """
+    target = make_url(db_uri)
+    settings: dict[str, str] = {}
+
+    if target.get_backend_name() == "postgresql":
+        _alter_database(db_uri, "synchronous_commit", "off")
+        settings["synchronous_commit"] = "off"
+        if unlogged_tables:
+            settings["unlogged_tables"] = "on"
+    elif target.get_backend_name() == "sqlite":
+        settings["journal_mode"] = "MEMORY"
+        settings["synchronous"] = "OFF"
+
+    def on_connect(connection: Connection, *args: Any) -> None:
+        if not same_database(connection.engine.url, target):
+            return
+        dbapi_connection: Any = connection.connection
+        if dbapi_connection.info.get("alembicverify_relaxed"):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode = MEMORY")
+            cursor.execute("PRAGMA synchronous = OFF")
+        finally:
+            cursor.close()
+        dbapi_connection.info["alembicverify_relaxed"] = True
+
+    def before_cursor_execute(
+        connection: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> tuple[str, Any]:
+        if same_database(connection.engine.url, target):
+            statement = _CREATE_TABLE.sub(r"\1UNLOGGED \2", statement, count=1)
+        return statement, parameters
+
+    listeners: list[tuple[str, Any, dict[str, Any]]] = []
+    if "journal_mode" in settings:
+        listeners.append(("engine_connect", on_connect, {}))
+    if "unlogged_tables" in settings:
+        listeners.append(("before_cursor_execute", before_cursor_execute, {"retval": True}))
+
+    for name, fn, kwargs in listeners:
+        event.listen(Engine, name, fn, **kwargs)
+    try:
+        yield settings
+    finally:
+        for name, fn, _ in listeners:
+            event.remove(Engine, name, fn)
+
+
+def _alter_database(db_uri: str, setting: str, value: str) -> None:
+    engine = create_engine(db_uri, poolclass=pool.NullPool)
+    try:
+        with engine.begin() as conn:
+            database = conn.dialect.identifier_preparer.quote(engine.url.database or "")
+            conn.exec_driver_sql(f"ALTER DATABASE {database} SET {setting} = {value}")
+    finally:
+        engine.dispose()
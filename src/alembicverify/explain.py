@@ -0,0 +1,315 @@
+import json
+import re
+from collections.abc import Generator, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine, make_url
+
+from alembicverify.graph import RevisionGraph
+from alembicverify.util import same_database
+
+
+_EXPLAIN = {
+    "postgresql": "EXPLAIN (FORMAT JSON) ",
+    "mysql": "EXPLAIN ",
+    "mariadb": "EXPLAIN ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+
+# Cheap row count estimates from the catalog, used instead of counting the rows of a table.
+# ``{identifier}`` is the quoted name of the table as a string literal, ``{name}`` its name.
+_ESTIMATES = {
+    "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass({identifier})",
+    "mysql": (
+        "SELECT table_rows FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = {name}"
+    ),
+}
+_ESTIMATES["mariadb"] = _ESTIMATES["mysql"]
+# PostgreSQL has no estimate of the size of a table before it is analyzed, which only samples it
+_ANALYZE = {"postgresql": "ANALYZE {table}"}
+
+# the prefix of the temporary tables alembic copies a table into to recreate it in batch mode
+_BATCH_TABLE = "_alembic_tmp_"
+_DML = re.compile(r"^\s*(INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_CTE = re.compile(r"^\s*WITH\b", re.IGNORECASE)
+# the tokens of a statement that matter to find the verb following its common table expressions
+_TOKENS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[()]|\w+")
+_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "VALUES"}
+_TARGET = re.compile(r"^\s*(?:UPDATE|DELETE\s+FROM)\s+([\w.`\"\[\]]+)", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?([^\s(]+)")
+
+
+@dataclass(frozen=True)
+class TableScan:
+    """A full scan of a table in the plan of a statement.
+
+    ``rows`` is the size of the table, or ``None`` when it is unknown, and ``filtered`` tells
+    whether rows are filtered while scanning, which an index could have avoided.
+    """
+
+    table: str
+    rows: int | None
+    filtered: bool
+
+
+@dataclass(frozen=True)
+class StatementPlan:
+    """The plan of a data migration statement, as estimated by the database."""
+
+    statement: str
+    estimated_rows: int | None
+    scans: tuple[TableScan, ...] = ()
+    warnings: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class RevisionPlan:
+    """The plans of the data migration statements of a revision."""
+
+    revision: str
+    statements: tuple[StatementPlan, ...] = ()
+
+    @property
+    def estimated_rows(self) -> int:
+        return sum(statement.estimated_rows or 0 for statement in self.statements)
+
+    @property
+    def warnings(self) -> tuple[str, ...]:
+        return tuple(warning for statement in self.statements for warning in statement.warnings)
+
+
+def explain_migrations(
+    uri: str,
+    config: Config,
+    revision: str = "head",
+    large_table_rows: int = 10_000,
+) -> list[RevisionPlan]:
+    """Estimate the cost of the data migrations between the current revision and ``revision``.
+
+    The database at ``uri``, which ``config`` must point to, is expected to be seeded with a
+    realistic amount of data. Each revision is applied in turn, and the ``INSERT``, ``UPDATE``
+    and ``DELETE`` statements it emits, ``WITH`` clauses included, are explained right before
+    they run, so each plan sees the schema and the data left by the previous statements.
+    Statements run with ``executemany``, such as ``op.bulk_insert``, are not explained.
+
+    Full scans of tables with at least ``large_table_rows`` rows are reported as warnings. The
+    sizes of the tables are estimated from the catalog on PostgreSQL, which first analyzes the
+    tables it has no estimate for, and on MySQL, and counted on SQLite. Supported on PostgreSQL,
+    MySQL and SQLite. As the revisions are applied, data migrations included, only use this on a
+    throwaway copy of the data.
+    """
+    if make_url(uri).get_backend_name() not in _EXPLAIN:
+        raise ValueError(f"EXPLAIN is not supported on {make_url(uri).get_backend_name()}")
+
+    script = ScriptDirectory.from_config(config)
+    graph = RevisionGraph.from_script(script)
+    engine = create_engine(uri)
+    try:
+        with engine.connect() as conn:
+            current = MigrationContext.configure(conn).get_current_heads()
+    finally:
+        engine.dispose()
+
+    applied: set[str] = set()
+    for head in current:
+        applied.update((head, *graph.ancestors(head)))
+    target = script.get_revision(revision)
+    path = graph.upgrade_path(None, target.revision) if target is not None else ()
+
+    plans = []
+    for step in path:
+        if step in applied:
+            continue
+        with explaining(uri, large_table_rows) as statements:
+            command.upgrade(config, step)
+        plans.append(RevisionPlan(step, tuple(statements)))
+    return plans
+
+
+@contextmanager
+def explaining(
+    uri: str, large_table_rows: int = 10_000
+) -> Generator[list[StatementPlan], None, None]:
+    """Explain the data migration statements sent to the database at ``uri`` before they run.
+
+    While the context is active, the plans of the statements are collected in the yielded list,
+    whatever the engine used to send them, as with ``env.py`` running migrations. Statements
+    still run unchanged. Updates of the ``alembic_version`` table and the copies of tables
+    recreated by batch operations are not explained. The sizes of the scanned tables are looked
+    up once.
+    """
+    target = make_url(uri)
+    plans: list[StatementPlan] = []
+    table_rows: dict[str, int | None] = {}
+
+    def before_cursor_execute(
+        connection: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        if (
+            executemany
+            or not _is_dml(statement)
+            or "alembic_version" in statement
+            or _BATCH_TABLE in statement
+            or not same_database(connection.engine.url, target)
+        ):
+            return
+        explain: Any = connection.connection.cursor()
+        try:
+            explain.execute(_EXPLAIN[connection.dialect.name] + statement, parameters)
+            columns = [column[0] for column in explain.description or ()]
+            rows = explain.fetchall()
+        finally:
+            explain.close()
+        plans.append(_plan(connection, statement, columns, rows, large_table_rows, table_rows))
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield plans
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _plan(
+    connection: Connection,
+    statement: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    large_table_rows: int,
+    table_rows: dict[str, int | None],
+) -> StatementPlan:
+    filtered = bool(_WHERE.search(statement))
+    if connection.dialect.name == "postgresql":
+        estimated_rows, scanned = _postgresql_plan(rows[0][0])
+    elif connection.dialect.name == "sqlite":
+        estimated_rows, scanned = None, [(table, filtered) for table in _sqlite_plan(rows)]
+    else:
+        estimated_rows, scanned = _mysql_plan(columns, rows)
+
+    match = _TARGET.match(statement)
+    target = _unquote(match.group(1)) if match else None
+    if target is not None and not filtered and target not in {table for table, _ in scanned}:
+        # SQLite empties a table without scanning it
+        scanned.append((target, False))
+
+    for table, _ in scanned:
+        if table not in table_rows:
+            table_rows[table] = _table_rows(connection, table)
+    scans = tuple(TableScan(table, table_rows[table], f) for table, f in scanned)
+    warnings = []
+    for scan in scans:
+        if target == scan.table and not scan.filtered and estimated_rows is None:
+            estimated_rows = scan.rows
+        if scan.rows is not None and scan.rows < large_table_rows:
+            continue
+        size = "unknown size" if scan.rows is None else f"~{scan.rows} rows"
+        if scan.filtered:
+            warnings.append(
+                f"sequential scan of {scan.table} ({size}): no index matches the filter"
+            )
+        elif scan.table == target:
+            warnings.append(f"rewrites every row of {scan.table} ({size})")
+        else:
+            warnings.append(f"sequential scan of {scan.table} ({size})")
+    return StatementPlan(statement, estimated_rows, scans, tuple(warnings))
+
+
+def _postgresql_plan(explained: Any) -> tuple[int | None, list[tuple[str, bool]]]:
+    plan = (json.loads(explained) if isinstance(explained, str) else explained)[0]["Plan"]
+    # the node modifying the table estimates no rows unless it returns them
+    counted = plan["Plans"][0] if plan["Node Type"] == "ModifyTable" and "Plans" in plan else plan
+    return int(counted["Plan Rows"]), [
+        (node["Relation Name"], "Filter" in node)
+        for node in _walk(plan)
+        if node["Node Type"] == "Seq Scan"
+    ]
+
+
+def _walk(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _walk(child)
+
+
+def _mysql_plan(
+    columns: Sequence[str], rows: Sequence[Sequence[Any]]
+) -> tuple[int | None, list[tuple[str, bool]]]:
+    steps = [dict(zip(columns, row, strict=True)) for row in rows]
+    estimates = [int(step["rows"]) for step in steps if step.get("rows") is not None]
+    return max(estimates, default=None), [
+        (step["table"], "Using where" in (step.get("Extra") or ""))
+        for step in steps
+        if step.get("type") == "ALL" and step.get("table") and not step["table"].startswith("<")
+    ]
+
+
+def _sqlite_plan(rows: Sequence[Sequence[Any]]) -> list[str]:
+    tables = []
+    for row in rows:
+        match = _SQLITE_SCAN.match(row[-1])
+        if match and match.group(1) not in ("CONSTANT", "SUBQUERY"):
+            tables.append(match.group(1))
+    return tables
+
+
+def _table_rows(connection: Connection, table: str) -> int | None:
+    estimate = _ESTIMATES.get(connection.dialect.name)
+    preparer = connection.dialect.identifier_preparer
+    cursor: Any = connection.connection.cursor()
+    try:
+        if estimate is None:
+            cursor.execute(f"SELECT count(*) FROM {preparer.quote(table)}")
+            return int(cursor.fetchone()[0])
+        estimate = estimate.format(
+            identifier=_literal(preparer.quote_identifier(table)), name=_literal(table)
+        )
+        cursor.execute(estimate)
+        row = cursor.fetchone()
+        analyze = _ANALYZE.get(connection.dialect.name)
+        if row is not None and row[0] is not None and row[0] < 0 and analyze is not None:
+            cursor.execute(analyze.format(table=preparer.quote(table)))
+            cursor.execute(estimate)
+            row = cursor.fetchone()
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return int(row[0])
+    finally:
+        cursor.close()
+
+
+def _is_dml(statement: str) -> bool:
+    if _DML.match(statement):
+        return True
+    if not _CTE.match(statement):
+        return False
+    # the verb of a statement with common table expressions is the first one out of parentheses
+    depth = 0
+    for token in _TOKENS.findall(statement):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token.upper() in _VERBS:
+            return token.upper() in ("INSERT", "UPDATE", "DELETE")
+    return False
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _unquote(name: str) -> str:
+    return name.split(".")[-1].strip('`"[]')
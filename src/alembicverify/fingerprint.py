@@ -0,0 +1,36 @@
+import hashlib
+from pathlib import Path
+
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import make_url
+
+from alembicverify.graph import RevisionGraph
+
+
+def revision_fingerprints(
+    script: ScriptDirectory, graph: RevisionGraph | None = None
+) -> dict[str, str]:
+    """Compute a content hash for every revision of a migration tree.
+
+    The hash of a revision covers its own file and the hashes of its down revisions, so it
+    changes whenever the revision or anything in its ancestry is edited.
+    """
+    if graph is None:
+        graph = RevisionGraph.from_script(script)
+
+    fingerprints: dict[str, str] = {}
+    for revision in graph.order:
+        script_revision = script.get_revision(revision)
+        assert script_revision is not None
+        digest = hashlib.sha256(Path(script_revision.path).read_bytes())
+        for down_revision in sorted(graph.down_revisions(revision)):
+            digest.update(fingerprints[down_revision].encode())
+        fingerprints[revision] = digest.hexdigest()
+    return fingerprints
+
+
+def environment_fingerprint(script: ScriptDirectory, uri: str) -> str:
+    """Compute a hash of the migration environment: the ``env.py`` file and the dialect."""
+    digest = hashlib.sha256(Path(script.env_py_location).read_bytes())
+    digest.update(make_url(uri).drivername.encode())
+    return digest.hexdigest()
@@ -0,0 +1,148 @@
+from collections import deque
+from collections.abc import Iterable, Mapping
+
+from alembic.script import ScriptDirectory
+
+
+class RevisionGraph:
+    """A precomputed index over the revisions of a migration tree.
+
+    The index is built once and answers ancestry, path and step count queries without walking
+    the alembic revision map again. Every revision gets a position in a topological order
+    (bases first), and its ancestry is stored as a bitset over those positions, so that
+    ``is_ancestor`` and ``steps`` are O(1) and paths are O(path).
+
+    Revisions are addressed by their exact id. ``None`` and ``"base"`` mean the empty database.
+    """
+
+    def __init__(self, down_revisions: Mapping[str, Iterable[str]]):
+        parents = {rev: tuple(downs) for rev, downs in down_revisions.items()}
+        for rev, downs in parents.items():
+            for down in downs:
+                if down not in parents:
+                    raise ValueError(f"Revision {rev!r} depends on unknown revision {down!r}")
+
+        self.order: tuple[str, ...] = _topological_order(parents)
+        self._index = {rev: i for i, rev in enumerate(self.order)}
+        self._parents = parents
+
+        self._ancestors: list[int] = []
+        for i, rev in enumerate(self.order):
+            mask = 1 << i
+            for down in parents[rev]:
+                mask |= self._ancestors[self._index[down]]
+            self._ancestors.append(mask)
+
+        children: set[str] = {down for downs in parents.values() for down in downs}
+        self.heads: tuple[str, ...] = tuple(rev for rev in self.order if rev not in children)
+        self.bases: tuple[str, ...] = tuple(rev for rev in self.order if not parents[rev])
+
+    @classmethod
+    def from_script(cls, script: ScriptDirectory) -> "RevisionGraph":
+        """Build the index from an :class:`alembic.script.ScriptDirectory`.
+
+        Dependencies declared with ``depends_on`` count as ancestors, since alembic applies them
+        before the revision that declares them.
+        """
+        return cls({rev.revision: rev._all_down_revisions for rev in script.walk_revisions()})
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __contains__(self, revision: object) -> bool:
+        return revision in self._index
+
+    def index(self, revision: str) -> int:
+        """Return the position of a revision in the topological order."""
+        try:
+            return self._index[revision]
+        except KeyError:
+            raise ValueError(f"Unknown revision {revision!r}") from None
+
+    def down_revisions(self, revision: str) -> tuple[str, ...]:
+        """Return the direct parents of a revision."""
+        self.index(revision)
+        return self._parents[revision]
+
+    def ancestors(self, revision: str) -> tuple[str, ...]:
+        """Return the ancestors of a revision (excluding itself) in topological order."""
+        mask = self._mask(revision) & ~(1 << self.index(revision))
+        return self._revisions(mask)
+
+    def descendants(self, revision: str) -> tuple[str, ...]:
+        """Return the descendants of a revision (excluding itself) in topological order."""
+        i = self.index(revision)
+        return tuple(
+            rev for j, rev in enumerate(self.order) if j != i and self._ancestors[j] >> i & 1
+        )
+
+    def is_ancestor(self, ancestor: str, revision: str) -> bool:
+        """Tell whether ``ancestor`` has to be applied before ``revision``."""
+        return ancestor != revision and bool(self._mask(revision) >> self.index(ancestor) & 1)
+
+    def heads_depending_on(self, revision: str) -> tuple[str, ...]:
+        """Return the heads that include ``revision`` in their history."""
+        i = self.index(revision)
+        return tuple(head for head in self.heads if self._ancestors[self._index[head]] >> i & 1)
+
+    def upgrade_path(self, from_revision: str | None, to_revision: str) -> tuple[str, ...]:
+        """Return the revisions applied, in order, when upgrading between two revisions."""
+        return self._revisions(self._mask(to_revision) & ~self._mask(from_revision))
+
+    def downgrade_path(self, from_revision: str, to_revision: str | None) -> tuple[str, ...]:
+        """Return the revisions reverted, in order, when downgrading between two revisions."""
+        return self.upgrade_path(to_revision, from_revision)[::-1]
+
+    def steps(self, from_revision: str | None, to_revision: str | None) -> int:
+        """Return the number of revisions applied (positive) or reverted (negative).
+
+        Raises ``ValueError`` if the two revisions are on different branches, as moving between
+        them is neither a plain upgrade nor a plain downgrade.
+        """
+        source, target = self._mask(from_revision), self._mask(to_revision)
+        if source & target == source:
+            return (target & ~source).bit_count()
+        if source & target == target:
+            return -(source & ~target).bit_count()
+        raise ValueError(
+            f"Revisions {from_revision!r} and {to_revision!r} are on different branches"
+        )
+
+    def paths_to_verify(self) -> dict[str, tuple[str, ...]]:
+        """Return, for every head, the full upgrade path from the empty database."""
+        return {head: self.upgrade_path(None, head) for head in self.heads}
+
+    def _mask(self, revision: str | None) -> int:
+        if revision is None or revision == "base":
+            return 0
+        return self._ancestors[self.index(revision)]
+
+    def _revisions(self, mask: int) -> tuple[str, ...]:
+        revisions = []
+        while mask:
+            low = mask & -mask
+            revisions.append(self.order[low.bit_length() - 1])
+            mask ^= low
+        return tuple(revisions)
+
+
+def _topological_order(parents: Mapping[str, tuple[str, ...]]) -> tuple[str, ...]:
+    pending = {rev: len(set(downs)) for rev, downs in parents.items()}
+    children: dict[str, list[str]] = {rev: [] for rev in parents}
+    for rev, downs in parents.items():
+        for down in set(downs):
+            children[down].append(rev)
+
+    ready = deque(sorted(rev for rev, count in pending.items() if count == 0))
+    order: list[str] = []
+    while ready:
+        rev = ready.popleft()
+        order.append(rev)
+        for child in sorted(children[rev]):
+            pending[child] -= 1
+            if pending[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(parents):
+        raise ValueError("The revision graph contains a cycle")
+    return tuple(order)
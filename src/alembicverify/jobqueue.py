@@ -0,0 +1,262 @@
+import json
+import os
+import socket
+import time
+from collections.abc import Generator, Iterable
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    func,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from alembicverify.runner import CHECKS, CheckResult, plan_checks, run_check
+from alembicverify.tempdb import get_temporary_uri
+
+
+_metadata = MetaData()
+_jobs = Table(
+    "alembicverify_jobs",
+    _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("alembic_ini_location", Text, nullable=False),
+    Column("check_name", String(32), nullable=False),
+    Column("target", Text, nullable=False),
+    Column("status", String(16), nullable=False, server_default="pending", index=True),
+    Column("worker", String(255)),
+    Column("claimed_at", Float),
+    Column("result", Text),
+)
+# the host that created a queue in a SQLite file, the only one its locks are reliable on
+_host = Table("alembicverify_host", _metadata, Column("name", String(255), nullable=False))
+
+
+@dataclass(frozen=True)
+class Job:
+    """A verification check of an alembic tree, waiting in a :class:`JobQueue`.
+
+    ``worker`` is the worker that claimed the job, if any.
+    """
+
+    id: int
+    alembic_ini_location: str
+    check: str
+    target: str
+    worker: str | None = None
+
+
+class JobQueue:
+    """A queue of verification checks in a database, shared by a coordinator and its workers.
+
+    The coordinator :meth:`submit` the checks of one or more alembic trees, workers
+    :meth:`claim` them one at a time, run them and :meth:`complete` them, and the coordinator
+    collects the :meth:`results` in a single report. Claims are atomic, so any number of
+    workers can share the queue, each running its checks on the database server of its choice.
+
+    ``location`` is the SQLAlchemy URI of the database holding the queue, or the path of a
+    SQLite file. To spread the checks over several machines, use a database server that they
+    all reach, such as PostgreSQL or MySQL. SQLite locking is unreliable on network
+    filesystems such as NFS and SMB, so a queue in a SQLite file records the host that created
+    it, and raises ``ValueError`` when opened from another one. ``timeout`` is how long to
+    wait for the lock of a SQLite file.
+    """
+
+    def __init__(self, location: str | os.PathLike[str], timeout: float = 30.0) -> None:
+        location = os.fspath(location)
+        self.uri = location if "://" in location else f"sqlite:///{Path(location).as_posix()}"
+        self.timeout = timeout
+        self._sqlite = make_url(self.uri).get_backend_name() == "sqlite"
+        try:
+            with self._connect() as conn:
+                _metadata.create_all(conn)
+        except DBAPIError:
+            # another process created the tables at the same time
+            with self._connect() as conn:
+                _metadata.create_all(conn)
+        if self._sqlite:
+            self._check_host()
+
+    def submit(
+        self, alembic_ini_location: str | os.PathLike[str], checks: Iterable[str] = CHECKS
+    ) -> list[Job]:
+        """Queue the checks of the migrations configured in an ``alembic.ini`` file."""
+        ini = os.fspath(alembic_ini_location)
+        jobs = []
+        planned = plan_checks(ini, checks)
+        with self._connect() as conn:
+            for check, target in planned:
+                cursor = conn.execute(
+                    _jobs.insert().values(alembic_ini_location=ini, check_name=check, target=target)
+                )
+                jobs.append(Job((cursor.inserted_primary_key or [0])[0], ini, check, target))
+        return jobs
+
+    def claim(self, worker_id: str) -> Job | None:
+        """Take the oldest pending job for ``worker_id``, or return ``None`` if there is none."""
+        columns = (_jobs.c.id, _jobs.c.alembic_ini_location, _jobs.c.check_name, _jobs.c.target)
+        while True:
+            # each attempt is its own transaction, to see the claims of the other workers
+            with self._connect() as conn:
+                row = conn.execute(
+                    select(*columns)
+                    .where(_jobs.c.status == "pending")
+                    .order_by(_jobs.c.id)
+                    .limit(1)
+                ).first()
+                if row is None:
+                    return None
+                # only one worker changes the status of a pending job, whatever its host
+                claimed = conn.execute(
+                    update(_jobs)
+                    .where(_jobs.c.id == row.id, _jobs.c.status == "pending")
+                    .values(status="running", worker=worker_id, claimed_at=time.time())
+                )
+            if claimed.rowcount == 1:
+                return Job(*row, worker=worker_id)
+
+    def complete(self, job: Job, result: CheckResult) -> bool:
+        """Record the result of a job claimed by :meth:`claim`.
+
+        The result is discarded, and ``False`` returned, when the job is no longer claimed by
+        its worker, as when it was given back to the queue by :meth:`requeue_stale`.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                update(_jobs)
+                .where(
+                    _jobs.c.id == job.id,
+                    _jobs.c.worker == job.worker,
+                    _jobs.c.status == "running",
+                )
+                .values(status="done", result=json.dumps(asdict(result)))
+            )
+        return cursor.rowcount == 1
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Give back the jobs claimed more than ``older_than`` seconds ago, and not completed.
+
+        Use it to recover the jobs of workers that died. Returns the number of jobs requeued.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                update(_jobs)
+                .where(_jobs.c.status == "running", _jobs.c.claimed_at < time.time() - older_than)
+                .values(status="pending", worker=None, claimed_at=None)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of jobs per status: ``pending``, ``running`` and ``done``."""
+        with self._connect() as conn:
+            rows = conn.execute(select(_jobs.c.status, func.count()).group_by(_jobs.c.status))
+            return {"pending": 0, "running": 0, "done": 0, **dict(rows.all())}
+
+    def results(self) -> list[CheckResult]:
+        """Return the results of the completed jobs, in the order they were submitted.
+
+        Each result is named after the ``alembic.ini`` file of its tree, as in
+        ``services/billing/alembic.ini::stairway[ae1027a6acf]``.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                select(_jobs.c.alembic_ini_location, _jobs.c.result)
+                .where(_jobs.c.status == "done")
+                .order_by(_jobs.c.id)
+            ).all()
+        results = []
+        for ini, data in rows:
+            result = CheckResult(**json.loads(data))
+            results.append(replace(result, name=f"{ini}::{result.name}"))
+        return results
+
+    def _check_host(self) -> None:
+        host = socket.gethostname()
+        with self._connect() as conn:
+            recorded = conn.execute(select(_host.c.name)).scalar()
+            if recorded is None:
+                conn.execute(_host.insert().values(name=host))
+        if recorded is not None and recorded != host:
+            raise ValueError(
+                f"The job queue {self.uri} was created on {recorded}, and SQLite locks are not "
+                "reliable across hosts: use a database server to share a queue between machines"
+            )
+
+    @contextmanager
+    def _connect(self) -> Generator[Connection, None, None]:
+        # a new engine each time keeps the queue picklable, for workers started as processes
+        connect_args = {"timeout": self.timeout} if self._sqlite else {}
+        engine = create_engine(self.uri, poolclass=NullPool, connect_args=connect_args)
+        try:
+            with engine.begin() as conn:
+                yield conn
+        finally:
+            engine.dispose()
+
+
+def run_worker(
+    queue: JobQueue,
+    server_uri: str,
+    worker_id: str | None = None,
+    idle_timeout: float = 0.0,
+    poll_interval: float = 1.0,
+) -> int:
+    """Run the jobs of ``queue`` until it stays empty for ``idle_timeout`` seconds.
+
+    Each check runs on its own temporary database on the server of ``server_uri``. The worker
+    is named after its host and process unless ``worker_id`` is given. Returns the number of
+    jobs run.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    idle_since = time.monotonic()
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            if time.monotonic() - idle_since >= idle_timeout:
+                return done
+            time.sleep(poll_interval)
+            continue
+        uri = get_temporary_uri(server_uri)
+        queue.complete(job, run_check(job.check, job.target, uri, job.alembic_ini_location))
+        done += 1
+        idle_since = time.monotonic()
+
+
+def wait_for_results(
+    queue: JobQueue,
+    timeout: float | None = None,
+    poll_interval: float = 1.0,
+    stale_after: float | None = None,
+) -> list[CheckResult]:
+    """Wait until every job of ``queue`` is completed, and return the merged results.
+
+    With ``stale_after``, jobs claimed longer ago than that are given back to the queue, for
+    another worker to run. Raises ``TimeoutError`` when jobs are still left after ``timeout``
+    seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if stale_after is not None:
+            queue.requeue_stale(stale_after)
+        counts = queue.counts()
+        if not counts["pending"] and not counts["running"]:
+            return queue.results()
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(
+                f"{counts['pending']} pending and {counts['running']} running jobs left"
+            )
+        time.sleep(poll_interval)
@@ -0,0 +1,177 @@
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from sqlalchemy import create_engine, event, pool
+from sqlalchemy.engine import Connection, Engine, make_url
+
+from alembicverify.util import same_database
+
+
+_SERVER_SESSIONS = {
+    "postgresql": "SELECT count(*) FROM pg_stat_activity "
+    "WHERE datname = current_database() AND pid <> pg_backend_pid()",
+    "mysql": "SELECT count(*) FROM information_schema.processlist "
+    "WHERE db = DATABASE() AND id <> CONNECTION_ID()",
+    "mariadb": "SELECT count(*) FROM information_schema.processlist "
+    "WHERE db = DATABASE() AND id <> CONNECTION_ID()",
+}
+# frames of these packages are left out of the stacks of leaks
+_IGNORED_PACKAGES = {"sqlalchemy", "pytest", "_pytest", "pluggy"}
+_STACK_DEPTH = 15
+
+
+@dataclass(frozen=True)
+class Leak:
+    """A connection to a database left open, with the stack that opened or checked it out."""
+
+    kind: str
+    message: str
+    stack: str = ""
+
+    def __str__(self) -> str:
+        return f"{self.message}\n{self.stack}" if self.stack else self.message
+
+
+@dataclass
+class _TrackedConnection:
+    dbapi_connection: Any
+    opened_at: str
+    checked_out_at: str | None = None
+    url: Any = None
+
+
+class LeakTracker:
+    """Track the connections opened to a database, to find those left open at the end of a test.
+
+    While the tracker is active, every DBAPI connection opened by a SQLAlchemy pool is recorded
+    with the stack that opened it, and the stack of its last checkout. Connections used by an
+    engine bound to ``db_uri`` and not closed when the tracker stops are reported by
+    :meth:`leaks`: those checked out and never returned, and those left in the pool of an engine
+    that was not disposed. On PostgreSQL and MySQL, the other sessions still connected to the
+    database on the server, such as those of subprocesses, are reported as well.
+    """
+
+    def __init__(self, db_uri: str) -> None:
+        self.db_uri = db_uri
+        self._target = make_url(db_uri)
+        self._connections: dict[int, _TrackedConnection] = {}
+        self._listeners = [
+            (pool.Pool, "connect", self._on_connect),
+            (pool.Pool, "checkout", self._on_checkout),
+            (pool.Pool, "checkin", self._on_checkin),
+            (pool.Pool, "close", self._on_close),
+            (pool.Pool, "close_detached", self._on_close_detached),
+            (Engine, "engine_connect", self._on_engine_connect),
+        ]
+
+    def __enter__(self) -> "LeakTracker":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Start tracking connections."""
+        for target, name, fn in self._listeners:
+            event.listen(target, name, fn)
+
+    def stop(self) -> None:
+        """Stop tracking connections, keeping those opened so far."""
+        for target, name, fn in self._listeners:
+            event.remove(target, name, fn)
+
+    def leaks(self) -> list[Leak]:
+        """Return the connections to the database that are still open."""
+        database = self._target.database
+        leaks = []
+        for tracked in self._leaked():
+            if tracked.checked_out_at is not None:
+                message = f"a connection to {database} was checked out and never returned, at:"
+                leaks.append(Leak("checkout", message, tracked.checked_out_at))
+            else:
+                message = (
+                    f"a connection to {database} is still open in the pool of an engine that "
+                    "was not disposed, opened at:"
+                )
+                leaks.append(Leak("engine", message, tracked.opened_at))
+
+        sessions = self._server_sessions()
+        if sessions is not None and sessions > len(leaks):
+            others = sessions - len(leaks)
+            leaks.append(Leak("backend", f"{others} other sessions are connected to {database}"))
+        return leaks
+
+    def close(self) -> None:
+        """Close the DBAPI connections that leaked, so that the database can be dropped."""
+        for tracked in self._leaked():
+            try:
+                tracked.dbapi_connection.close()
+            except Exception:
+                pass
+        self._connections.clear()
+
+    def _leaked(self) -> list[_TrackedConnection]:
+        return [
+            tracked
+            for tracked in self._connections.values()
+            if tracked.url is not None and same_database(tracked.url, self._target)
+        ]
+
+    def _server_sessions(self) -> int | None:
+        query = _SERVER_SESSIONS.get(self._target.get_backend_name())
+        if query is None:
+            return None
+        engine = create_engine(self.db_uri, poolclass=pool.NullPool)
+        try:
+            with engine.connect() as conn:
+                return conn.exec_driver_sql(query).scalar()
+        finally:
+            engine.dispose()
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        self._connections[id(dbapi_connection)] = _TrackedConnection(dbapi_connection, _stack())
+
+    def _on_checkout(
+        self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        tracked = self._connections.get(id(dbapi_connection))
+        if tracked is not None:
+            tracked.checked_out_at = _stack()
+
+    def _on_checkin(self, dbapi_connection: Any, connection_record: Any) -> None:
+        tracked = self._connections.get(id(dbapi_connection))
+        if tracked is not None:
+            tracked.checked_out_at = None
+
+    def _on_close(self, dbapi_connection: Any, connection_record: Any) -> None:
+        self._connections.pop(id(dbapi_connection), None)
+
+    def _on_close_detached(self, dbapi_connection: Any) -> None:
+        self._connections.pop(id(dbapi_connection), None)
+
+    def _on_engine_connect(self, connection: Connection, *args: Any) -> None:
+        # pool events do not know the URL of the engine, so it is recorded on first use
+        dbapi_connection = connection.connection.dbapi_connection
+        tracked = self._connections.get(id(dbapi_connection))
+        if tracked is not None and tracked.url is None:
+            tracked.url = connection.engine.url
+
+
+def _stack() -> str:
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename != __file__
+        and not frame.filename.startswith("<frozen")
+        and _IGNORED_PACKAGES.isdisjoint(Path(frame.filename).parts)
+    ]
+    return "".join(traceback.format_list(frames[-_STACK_DEPTH:]))
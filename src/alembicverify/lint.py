@@ -0,0 +1,169 @@
+import os
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from alembicverify.offline import render_migrations
+
+
+_NOT_RENDERED = "-- could not render offline:"
+_SKIPPED = re.compile(r"^(BEGIN|COMMIT|START TRANSACTION)\b|\balembic_version\b", re.IGNORECASE)
+
+_CREATE_TABLE = re.compile(
+    r"^CREATE (?:(?:GLOBAL |LOCAL )?(?:TEMPORARY |TEMP )|UNLOGGED )?TABLE (?:IF NOT EXISTS )?"
+    r"([^\s(]+)",
+    re.IGNORECASE,
+)
+_CREATE_INDEX = re.compile(r"^CREATE (?:UNIQUE )?INDEX (?!CONCURRENTLY\b)", re.IGNORECASE)
+_INDEX_TABLE = re.compile(r"\bON (?:ONLY )?([^\s(]+)", re.IGNORECASE)
+_ADD_INDEX = re.compile(r"^ALTER TABLE \S+ ADD (?:UNIQUE )?(?:INDEX|KEY)\b", re.IGNORECASE)
+_ALTER_TYPE = re.compile(
+    r"^ALTER TABLE \S+ (?:ALTER COLUMN \S+ (?:SET DATA )?TYPE|MODIFY|CHANGE)\b", re.IGNORECASE
+)
+_ALTER_TABLE = re.compile(r"^ALTER TABLE (\S+) ", re.IGNORECASE)
+_ADD_COLUMN = re.compile(
+    r"^ADD (?!CONSTRAINT\b|INDEX\b|KEY\b|UNIQUE\b|PRIMARY\b|FOREIGN\b|CHECK\b)", re.IGNORECASE
+)
+_NOT_NULL = re.compile(r"\bNOT NULL\b", re.IGNORECASE)
+_DEFAULT = re.compile(r"\bDEFAULT\b", re.IGNORECASE)
+_SET_NOT_NULL = re.compile(r"^ALTER TABLE \S+ ALTER COLUMN \S+ SET NOT NULL\b", re.IGNORECASE)
+_UNFILTERED = re.compile(r"^(?:UPDATE|DELETE FROM) (?!.*\bWHERE\b)", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Hazard:
+    """An operation of a revision known to be slow or blocking on large tables."""
+
+    revision: str
+    rule: str
+    severity: str
+    message: str
+    statement: str = ""
+
+    def __str__(self) -> str:
+        return f"{self.revision}: {self.severity}: {self.rule}: {self.message}"
+
+
+def lint_migrations(
+    alembic_ini_location: str | os.PathLike[str],
+    dialect: str,
+    revisions: Iterable[str] | None = None,
+    jobs: int = 1,
+) -> list[Hazard]:
+    """Render the upgrade SQL of the revisions offline for ``dialect``, and lint it.
+
+    See :func:`~alembicverify.offline.render_migrations` for the rendering, and
+    :func:`lint_sql` for the rules.
+    """
+    backend = dialect.split("://")[0].split("+")[0]
+    return [
+        hazard
+        for rendered in render_migrations(alembic_ini_location, dialect, revisions, jobs)
+        for hazard in lint_sql(rendered.upgrade, backend, rendered.revision)
+    ]
+
+
+def lint_golden_files(directory: str | os.PathLike[str], dialect: str) -> list[Hazard]:
+    """Lint the upgrade SQL stored by :func:`~alembicverify.offline.write_golden_files`."""
+    return [
+        hazard
+        for path in sorted(Path(directory).glob("*.upgrade.sql"))
+        for hazard in lint_sql(path.read_text(), dialect, path.name.split(".")[0])
+    ]
+
+
+def lint_sql(sql: str, dialect: str = "postgresql", revision: str = "") -> list[Hazard]:
+    """Find the operations of the SQL of a revision that are slow or blocking on large tables.
+
+    - ``create-index``: an index is built without ``CONCURRENTLY``, blocking writes to the table
+      (an error on PostgreSQL, which can build it concurrently, and a warning elsewhere).
+    - ``alter-column-type``: the type of a column changes, which can rewrite the table under an
+      exclusive lock.
+    - ``not-null-without-default``: a ``NOT NULL`` column is added without a default, which fails
+      on a table with rows, or rewrites it.
+    - ``set-not-null``: a column becomes ``NOT NULL``, which scans the table under an exclusive
+      lock.
+    - ``full-table-update``: an ``UPDATE`` or ``DELETE`` has no ``WHERE`` clause, and rewrites
+      every row of the table in a single transaction.
+
+    The indexes and ``NOT NULL`` columns of tables created earlier in the same SQL are not
+    reported, as no one uses those tables yet. SQL that could not be rendered offline is
+    reported as a ``not-rendered`` warning.
+    """
+    hazards = []
+    created: set[str] = set()
+    for statement in _statements(sql):
+        if statement.startswith(_NOT_RENDERED):
+            message = statement[len(_NOT_RENDERED) :].strip()
+            hazards.append(Hazard(revision, "not-rendered", "warning", message))
+            continue
+        create_table = _CREATE_TABLE.match(statement)
+        if create_table is not None:
+            created.add(_unquote(create_table.group(1)))
+        for rule, severity, message in _check(statement, dialect, created):
+            hazards.append(Hazard(revision, rule, severity, message, statement))
+    return hazards
+
+
+def _check(statement: str, dialect: str, created: set[str]) -> Iterator[tuple[str, str, str]]:
+    alter_table = _ALTER_TABLE.match(statement)
+    index_table = _INDEX_TABLE.search(statement) if _CREATE_INDEX.match(statement) else None
+    table = alter_table or index_table
+    new = table is not None and _unquote(table.group(1)) in created
+
+    if (index_table is not None or _ADD_INDEX.match(statement)) and not new:
+        severity = "error" if dialect == "postgresql" else "warning"
+        yield "create-index", severity, "the index is built while writes to the table wait"
+    if _ALTER_TYPE.match(statement):
+        yield "alter-column-type", "error", "changing the type of a column can rewrite the table"
+    if _SET_NOT_NULL.match(statement) and not new:
+        yield "set-not-null", "warning", "the whole table is scanned to check for NULL values"
+    if alter_table is not None and not new:
+        for clause in _clauses(statement[alter_table.end() :]):
+            if (
+                _ADD_COLUMN.match(clause)
+                and _NOT_NULL.search(clause)
+                and not _DEFAULT.search(clause)
+            ):
+                yield (
+                    "not-null-without-default",
+                    "error",
+                    "adding a NOT NULL column without a default fails on a table with rows",
+                )
+    if _UNFILTERED.match(statement):
+        yield "full-table-update", "warning", "every row of the table is rewritten at once"
+
+
+def _statements(sql: str) -> Iterator[str]:
+    lines: list[str] = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(_NOT_RENDERED):
+            yield stripped
+        if not stripped or stripped.startswith("--"):
+            continue
+        lines.append(stripped)
+        if stripped.endswith(";"):
+            statement = " ".join(" ".join(lines).rstrip(";").split())
+            lines = []
+            if not _SKIPPED.search(statement):
+                yield statement
+
+
+def _clauses(definition: str) -> Iterator[str]:
+    # the clauses of an ALTER TABLE are separated by the commas that are not in parentheses
+    depth, start = 0, 0
+    for i, char in enumerate(definition):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            yield definition[start:i].strip()
+            start = i + 1
+    yield definition[start:].strip()
+
+
+def _unquote(name: str) -> str:
+    return name.replace('"', "").replace("`", "").replace("[", "").replace("]", "")
@@ -0,0 +1,169 @@
+import ast
+import os
+import re
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType, TracebackType
+from typing import Any
+
+from alembic import util
+from alembic.config import Config
+from alembic.script import Script, ScriptDirectory
+from alembic.script.base import _only_source_rev_file
+
+
+# the class method alembic loads each revision file with, which took a path in alembic 1.16
+_LOADER = "_from_path" if "_from_path" in Script.__dict__ else "_from_filename"
+_HEADERS = {"revision", "down_revision", "branch_labels", "depends_on"}
+# the headers alembic reads with a default, which revision files may leave out
+_OPTIONAL_HEADERS = ("branch_labels", "depends_on")
+
+
+@dataclass(frozen=True)
+class ImportProfile:
+    """The time and memory spent importing the file of a revision.
+
+    ``memory`` is the memory allocated by Python during the import and still held after it, in
+    bytes.
+    """
+
+    revision: str
+    path: str
+    seconds: float
+    memory: int
+
+
+def profile_imports(config: Config) -> list[ImportProfile]:
+    """Import the file of every revision of ``config``, and measure each import, slowest first.
+
+    Packages imported by several revision files are charged to the first file importing them,
+    and packages the process already imported to none of them, so the measures are the most
+    telling in a fresh process, like the one of ``alembic-verify imports``.
+    """
+    profiles = []
+    loader = Script.__dict__[_LOADER]
+    original = loader.__func__
+
+    def measured(cls: type[Script], scriptdir: ScriptDirectory, *args: Any) -> Script | None:
+        memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        script = original(cls, scriptdir, *args)
+        seconds = time.perf_counter() - start
+        if script is not None:
+            memory = tracemalloc.get_traced_memory()[0] - memory
+            profiles.append(ImportProfile(script.revision, script.path, seconds, memory))
+        return script
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    setattr(Script, _LOADER, classmethod(measured))
+    try:
+        ScriptDirectory.from_config(config).get_heads()
+    finally:
+        setattr(Script, _LOADER, loader)
+        if started_tracing:
+            tracemalloc.stop()
+    return sorted(profiles, key=lambda profile: profile.seconds, reverse=True)
+
+
+def read_headers(path: str | os.PathLike[str]) -> dict[str, Any] | None:
+    """Read the ``revision``, ``down_revision``, ``branch_labels`` and ``depends_on`` of a
+    revision file, and its docstring as ``__doc__``, without importing it.
+
+    ``branch_labels`` and ``depends_on`` default to ``None``, as in alembic. Returns ``None``
+    when the file does not assign ``revision``, or assigns one of them anything but a literal.
+    """
+    tree = ast.parse(Path(path).read_bytes(), filename=os.fspath(path))
+    headers: dict[str, Any] = {
+        "__doc__": ast.get_docstring(tree, clean=False),
+        **dict.fromkeys(_OPTIONAL_HEADERS),
+    }
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in _HEADERS:
+                try:
+                    headers[target.id] = ast.literal_eval(value)
+                except ValueError:
+                    return None
+    return headers if "revision" in headers else None
+
+
+class LazyModule(ModuleType):
+    """The module of a revision file, holding its headers, and imported on first use of any other
+    attribute, such as ``upgrade`` or ``downgrade``."""
+
+    def __init__(self, path: Path, headers: dict[str, Any]) -> None:
+        headers = dict(headers)
+        super().__init__(re.sub(r"\W", "_", path.name), headers.pop("__doc__", None))
+        self.__file__ = str(path)
+        self.__dict__.update(headers)
+
+    @property
+    def is_loaded(self) -> bool:
+        return "_module" in self.__dict__
+
+    def __getattr__(self, name: str) -> Any:
+        # called for the attributes the headers do not hold, the private ones alembic probes
+        # with hasattr included
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if not self.is_loaded:
+            path = Path(self.__file__ or "")
+            self.__dict__["_module"] = util.load_python_file(path.parent, path.name)
+        return getattr(self.__dict__["_module"], name)
+
+
+class LazyRevisionLoader:
+    """Load revision files lazily while it is active.
+
+    Alembic imports the file of every revision to build the revision graph, before running any of
+    them. While the loader is active, only the headers of the files are parsed for the graph (see
+    :func:`read_headers`), and each file is imported the first time one of its functions runs.
+    Migrations that run a few revisions, like those of a reused, cloned or baseline database, no
+    longer pay for the imports of all the others. Files with headers that are not literals are
+    imported right away, as usual.
+    """
+
+    def __init__(self) -> None:
+        self._original: Any = None
+
+    def __enter__(self) -> "LazyRevisionLoader":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Start loading revision files lazily."""
+        self._original = Script.__dict__[_LOADER]
+        setattr(Script, _LOADER, classmethod(self._load))
+
+    def stop(self) -> None:
+        """Load revision files eagerly again."""
+        if self._original is not None:
+            setattr(Script, _LOADER, self._original)
+            self._original = None
+
+    def _load(self, cls: type[Script], scriptdir: ScriptDirectory, *args: Any) -> Script | None:
+        path = Path(*args)
+        headers = None
+        if not scriptdir.sourceless and _only_source_rev_file.match(path.name):
+            headers = read_headers(path)
+        if headers is None:
+            return self._original.__func__(cls, scriptdir, *args)
+        return Script(LazyModule(path, headers), headers["revision"], os.fspath(path))
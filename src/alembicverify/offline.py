@@ -0,0 +1,164 @@
+import difflib
+import io
+import multiprocessing
+import os
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.environment import EnvironmentContext
+from alembic.runtime.migration import MigrationStep
+from alembic.script import ScriptDirectory
+
+from alembicverify.graph import RevisionGraph
+from alembicverify.util import config_from_ini
+
+
+DIRECTIONS = ("upgrade", "downgrade")
+
+
+@dataclass(frozen=True)
+class RenderedRevision:
+    """The SQL of the upgrade and downgrade of a revision, as rendered in offline mode."""
+
+    revision: str
+    upgrade: str
+    downgrade: str
+
+
+def render_migrations(
+    alembic_ini_location: str | os.PathLike[str],
+    dialect: str,
+    revisions: Iterable[str] | None = None,
+    jobs: int = 1,
+) -> list[RenderedRevision]:
+    """Render the SQL of the migrations configured in an ``alembic.ini`` file, without a database.
+
+    Each revision is rendered on its own, like ``alembic upgrade <down>:<revision> --sql``, by
+    the offline branch of ``env.py``, for ``dialect``: a backend name such as ``"postgresql"``,
+    or a URI. All the revisions are rendered, bases first, unless ``revisions`` are given. With
+    ``jobs`` greater than one, revisions are rendered in that many worker processes.
+
+    Migrations that cannot run offline, such as batch operations on SQLite, render as a
+    ``-- could not render offline`` comment with the error.
+    """
+    ini = os.fspath(alembic_ini_location)
+    uri = dialect if "://" in dialect else f"{dialect}://"
+    if revisions is None:
+        script = ScriptDirectory.from_config(config_from_ini(uri, ini))
+        revisions = RevisionGraph.from_script(script).order
+    revisions = list(revisions)
+
+    if jobs <= 1 or len(revisions) <= 1:
+        return _render_chunk(ini, uri, revisions)
+    # alembic keeps the migration context in module-level globals, so each worker process
+    # renders its share of the revisions on its own
+    chunks = [revisions[i::jobs] for i in range(jobs)]
+    with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+        rendered = {
+            result.revision: result
+            for chunk in executor.map(_render_chunk, [ini] * jobs, [uri] * jobs, chunks)
+            for result in chunk
+        }
+    return [rendered[revision] for revision in revisions]
+
+
+def write_golden_files(
+    rendered: Iterable[RenderedRevision], directory: str | os.PathLike[str]
+) -> None:
+    """Write the rendered SQL as ``<revision>.upgrade.sql`` and ``<revision>.downgrade.sql``.
+
+    Golden files of revisions that are not in ``rendered`` are removed.
+    """
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    expected = set()
+    for revision in rendered:
+        for direction in DIRECTIONS:
+            golden = path / f"{revision.revision}.{direction}.sql"
+            golden.write_text(getattr(revision, direction))
+            expected.add(golden.name)
+    for golden in path.glob("*.sql"):
+        if golden.name not in expected:
+            golden.unlink()
+
+
+def diff_golden_files(
+    rendered: Iterable[RenderedRevision], directory: str | os.PathLike[str]
+) -> dict[str, str]:
+    """Compare the rendered SQL with the golden files, returning a diff per changed revision.
+
+    New revisions, and revisions whose golden files have no rendered counterpart, count as
+    changed. The keys of the result are the revisions worth verifying on a live database.
+    """
+    path = Path(directory)
+    current = {
+        (revision.revision, direction): getattr(revision, direction)
+        for revision in rendered
+        for direction in DIRECTIONS
+    }
+    stored = {
+        tuple(golden.name.rsplit(".", 2)[:2]): golden.read_text()
+        for golden in path.glob("*.sql")
+        if golden.name.count(".") >= 2
+    }
+
+    diffs: dict[str, list[str]] = {}
+    for revision, direction in sorted(current.keys() | stored.keys()):
+        old, new = stored.get((revision, direction), ""), current.get((revision, direction), "")
+        if old != new:
+            name = f"{revision}.{direction}.sql"
+            diffs.setdefault(revision, []).extend(
+                difflib.unified_diff(
+                    old.splitlines(keepends=True),
+                    new.splitlines(keepends=True),
+                    f"a/{name}",
+                    f"b/{name}",
+                )
+            )
+    return {revision: "".join(lines) for revision, lines in diffs.items()}
+
+
+def _render_chunk(
+    alembic_ini_location: str, uri: str, revisions: Sequence[str]
+) -> list[RenderedRevision]:
+    config = config_from_ini(uri, alembic_ini_location)
+    script = ScriptDirectory.from_config(config)
+    return [
+        RenderedRevision(
+            revision,
+            _render(config, script, revision, "upgrade"),
+            _render(config, script, revision, "downgrade"),
+        )
+        for revision in revisions
+    ]
+
+
+def _render(config: Config, script: ScriptDirectory, revision: str, direction: str) -> str:
+    script_revision = script.get_revision(revision)
+    assert script_revision is not None
+    if direction == "upgrade":
+        starting_rev = list(script_revision._versioned_down_revisions) or None
+        step = MigrationStep.upgrade_from_script(script.revision_map, script_revision)
+    else:
+        starting_rev = [script_revision.revision]
+        step = MigrationStep.downgrade_from_script(script.revision_map, script_revision)
+
+    buffer = io.StringIO()
+    config.output_buffer = buffer
+    try:
+        with EnvironmentContext(
+            config,
+            script,
+            fn=lambda rev, context: [step],
+            as_sql=True,
+            starting_rev=starting_rev,
+            destination_rev=revision,
+        ):
+            script.run_env()
+    except Exception as exc:
+        # some operations need a live database, such as batch operations on SQLite
+        return f"-- could not render offline: {type(exc).__name__}: {exc}\n"
+    return buffer.getvalue()
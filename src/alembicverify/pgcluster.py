@@ -0,0 +1,175 @@
+import glob
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+
+# Durability is pointless for a cluster that is thrown away at the end of the run.
+DEFAULT_SETTINGS = {
+    "fsync": "off",
+    "synchronous_commit": "off",
+    "full_page_writes": "off",
+    "wal_level": "minimal",
+    "max_wal_senders": "0",
+    "max_connections": "200",
+}
+
+
+class EphemeralPostgres:
+    """A private PostgreSQL cluster, run from the local PostgreSQL binaries.
+
+    The cluster lives in a RAM-backed directory (``/dev/shm`` where available), only listens
+    on a Unix socket in that directory, and is configured for speed rather than durability.
+    Use it as a context manager, or call :meth:`start` and :meth:`stop`.
+
+    The binaries are looked up in ``bindir``, then on the ``PATH``, then through
+    ``pg_config --bindir``, then in the usual Debian/Ubuntu install locations.
+    """
+
+    def __init__(
+        self,
+        bindir: str | os.PathLike[str] | None = None,
+        base_dir: str | os.PathLike[str] | None = None,
+        user: str = "postgres",
+        port: int = 5432,
+        settings: dict[str, str] | None = None,
+    ):
+        self.bindir = Path(bindir) if bindir is not None else None
+        self.base_dir = base_dir
+        self.user = user
+        self.port = port
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.directory: Path | None = None
+        self._bindir: Path | None = None
+
+    @property
+    def data_dir(self) -> Path:
+        return self._directory / "data"
+
+    @property
+    def socket_dir(self) -> Path:
+        return self._directory
+
+    @property
+    def uri(self) -> str:
+        """The URI of the ``postgres`` maintenance database of the cluster."""
+        return self.database_uri("postgres")
+
+    def database_uri(self, database: str) -> str:
+        """Return the URI of a database of the cluster."""
+        host = quote(str(self.socket_dir), safe="")
+        return f"postgresql://{self.user}@/{database}?host={host}&port={self.port}"
+
+    def start(self) -> None:
+        if self.directory is not None:
+            raise RuntimeError("The cluster is already running")
+
+        bindir = self._bindir = self.bindir or find_postgres_bindir()
+        self.directory = Path(tempfile.mkdtemp(prefix="alembicverify-pg-", dir=_ram_dir(self)))
+        try:
+            _run(
+                bindir / "initdb",
+                "--pgdata",
+                self.data_dir,
+                "--username",
+                self.user,
+                "--auth",
+                "trust",
+                "--encoding",
+                "UTF8",
+                "--no-sync",
+            )
+            settings = {
+                **self.settings,
+                "listen_addresses": "''",
+                "port": str(self.port),
+                "unix_socket_directories": f"'{self.socket_dir}'",
+            }
+            with (self.data_dir / "postgresql.conf").open("a") as conf:
+                conf.write("\n# alembic-verify\n")
+                conf.writelines(f"{name} = {value}\n" for name, value in settings.items())
+            _run(
+                bindir / "pg_ctl",
+                "--pgdata",
+                self.data_dir,
+                "--log",
+                self._directory / "postgresql.log",
+                "--wait",
+                "start",
+            )
+        except BaseException:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self.directory = None
+            raise
+
+    def stop(self) -> None:
+        if self.directory is None or self._bindir is None:
+            return
+        try:
+            _run(
+                self._bindir / "pg_ctl",
+                "--pgdata",
+                self.data_dir,
+                "--mode",
+                "immediate",
+                "--wait",
+                "stop",
+            )
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self) -> "EphemeralPostgres":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
+
+    @property
+    def _directory(self) -> Path:
+        if self.directory is None:
+            raise RuntimeError("The cluster is not running")
+        return self.directory
+
+
+def find_postgres_bindir() -> Path:
+    """Find the directory of the local PostgreSQL server binaries."""
+    pg_ctl = shutil.which("pg_ctl")
+    if pg_ctl is not None:
+        return Path(pg_ctl).parent
+
+    pg_config = shutil.which("pg_config")
+    if pg_config is not None:
+        bindir = Path(subprocess.check_output([pg_config, "--bindir"], text=True).strip())
+        if (bindir / "pg_ctl").exists():
+            return bindir
+
+    candidates = glob.glob("/usr/lib/postgresql/*/bin/pg_ctl")
+    if candidates:
+        newest = max(candidates, key=lambda path: [int(n) for n in re.findall(r"\d+", path)])
+        return Path(newest).parent
+
+    raise FileNotFoundError("Could not find the PostgreSQL server binaries (initdb, pg_ctl)")
+
+
+def _ram_dir(cluster: EphemeralPostgres) -> str | None:
+    if cluster.base_dir is not None:
+        return os.fspath(cluster.base_dir)
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return None
+
+
+def _run(*args: str | os.PathLike[str]) -> None:
+    result = subprocess.run([os.fspath(arg) for arg in args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{os.fspath(args[0])} failed with exit code {result.returncode}: "
+            f"{result.stderr.strip()}"
+        )
@@ -0,0 +1,151 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from alembic.runtime.migration import MigrationStep, RevisionStep
+
+
+@dataclass
+class RevisionProfile:
+    """The CPU time and memory spent in the upgrade or downgrade function of a revision.
+
+    ``seconds`` is the wall time of all the ``calls``, and ``peak_memory`` the largest increase of
+    the memory allocated by Python during one of them, in bytes, when tracemalloc is tracing.
+    """
+
+    revision: str
+    direction: str
+    calls: int = 0
+    seconds: float = 0.0
+    peak_memory: int = 0
+    profile: cProfile.Profile = field(default_factory=cProfile.Profile, repr=False, compare=False)
+
+    @property
+    def name(self) -> str:
+        return f"{self.revision}.{self.direction}"
+
+    def top_functions(self, limit: int = 5) -> list[str]:
+        """Describe the functions that took the most time of their own, slowest first."""
+        self.profile.create_stats()
+        stats: dict[Any, Any] = self.profile.stats  # type: ignore[attr-defined]
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+        return [
+            f"{own:.3f}s {calls} calls {filename}:{line}({name})"
+            for (filename, line, name), (_, calls, own, _, _) in rows
+        ]
+
+
+class MigrationProfiler:
+    """Profile the upgrade and downgrade functions of the revisions run while it is active.
+
+    Every revision step that alembic runs, through ``command.upgrade``, ``command.downgrade`` or
+    any function of this library built on them, is timed, profiled with cProfile and, with
+    ``memory``, traced with tracemalloc while it runs, so the rest of the process runs at full
+    speed. When the process already traces memory, its tracing is left alone and memory peaks
+    are not measured. When the profiler stops, the profile of each revision and direction is
+    written to ``directory`` as ``<revision>.<direction>.prof``, which ``pstats`` and tools like
+    snakeviz read, along with the :meth:`summary` in ``summary.txt``. Runs of the same step
+    accumulate.
+
+    Only the current process is profiled: migrations run in worker processes are not.
+    """
+
+    def __init__(self, directory: str | os.PathLike[str], memory: bool = True) -> None:
+        self.directory = Path(directory)
+        self.memory = memory
+        self.profiles: dict[tuple[str, str], RevisionProfile] = {}
+        self._originals: dict[str, Any] = {}
+
+    def __enter__(self) -> "MigrationProfiler":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Start profiling the revision steps."""
+        # alembic builds a step per revision to run with these, so each step is wrapped as it
+        # is built
+        for name in ("upgrade_from_script", "downgrade_from_script"):
+            original = MigrationStep.__dict__[name]
+            self._originals[name] = original
+            setattr(MigrationStep, name, classmethod(self._wrap_factory(original.__func__)))
+
+    def stop(self) -> None:
+        """Stop profiling, and write the profiles and the summary."""
+        for name, original in self._originals.items():
+            setattr(MigrationStep, name, original)
+        self._originals.clear()
+        self.write()
+
+    def write(self) -> None:
+        """Write the profile of each revision and direction, and the summary."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for profile in self.profiles.values():
+            profile.profile.dump_stats(self.directory / f"{profile.name}.prof")
+        (self.directory / "summary.txt").write_text(self.summary())
+
+    def summary(self, top: int = 10) -> str:
+        """Describe the slowest revisions, their slowest functions, and the largest memory peaks."""
+        profiles = sorted(self.profiles.values(), key=lambda p: p.seconds, reverse=True)[:top]
+        lines = ["slowest revisions:"]
+        for profile in profiles:
+            lines.append(f"  {profile.seconds:8.3f}s  {profile.name} ({profile.calls} calls)")
+            lines.extend(f"             {function}" for function in profile.top_functions())
+
+        if self.memory:
+            peaks = sorted(self.profiles.values(), key=lambda p: p.peak_memory, reverse=True)
+            lines.append("largest memory peaks:")
+            for profile in peaks[:top]:
+                megabytes = profile.peak_memory / 2**20
+                lines.append(f"  {megabytes:8.1f} MiB  {profile.name}")
+        return "\n".join(lines) + "\n"
+
+    def _wrap_factory(self, factory: Callable[..., RevisionStep]) -> Callable[..., RevisionStep]:
+        def wrapped(cls: type[MigrationStep], *args: Any, **kwargs: Any) -> RevisionStep:
+            step = factory(cls, *args, **kwargs)
+            direction = "upgrade" if step.is_upgrade else "downgrade"
+            key = (step.revision.revision, direction)
+            profile = self.profiles.setdefault(key, RevisionProfile(*key))
+            step.migration_fn = _profiled(step.migration_fn, profile, self.memory)
+            return step
+
+        return wrapped
+
+
+def _profiled(
+    fn: Callable[..., None], profile: RevisionProfile, memory: bool
+) -> Callable[..., None]:
+    def run(**kw: Any) -> None:
+        # memory is traced around the step alone, unless the process already traces it for
+        # its own purposes, whose peak is not to be reset
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        profile.profile.enable()
+        try:
+            fn(**kw)
+        finally:
+            profile.profile.disable()
+            profile.seconds += time.perf_counter() - start
+            profile.calls += 1
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                profile.peak_memory = max(profile.peak_memory, peak)
+                tracemalloc.stop()
+
+    return run
@@ -1,9 +1,218 @@
+import os
+from collections.abc import Generator
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+from ._cache import VerificationCache
 from ._factories import (
     alembic_config_deprecated_factory,
     alembic_config_factory,
+    environments_factory,
+    migrated_db_factory,
     new_db_deprecated_factory,
     new_db_factory,
+    transaction_factory,
 )
+from .loading import LazyRevisionLoader
+from .pgcluster import EphemeralPostgres
+from .profiling import MigrationProfiler
+from .registry import EngineRegistry
+from .tempdb import TemporaryUris
+
+
+verification_cache_key = pytest.StashKey[VerificationCache]()
+verification_pending_key = pytest.StashKey[str]()
+run_id_key = pytest.StashKey[str]()
+profiler_key = pytest.StashKey[MigrationProfiler]()
+lazy_loader_key = pytest.StashKey[LazyRevisionLoader]()
+
+
+## HOOKS
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("alembic-verify")
+    group.addoption(
+        "--alembic-verify-cache",
+        action="store_true",
+        default=False,
+        help="Skip tests marked with alembic_revision that already passed, as long as the "
+        "revision, its ancestry, env.py and the dialect are unchanged.",
+    )
+    group.addoption(
+        "--alembic-fast-db",
+        action="store_true",
+        default=False,
+        help="Relax durability (fsync, WAL) on the temporary databases created by the "
+        "alembic_new_db fixture, to speed up migrations.",
+    )
+    group.addoption(
+        "--alembic-unlogged-tables",
+        action="store_true",
+        default=False,
+        help="With --alembic-fast-db, create PostgreSQL tables as UNLOGGED.",
+    )
+    group.addoption(
+        "--alembic-reuse-db",
+        action="store_true",
+        default=False,
+        help="Keep the databases of tests marked with alembic_db_revision between runs, and "
+        "reuse them while the migrations are unchanged.",
+    )
+    group.addoption(
+        "--alembic-clone-db",
+        action="store_true",
+        default=False,
+        help="Give tests marked with alembic_db_revision a new database copied from a template "
+        "migrated to that revision, with the fastest copy the backend offers.",
+    )
+    group.addoption(
+        "--alembic-baseline",
+        default=None,
+        metavar="DIR",
+        help="Load the databases of prepare_schema_from_migrations, and of the tests marked with "
+        "alembic_db_revision, from the baseline recorded in DIR, and apply only the later "
+        "revisions.",
+    )
+    group.addoption(
+        "--alembic-detect-leaks",
+        choices=("warn", "fail"),
+        default=None,
+        help="Report the connections to the temporary databases of the alembic_new_db fixture "
+        "left open at the end of a test, with the stack that opened them, as warnings or as "
+        "test errors.",
+    )
+    group.addoption(
+        "--alembic-profile",
+        default=None,
+        metavar="DIR",
+        help="Profile the upgrade and downgrade functions of each revision run by the tests with "
+        "cProfile and tracemalloc, and write the profiles and a summary to DIR.",
+    )
+    group.addoption(
+        "--alembic-lazy-revisions",
+        action="store_true",
+        default=False,
+        help="Build the revision graph from the headers of the revision files, and import each "
+        "file only when one of its revisions runs.",
+    )
+    group.addoption(
+        "--alembic-server-uri",
+        action="append",
+        default=[],
+        dest="alembic_server_uris",
+        metavar="URI",
+        help="A database server to create temporary databases on. Repeat the option to spread "
+        "the databases over several servers.",
+    )
+    group.addoption(
+        "--alembic-sweep-orphans",
+        action="store_true",
+        default=False,
+        help="Drop the temporary databases left behind by earlier runs on the configured "
+        "servers at the start of the session.",
+    )
+    parser.addini(
+        "alembic_server_uris",
+        type="linelist",
+        default=[],
+        help="The database servers to create temporary databases on.",
+    )
+
+
+def pytest_report_header(config: pytest.Config) -> list[str]:
+    lines = []
+    if config.getoption("alembic_fast_db"):
+        unlogged = " with unlogged tables" if config.getoption("alembic_unlogged_tables") else ""
+        lines.append(f"alembic-verify: fast temporary databases{unlogged}")
+    if config.getoption("alembic_reuse_db"):
+        lines.append("alembic-verify: reusing migrated databases")
+    elif config.getoption("alembic_clone_db"):
+        lines.append("alembic-verify: cloning migrated databases")
+    baseline = config.getoption("alembic_baseline")
+    if baseline:
+        lines.append(f"alembic-verify: starting migrations from the baseline in {baseline}")
+    profile_directory = config.getoption("alembic_profile")
+    if profile_directory:
+        lines.append(f"alembic-verify: profiling migrations to {profile_directory}")
+    if config.getoption("alembic_lazy_revisions"):
+        lines.append("alembic-verify: loading revision files lazily")
+    detect_leaks = config.getoption("alembic_detect_leaks")
+    if detect_leaks:
+        lines.append(f"alembic-verify: detecting connection leaks ({detect_leaks})")
+    return lines
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "alembic_revision(revision, config_fixture='alembic_config'): "
+        "the migration revision verified by the test.",
+    )
+    config.addinivalue_line(
+        "markers",
+        "alembic_db_revision(revision): with --alembic-reuse-db, --alembic-clone-db or "
+        "--alembic-baseline, the revision the database of the test is migrated to.",
+    )
+    if config.getoption("alembic_verify_cache") and config.cache is not None:
+        config.stash[verification_cache_key] = VerificationCache(config.cache)
+
+    # xdist hands the same test run id to all the workers
+    workerinput = getattr(config, "workerinput", {})
+    config.stash[run_id_key] = workerinput.get("testrun_uid", uuid4().hex)[:8]
+
+    profile_directory = config.getoption("alembic_profile")
+    if profile_directory:
+        if "workerid" in workerinput:
+            profile_directory = os.path.join(profile_directory, workerinput["workerid"])
+        config.stash[profiler_key] = MigrationProfiler(profile_directory)
+        config.stash[profiler_key].start()
+
+    if config.getoption("alembic_lazy_revisions"):
+        config.stash[lazy_loader_key] = LazyRevisionLoader()
+        config.stash[lazy_loader_key].start()
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    profiler = config.stash.get(profiler_key, None)
+    if profiler is not None:
+        profiler.stop()
+    lazy_loader = config.stash.get(lazy_loader_key, None)
+    if lazy_loader is not None:
+        lazy_loader.stop()
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[None]
+) -> Generator[None, pytest.TestReport, pytest.TestReport]:
+    report = yield
+
+    cache = item.config.stash.get(verification_cache_key, None)
+    key = item.stash.get(verification_pending_key, None)
+    if cache is not None and key is not None:
+        if report.failed:
+            cache.record(item.nodeid, None)
+        elif report.when == "call" and report.passed:
+            cache.record(item.nodeid, key)
+
+    return report
+
+
+def pytest_terminal_summary(terminalreporter: Any, config: pytest.Config) -> None:
+    profiler = config.stash.get(profiler_key, None)
+    if profiler is not None and profiler.profiles:
+        terminalreporter.write_sep("-", "alembic-verify migration profile")
+        terminalreporter.write(profiler.summary(top=5))
+        terminalreporter.write_line(f"writing the profiles to {profiler.directory}")
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    cache = session.config.stash.get(verification_cache_key, None)
+    if cache is not None:
+        cache.save()
 
 
 ## MAIN FIXTURES
@@ -16,6 +225,79 @@ alembic_config = alembic_config_factory(
     name="alembic_config",
 )
 
+alembic_engines = environments_factory(
+    alembic_environments_fixture_name="alembic_environments", name="alembic_engines"
+)
+
+alembic_migrated_db = migrated_db_factory(
+    alembic_db_uri_fixture_name="alembic_migrated_db_uri",
+    alembic_ini_location_fixture_name="alembic_ini_location",
+    name="alembic_migrated_db",
+)
+
+alembic_connection = transaction_factory(
+    migrated_db_fixture_name="alembic_migrated_db", name="alembic_connection"
+)
+
+
+@pytest.fixture(scope="session")
+def alembic_engine_registry() -> Generator[EngineRegistry, None, None]:
+    """Share engines and sessionmakers across the test session, and dispose them at its end."""
+    with EngineRegistry() as registry:
+        yield registry
+
+
+@pytest.fixture(scope="session")
+def alembic_postgres_cluster() -> Generator[EphemeralPostgres, None, None]:
+    """Run a private PostgreSQL cluster for the test session (one per xdist worker)."""
+    with EphemeralPostgres() as cluster:
+        yield cluster
+
+
+@pytest.fixture(scope="session")
+def alembic_server_uris(pytestconfig: pytest.Config) -> list[str]:
+    """The database servers to create temporary databases on, from the options or the ini."""
+    server_uris: list[str] = pytestconfig.getoption("alembic_server_uris") or pytestconfig.getini(
+        "alembic_server_uris"
+    )
+    if not server_uris:
+        pytest.fail(
+            "No database server configured: use --alembic-server-uri, the alembic_server_uris "
+            "ini option, or override the alembic_server_uris fixture.",
+            pytrace=False,
+        )
+    return server_uris
+
+
+@pytest.fixture(scope="session")
+def alembic_temporary_uris(
+    pytestconfig: pytest.Config, alembic_server_uris: list[str]
+) -> TemporaryUris:
+    """Allocate temporary database URIs for the test run, sweeping orphans when asked to."""
+    worker_id = getattr(pytestconfig, "workerinput", {}).get("workerid", "main")
+    temporary_uris = TemporaryUris(alembic_server_uris, pytestconfig.stash[run_id_key], worker_id)
+    # every worker would find the same orphans, so only one of them sweeps
+    if pytestconfig.getoption("alembic_sweep_orphans") and worker_id in ("main", "gw0"):
+        temporary_uris.sweep()
+    return temporary_uris
+
+
+@pytest.fixture(autouse=True)
+def _alembic_verification_cache(request: pytest.FixtureRequest) -> Any:
+    """Skip tests whose revision already passed verification with the same content."""
+    cache = request.config.stash.get(verification_cache_key, None)
+    marker = request.node.get_closest_marker("alembic_revision")
+    if cache is None or marker is None:
+        return
+
+    revision: str = marker.args[0]
+    config = request.getfixturevalue(marker.kwargs.get("config_fixture", "alembic_config"))
+    key = cache.key(config, revision, request.node.path)
+    if cache.is_verified(request.node.nodeid, key):
+        pytest.skip(f"revision {revision} is unchanged since it was last verified")
+    request.node.stash[verification_pending_key] = key
+
+
 # DEPRECATED FIXTURES
 new_db_left = new_db_deprecated_factory(alembic_db_uri_fixture_name="uri_left", name="new_db_left")
 new_db_right = new_db_deprecated_factory(
@@ -0,0 +1,186 @@
+import hashlib
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.reflection import Inspector
+
+
+@dataclass(frozen=True)
+class ColumnDescriptor:
+    """The reflected definition of a column."""
+
+    name: str
+    type: str
+    nullable: bool
+    default: str | None = None
+
+
+@dataclass(frozen=True)
+class TableDescriptor:
+    """The reflected definition of a table.
+
+    Constraints and indexes are described by their structure rather than by their name, as
+    names generated by the database differ from one database to the other.
+    """
+
+    name: str
+    columns: tuple[ColumnDescriptor, ...]
+    primary_key: tuple[str, ...] = ()
+    foreign_keys: tuple[str, ...] = ()
+    indexes: tuple[str, ...] = ()
+    unique_constraints: tuple[str, ...] = ()
+
+    @property
+    def fingerprint(self) -> str:
+        """A hash of the definition of the table."""
+        return hashlib.sha256(repr(self).encode()).hexdigest()
+
+
+def iter_table_descriptors(
+    engine: Engine,
+    schema: str | None = None,
+    *,
+    batch_size: int = 200,
+    exclude: Iterable[str] = ("alembic_version",),
+) -> Iterator[TableDescriptor]:
+    """Reflect the tables of a database one batch at a time, yielding them sorted by name.
+
+    Unlike reflecting into a :class:`~sqlalchemy.MetaData`, nothing is kept once a table has
+    been yielded, and each batch of ``batch_size`` tables is reflected with a handful of catalog
+    queries (on SQLAlchemy 2.0, through the ``get_multi_*`` inspector methods), so memory stays
+    proportional to a batch even on schemas with thousands of tables.
+    """
+    excluded = set(exclude)
+    with engine.connect() as conn:
+        names = sorted(set(inspect(conn).get_table_names(schema=schema)) - excluded)
+        for start in range(0, len(names), batch_size):
+            # a new inspector per batch, so that its reflection cache doesn't grow
+            yield from _reflect_batch(inspect(conn), schema, names[start : start + batch_size])
+
+
+def compare_table_descriptors(
+    actual: Iterable[TableDescriptor], expected: Iterable[TableDescriptor]
+) -> dict[str, list[str]]:
+    """Compare two streams of table descriptors, returning the differences found in each table.
+
+    Both streams must be sorted by table name, as returned by :func:`iter_table_descriptors`.
+    They are walked in step, so only one table from each is held in memory at a time.
+    """
+    differences: dict[str, list[str]] = {}
+    actual_tables, expected_tables = iter(actual), iter(expected)
+    left, right = next(actual_tables, None), next(expected_tables, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left.name < right.name):
+            assert left is not None
+            differences[left.name] = ["unexpected table"]
+            left = next(actual_tables, None)
+        elif left is None or right.name < left.name:
+            differences[right.name] = ["table is missing"]
+            right = next(expected_tables, None)
+        else:
+            problems = diff_table_descriptors(left, right) if left != right else []
+            if problems:
+                differences[left.name] = problems
+            left, right = next(actual_tables, None), next(expected_tables, None)
+    return differences
+
+
+def diff_table_descriptors(actual: TableDescriptor, expected: TableDescriptor) -> list[str]:
+    """Return the differences between two descriptors of the same table."""
+    problems = []
+    actual_columns = {column.name: column for column in actual.columns}
+    expected_columns = {column.name: column for column in expected.columns}
+    for name in expected_columns.keys() - actual_columns.keys():
+        problems.append(f"column {name!r} is missing")
+    for name in actual_columns.keys() - expected_columns.keys():
+        problems.append(f"unexpected column {name!r}")
+    for name in actual_columns.keys() & expected_columns.keys():
+        for field in ("type", "nullable", "default"):
+            got = getattr(actual_columns[name], field)
+            wanted = getattr(expected_columns[name], field)
+            if got != wanted:
+                problems.append(f"column {name!r} {field} is {got!r}, expected {wanted!r}")
+
+    for field in ("primary_key", "foreign_keys", "indexes", "unique_constraints"):
+        got, wanted = getattr(actual, field), getattr(expected, field)
+        if got != wanted:
+            problems.append(f"{field.replace('_', ' ')} is {list(got)}, expected {list(wanted)}")
+    return sorted(problems)
+
+
+def _reflect_batch(
+    inspector: Inspector, schema: str | None, names: list[str]
+) -> Iterator[TableDescriptor]:
+    if not hasattr(inspector, "get_multi_columns"):
+        # SQLAlchemy 1.4 can only reflect one table at a time
+        for name in names:
+            yield _descriptor(
+                name,
+                inspector.get_columns(name, schema=schema),
+                inspector.get_pk_constraint(name, schema=schema),
+                inspector.get_foreign_keys(name, schema=schema),
+                inspector.get_indexes(name, schema=schema),
+                inspector.get_unique_constraints(name, schema=schema),
+            )
+        return
+
+    kwargs: dict[str, Any] = {"schema": schema, "filter_names": names}
+    columns = inspector.get_multi_columns(**kwargs)
+    primary_keys = inspector.get_multi_pk_constraint(**kwargs)
+    foreign_keys = inspector.get_multi_foreign_keys(**kwargs)
+    indexes = inspector.get_multi_indexes(**kwargs)
+    unique_constraints = inspector.get_multi_unique_constraints(**kwargs)
+    for name in names:
+        key = (schema, name)
+        yield _descriptor(
+            name,
+            columns.get(key, []),
+            primary_keys.get(key, {}),
+            foreign_keys.get(key, []),
+            indexes.get(key, []),
+            unique_constraints.get(key, []),
+        )
+
+
+def _descriptor(
+    name: str,
+    columns: Iterable[Any],
+    primary_key: Any,
+    foreign_keys: Iterable[Any],
+    indexes: Iterable[Any],
+    unique_constraints: Iterable[Any],
+) -> TableDescriptor:
+    return TableDescriptor(
+        name=name,
+        columns=tuple(
+            ColumnDescriptor(
+                name=column["name"],
+                type=str(column["type"]),
+                nullable=bool(column["nullable"]),
+                default=None if column.get("default") is None else str(column["default"]),
+            )
+            for column in columns
+        ),
+        primary_key=tuple((primary_key or {}).get("constrained_columns") or ()),
+        foreign_keys=tuple(
+            sorted(
+                f"({', '.join(fk['constrained_columns'])}) -> "
+                f"{fk['referred_schema'] + '.' if fk.get('referred_schema') else ''}"
+                f"{fk['referred_table']}({', '.join(fk['referred_columns'])})"
+                for fk in foreign_keys
+            )
+        ),
+        indexes=tuple(
+            sorted(
+                f"{'unique ' if index.get('unique') else ''}"
+                f"({', '.join(str(c) for c in index['column_names'])})"
+                for index in indexes
+            )
+        ),
+        unique_constraints=tuple(
+            sorted(f"({', '.join(uc['column_names'])})" for uc in unique_constraints)
+        ),
+    )
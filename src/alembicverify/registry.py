@@ -0,0 +1,75 @@
+import threading
+from typing import Any
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+
+class EngineRegistry:
+    """Reuse engines and sessionmakers across library calls.
+
+    Engines are keyed by URI and engine options, so that preparing several revisions of the same
+    database, or opening many sessions on it, doesn't churn connection pools and compiled caches.
+    Sessionmakers bound to the engines of the registry are cached along with them, and go away
+    when the engines are released or disposed.
+
+    Pass the registry to :func:`~alembicverify.util.prepare_schema_from_migrations` and
+    :func:`~alembicverify.util.session_for_engine`, and call :meth:`dispose` (or use the registry
+    as a context manager) to dispose all the engines at once.
+    """
+
+    def __init__(self) -> None:
+        self._engines: dict[tuple[str, str], Engine] = {}
+        self._sessionmakers: dict[Engine, sessionmaker] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._engines)
+
+    def __enter__(self) -> "EngineRegistry":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.dispose()
+
+    def get_engine(self, uri: str, **options: Any) -> Engine:
+        """Return the engine for ``uri`` and ``options``, creating it on first use."""
+        key = (uri, repr(sorted(options.items())))
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self._engines[key] = create_engine(uri, **options)
+            return engine
+
+    def sessionmaker(self, engine: Engine) -> sessionmaker:
+        """Return a sessionmaker bound to ``engine``.
+
+        The sessionmaker of an engine of the registry is created on first use and cached until
+        the engine is released. Other engines get a new sessionmaker on every call, as caching it
+        would keep them alive.
+        """
+        with self._lock:
+            factory = self._sessionmakers.get(engine)
+            if factory is None:
+                factory = sessionmaker(bind=engine)
+                if any(owned is engine for owned in self._engines.values()):
+                    self._sessionmakers[engine] = factory
+            return factory
+
+    def release(self, uri: str) -> None:
+        """Dispose and forget the engines for ``uri``, for example before dropping its database."""
+        with self._lock:
+            for key in [key for key in self._engines if key[0] == uri]:
+                self._dispose(self._engines.pop(key))
+
+    def dispose(self) -> None:
+        """Dispose and forget all the engines."""
+        with self._lock:
+            while self._engines:
+                _, engine = self._engines.popitem()
+                self._dispose(engine)
+
+    def _dispose(self, engine: Engine) -> None:
+        self._sessionmakers.pop(engine, None)
+        engine.dispose()
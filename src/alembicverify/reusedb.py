@@ -0,0 +1,72 @@
+import hashlib
+import re
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, pool
+from sqlalchemy_utils import create_database, database_exists, drop_database
+
+from alembicverify.fingerprint import environment_fingerprint, revision_fingerprints
+from alembicverify.tempdb import get_temporary_uri
+
+
+REUSE_PREFIX = "reuse_"
+
+
+def reusable_uri(
+    uri: str, config: Config, revision: str, worker_id: str = "main", prefix: str = REUSE_PREFIX
+) -> str:
+    """Return the URI of the reusable database holding the migrations of ``config`` at ``revision``.
+
+    The database lives on the same server as ``uri``, and its name is derived from the content
+    of the revision and its ancestry, ``env.py`` and the dialect, followed by the revision
+    itself, so any change to the migrations leads to a new database. xdist workers get a
+    database each. Databases kept for other purposes, such as clone templates, use another
+    ``prefix``.
+    """
+    script = ScriptDirectory.from_config(config)
+    script_revision = script.get_revision(revision)
+    if script_revision is None:
+        raise ValueError(f"Unknown revision {revision!r}")
+    digest = hashlib.sha256(revision_fingerprints(script)[script_revision.revision].encode())
+    digest.update(environment_fingerprint(script, uri).encode())
+
+    name = f"{prefix}{digest.hexdigest()[:16]}_{script_revision.revision}"
+    if worker_id != "main":
+        name = f"{name}_{worker_id}"
+    return get_temporary_uri(uri, re.sub(r"\W", "_", name).lower()[:63])
+
+
+def ensure_migrated(uri: str, config: Config, revision: str) -> bool:
+    """Make sure the database at ``uri`` exists and is migrated to ``revision``.
+
+    An existing database is kept when its ``alembic_version`` table holds ``revision`` alone,
+    and ``True`` is returned. Otherwise, the database is recreated and migrated, and ``False``
+    is returned. ``config`` must point to ``uri``.
+    """
+    script_revision = ScriptDirectory.from_config(config).get_revision(revision)
+    expected = (script_revision.revision,) if script_revision is not None else ()
+
+    if database_exists(uri):
+        if _current_heads(uri) == expected:
+            return True
+        drop_database(uri)
+
+    create_database(uri)
+    try:
+        command.upgrade(config, revision)
+    except BaseException:
+        drop_database(uri)
+        raise
+    return False
+
+
+def _current_heads(uri: str) -> tuple[str, ...]:
+    engine = create_engine(uri, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as conn:
+            return MigrationContext.configure(conn).get_current_heads()
+    finally:
+        engine.dispose()
@@ -0,0 +1,230 @@
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from collections.abc import Collection, Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import make_url
+from sqlalchemy_utils import create_database, drop_database
+
+from alembicverify.graph import RevisionGraph
+from alembicverify.tempdb import get_temporary_uri
+from alembicverify.util import config_from_ini
+
+
+CHECKS = ("stairway", "roundtrip", "models")
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """The outcome of a verification check.
+
+    ``outcome`` is ``"passed"``, ``"failed"`` when the migrations raise an error or don't pass
+    the check, or ``"error"`` when the temporary database could not be created. ``warning``
+    tells why the temporary database could not be dropped afterwards, which leaves the outcome
+    unchanged.
+    """
+
+    name: str
+    outcome: str
+    duration: float
+    message: str = ""
+    details: str = ""
+    warning: str = ""
+
+    @property
+    def passed(self) -> bool:
+        return self.outcome == "passed"
+
+
+def verify_migrations(
+    alembic_ini_location: str | os.PathLike[str],
+    server_uri: str,
+    checks: Iterable[str] = CHECKS,
+    jobs: int = 1,
+    revisions: Iterable[str] | None = None,
+) -> list[CheckResult]:
+    """Run verification checks on the migrations configured in an ``alembic.ini`` file.
+
+    - ``stairway``: for every head, apply each revision in turn, then downgrade and upgrade it
+      again, which catches downgrades that don't undo their upgrade.
+    - ``roundtrip``: for every head, upgrade from the empty database, downgrade back to it, and
+      upgrade again.
+    - ``models``: upgrade to the heads and run ``alembic check``, which fails when the models
+      (the ``target_metadata`` of ``env.py``) differ from the migrated schema.
+
+    Each check runs on its own temporary database on the server of ``server_uri``, which is
+    created and dropped around it. With ``jobs`` greater than one, checks run in parallel in
+    that many worker processes.
+
+    With ``revisions``, such as the changed revisions found by
+    :func:`~alembicverify.offline.diff_golden_files`, only those are verified: the stairway
+    check steps down and up those revisions alone, and the stairway and round-trip checks only
+    target the heads they lead to. The models check runs anyway.
+    """
+    ini = os.fspath(alembic_ini_location)
+    subset = None if revisions is None else frozenset(revisions)
+    work = [
+        (check, target, get_temporary_uri(server_uri), ini, subset)
+        for check, target in plan_checks(ini, checks, subset)
+    ]
+
+    if jobs <= 1:
+        return [run_check(*job) for job in work]
+    with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(run_check, *zip(*work, strict=True)))
+
+
+def plan_checks(
+    alembic_ini_location: str | os.PathLike[str],
+    checks: Iterable[str] = CHECKS,
+    revisions: Collection[str] | None = None,
+) -> list[tuple[str, str]]:
+    """Return the ``(check, target)`` pairs that :func:`verify_migrations` runs.
+
+    The stairway and round-trip checks target every head, or with ``revisions`` the heads that
+    one of them leads to, and the models check all of them at once. Revisions that are not in
+    the graph, like removed ones, are ignored.
+    """
+    unknown = set(checks) - set(CHECKS)
+    if unknown:
+        raise ValueError(f"Unknown checks: {', '.join(sorted(unknown))}")
+
+    # the URI is only needed to build the config, the database is not touched
+    script = ScriptDirectory.from_config(config_from_ini("sqlite://", alembic_ini_location))
+    graph = RevisionGraph.from_script(script)
+    heads = graph.heads
+    if revisions is not None:
+        affected = {
+            head
+            for revision in revisions
+            if revision in graph
+            for head in graph.heads_depending_on(revision)
+        }
+        heads = tuple(head for head in heads if head in affected)
+    return [
+        (check, target)
+        for check in CHECKS
+        if check in checks
+        for target in (heads if check != "models" else ("heads",))
+    ]
+
+
+def run_check(
+    check: str,
+    target: str,
+    db_uri: str,
+    alembic_ini_location: str,
+    revisions: Collection[str] | None = None,
+) -> CheckResult:
+    """Run a single check on a new database at ``db_uri``, dropping the database afterwards.
+
+    With ``revisions``, the stairway check only steps down and up those revisions. A database
+    that cannot be dropped is reported as the ``warning`` of the result, and left behind for
+    :func:`~alembicverify.tempdb.sweep_temporary_databases`.
+    """
+    name = f"{check}[{target}]"
+    start = time.perf_counter()
+    try:
+        create_database(db_uri)
+    except Exception as exc:
+        return _failure(name, "error", start, exc)
+    try:
+        _CHECK_FUNCTIONS[check](config_from_ini(db_uri, alembic_ini_location), target, revisions)
+    except Exception as exc:
+        result = _failure(name, "failed", start, exc)
+    else:
+        result = CheckResult(name, "passed", time.perf_counter() - start)
+    finally:
+        warning = _drop_database(db_uri)
+    return replace(result, warning=warning) if warning else result
+
+
+def write_junit_xml(results: Sequence[CheckResult], path: str | os.PathLike[str]) -> None:
+    """Write the results as a JUnit XML report."""
+    suite = ET.Element(
+        "testsuite",
+        name="alembic-verify",
+        tests=str(len(results)),
+        failures=str(sum(result.outcome == "failed" for result in results)),
+        errors=str(sum(result.outcome == "error" for result in results)),
+        time=f"{sum(result.duration for result in results):.3f}",
+    )
+    for result in results:
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname="alembic-verify",
+            name=result.name,
+            time=f"{result.duration:.3f}",
+        )
+        if not result.passed:
+            tag = "failure" if result.outcome == "failed" else "error"
+            ET.SubElement(case, tag, message=result.message).text = result.details
+        if result.warning:
+            ET.SubElement(case, "system-err").text = result.warning
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def write_json(results: Sequence[CheckResult], path: str | os.PathLike[str]) -> None:
+    """Write the results as a JSON report."""
+    report = {
+        "passed": all(result.passed for result in results),
+        "results": [asdict(result) for result in results],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def _stairway(config: Config, head: str, revisions: Collection[str] | None) -> None:
+    graph = RevisionGraph.from_script(ScriptDirectory.from_config(config))
+    for revision in graph.upgrade_path(None, head):
+        if revisions is not None and revision not in revisions:
+            # upgraded through on the way to the next revision to step
+            continue
+        down_revisions = graph.down_revisions(revision)
+        command.upgrade(config, revision)
+        # a relative step down is ambiguous on a merge, which goes back to all its parents
+        command.downgrade(config, down_revisions[0] if len(down_revisions) > 1 else f"{revision}-1")
+        command.upgrade(config, revision)
+
+
+def _roundtrip(config: Config, head: str, revisions: Collection[str] | None) -> None:
+    command.upgrade(config, head)
+    command.downgrade(config, "base")
+    command.upgrade(config, head)
+
+
+def _models(config: Config, target: str, revisions: Collection[str] | None) -> None:
+    command.upgrade(config, target)
+    command.check(config)
+
+
+def _drop_database(db_uri: str) -> str:
+    try:
+        drop_database(db_uri)
+    except Exception as exc:
+        # the URI may hold a password
+        database = make_url(db_uri).database
+        return f"Could not drop the database {database}: {type(exc).__name__}: {exc}"
+    return ""
+
+
+def _failure(name: str, outcome: str, start: float, exc: Exception) -> CheckResult:
+    return CheckResult(
+        name,
+        outcome,
+        time.perf_counter() - start,
+        message=f"{type(exc).__name__}: {exc}",
+        details="".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+    )
+
+
+_CHECK_FUNCTIONS = {"stairway": _stairway, "roundtrip": _roundtrip, "models": _models}
@@ -0,0 +1,132 @@
+from collections.abc import Callable, Iterable, Mapping
+from functools import partial
+from typing import Any
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import MetaData, Table, create_engine, pool
+from sqlalchemy.engine import Connection
+
+from alembicverify.graph import RevisionGraph
+
+
+Hook = Callable[[Connection], Any]
+
+
+class SeedRegistry:
+    """Data to insert before each revision is applied, and checks to run after it.
+
+    Register rows with :meth:`seed`, or functions with the :meth:`before` and :meth:`after`
+    decorators, keyed by revision id, then verify them all with :func:`walk_migrations`::
+
+        seeds = SeedRegistry()
+        seeds.seed("cccc00000003", "employees", [{"name": "Ann"}, {"name": "Bob"}])
+
+        @seeds.after("cccc00000003")
+        def ages_are_backfilled(connection):
+            ages = connection.execute(text("SELECT age FROM employees")).scalars().all()
+            assert ages == [30, 30]
+    """
+
+    def __init__(self) -> None:
+        self.before_hooks: dict[str, list[Hook]] = {}
+        self.after_hooks: dict[str, list[Hook]] = {}
+
+    def seed(self, revision: str, table: str, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Insert ``rows`` into ``table`` right before ``revision`` is applied.
+
+        The rows are inserted in bulk, with a single ``executemany``, so they must have the same
+        keys.
+        """
+        hook = partial(_insert_rows, table, list(rows))
+        self.before_hooks.setdefault(revision, []).append(hook)
+
+    def before(self, revision: str) -> Callable[[Hook], Hook]:
+        """Register a function called with a connection right before ``revision`` is applied."""
+
+        def decorator(fn: Hook) -> Hook:
+            self.before_hooks.setdefault(revision, []).append(fn)
+            return fn
+
+        return decorator
+
+    def after(self, revision: str) -> Callable[[Hook], Hook]:
+        """Register a check called with a connection right after ``revision`` is applied."""
+
+        def decorator(fn: Hook) -> Hook:
+            self.after_hooks.setdefault(revision, []).append(fn)
+            return fn
+
+        return decorator
+
+
+def walk_migrations(
+    uri: str, config: Config, seeds: SeedRegistry, revision: str = "heads"
+) -> tuple[str, ...]:
+    """Upgrade the empty database at ``uri`` one revision at a time, applying ``seeds``.
+
+    Before each revision, its ``before`` functions run and its rows are inserted, and after it,
+    its ``after`` checks run, each in a transaction of its own. A single walk on a single
+    database thus verifies every data migration, instead of one database per revision. The
+    walk goes up to ``revision``, or through every branch by default, and the revisions are
+    returned in the order they were applied.
+
+    Checks that raise ``AssertionError`` don't stop the walk: their failures are raised together
+    as an ``AssertionError`` at the end. Any other exception stops it. Revision ids of ``seeds``
+    may be abbreviated, and a ``ValueError`` is raised when one of them is not on the walk.
+    """
+    script = ScriptDirectory.from_config(config)
+    graph = RevisionGraph.from_script(script)
+    if revision in ("head", "heads"):
+        path = graph.order
+    else:
+        target = script.get_revision(revision)
+        path = graph.upgrade_path(None, target.revision) if target is not None else ()
+
+    before_hooks = _resolve(script, seeds.before_hooks)
+    after_hooks = _resolve(script, seeds.after_hooks)
+    missing = (before_hooks.keys() | after_hooks.keys()) - set(path)
+    if missing:
+        raise ValueError(f"Revisions not on the walk to {revision!r}: {', '.join(sorted(missing))}")
+
+    failures = []
+    engine = create_engine(uri, poolclass=pool.NullPool)
+    try:
+        for step in path:
+            for hook in before_hooks.get(step, []):
+                with engine.begin() as connection:
+                    hook(connection)
+            command.upgrade(config, step)
+            for hook in after_hooks.get(step, []):
+                try:
+                    with engine.begin() as connection:
+                        hook(connection)
+                except AssertionError as exc:
+                    failures.append(f"{step} {_name(hook)}: {exc}")
+    finally:
+        engine.dispose()
+
+    if failures:
+        raise AssertionError("Data migration checks failed:\n" + "\n".join(failures))
+    return path
+
+
+def _resolve(script: ScriptDirectory, hooks: Mapping[str, list[Hook]]) -> dict[str, list[Hook]]:
+    resolved: dict[str, list[Hook]] = {}
+    for revision, functions in hooks.items():
+        script_revision = script.get_revision(revision)
+        if script_revision is None:
+            raise ValueError(f"Unknown revision {revision!r}")
+        resolved.setdefault(script_revision.revision, []).extend(functions)
+    return resolved
+
+
+def _insert_rows(table: str, rows: list[Mapping[str, Any]], connection: Connection) -> None:
+    # the table is reflected as it is at this revision, as its columns change along the walk
+    if rows:
+        connection.execute(Table(table, MetaData(), autoload_with=connection).insert(), rows)
+
+
+def _name(hook: Hook) -> str:
+    return getattr(hook, "__name__", repr(hook))
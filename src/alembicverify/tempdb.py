@@ -0,0 +1,155 @@
+import itertools
+import os
+import re
+import threading
+import warnings
+from collections.abc import Sequence
+from pathlib import Path
+from uuid import uuid4
+
+from sqlalchemy import create_engine, pool, text
+from sqlalchemy.engine import URL, make_url
+
+
+# databases that somebody is connected to are in use, and not listed
+_LIST_SCHEMATA = (
+    "SELECT schema_name FROM information_schema.schemata WHERE schema_name LIKE :pattern "
+    "AND schema_name NOT IN "
+    "(SELECT db FROM information_schema.processlist WHERE db IS NOT NULL)"
+)
+_LIST_DATABASES = {
+    "postgresql": (
+        "SELECT datname FROM pg_database WHERE datname LIKE :pattern AND NOT EXISTS "
+        "(SELECT 1 FROM pg_stat_activity WHERE pg_stat_activity.datname = pg_database.datname)"
+    ),
+    "mysql": _LIST_SCHEMATA,
+    "mariadb": _LIST_SCHEMATA,
+}
+# the files SQLite keeps next to a database while it is written to, or opened in WAL mode
+_SQLITE_IN_USE = ("-journal", "-wal")
+_MAINTENANCE_DATABASE = {
+    "postgresql": "postgres",
+    "mysql": "information_schema",
+    "mariadb": "information_schema",
+}
+
+
+def get_temporary_uri(uri: str, name: str | None = None) -> str:
+    """Substitute the database name of ``uri`` with ``name``, or with a random ``temp_`` name.
+
+    For example, ``get_temporary_uri("postgresql://user@localhost/app")`` could return
+    ``"postgresql://user@localhost/temp_000da...898fe"``. With SQLite, the database is a file
+    named after ``name`` in the directory of the original database.
+    """
+    url = make_url(uri)
+    name = name or f"temp_{uuid4().hex}"
+    if url.get_backend_name() == "sqlite":
+        url = url.set(database=os.path.join(os.path.dirname(url.database or ""), f"{name}.db"))
+    else:
+        url = url.set(database=name)
+    return url.render_as_string(hide_password=False)
+
+
+class TemporaryUris:
+    """Allocate the URIs of temporary databases for a test run, across one or more servers.
+
+    Names look like ``temp_<run>_<worker>_<random>``: the run identifier is shared by all the
+    xdist workers of a run, so the databases left behind by earlier runs can be told apart from
+    the ones in use, and the worker identifier tells which worker created a database. URIs are
+    handed out round-robin over ``server_uris``, starting at a different server on each worker.
+    """
+
+    def __init__(
+        self,
+        server_uris: Sequence[str],
+        run_id: str,
+        worker_id: str = "main",
+        prefix: str = "temp",
+    ):
+        if not server_uris:
+            raise ValueError("At least one server URI is needed")
+        self.server_uris = list(server_uris)
+        self.run_id = run_id
+        self.worker_id = worker_id
+        self.prefix = prefix
+        digits = re.sub(r"\D", "", worker_id)
+        self._counter = itertools.count(int(digits) if digits else 0)
+        self._lock = threading.Lock()
+
+    @property
+    def run_prefix(self) -> str:
+        """The prefix of the names of all the databases of this run."""
+        return f"{self.prefix}_{self.run_id}_"
+
+    def __call__(self) -> str:
+        """Return the URI of a new temporary database, on the next server in turn."""
+        with self._lock:
+            server_uri = self.server_uris[next(self._counter) % len(self.server_uris)]
+        name = f"{self.run_prefix}{self.worker_id}_{uuid4().hex[:12]}"
+        return get_temporary_uri(server_uri, name)
+
+    def sweep(self) -> list[str]:
+        """Drop the temporary databases left behind by earlier runs on all the servers."""
+        dropped = []
+        for server_uri in self.server_uris:
+            dropped += sweep_temporary_databases(
+                server_uri, prefix=f"{self.prefix}_", keep=self.run_prefix
+            )
+        return dropped
+
+
+def sweep_temporary_databases(
+    server_uri: str, prefix: str = "temp_", keep: str | None = None
+) -> list[str]:
+    """Drop the databases whose name starts with ``prefix`` on the server of ``server_uri``.
+
+    Databases whose name starts with ``keep`` are left alone, and so are the databases in use:
+    the ones somebody is connected to on PostgreSQL, MySQL and MariaDB, and the SQLite files
+    with a rollback journal or a write-ahead log. All the candidates are listed with a single
+    catalog query. Databases that can't be dropped anyway, for example because a connection was
+    opened in the meantime, are skipped with a warning. Return the names of the dropped
+    databases.
+    """
+    url = make_url(server_uri)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        return _sweep_files(url, prefix, keep)
+    if backend not in _LIST_DATABASES:
+        raise ValueError(f"Sweeping temporary databases is not supported on {backend}")
+
+    engine = create_engine(
+        url.set(database=_MAINTENANCE_DATABASE[backend]),
+        poolclass=pool.NullPool,
+        isolation_level="AUTOCOMMIT",
+    )
+    dropped = []
+    try:
+        with engine.connect() as conn:
+            pattern = prefix.replace("\\", "\\\\").replace("_", "\\_").replace("%", "\\%") + "%"
+            names = conn.execute(text(_LIST_DATABASES[backend]), {"pattern": pattern}).scalars()
+            quote = conn.dialect.identifier_preparer.quote
+            for name in sorted(names):
+                if keep is not None and name.startswith(keep):
+                    continue
+                try:
+                    conn.exec_driver_sql(f"DROP DATABASE IF EXISTS {quote(name)}")
+                except Exception as exc:
+                    warnings.warn(f"Could not drop database {name}: {exc}", stacklevel=2)
+                else:
+                    dropped.append(name)
+    finally:
+        engine.dispose()
+    return dropped
+
+
+def _sweep_files(url: URL, prefix: str, keep: str | None) -> list[str]:
+    directory = Path(os.path.dirname(url.database or "") or ".")
+    dropped = []
+    for path in sorted(directory.glob(f"{prefix}*.db")):
+        if keep is not None and path.name.startswith(keep):
+            continue
+        if any(path.with_name(path.name + suffix).exists() for suffix in _SQLITE_IN_USE):
+            continue
+        path.unlink(missing_ok=True)
+        dropped.append(path.stem)
+    return dropped
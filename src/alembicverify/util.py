@@ -1,14 +1,34 @@
+import functools
+import inspect
+import os
 from collections.abc import Generator
 from contextlib import contextmanager
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 from alembic import command
 from alembic.config import Config
 from alembic.environment import EnvironmentContext
 from alembic.script import ScriptDirectory
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Connection, Engine
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
+
+from alembicverify.baseline import BASELINE_ATTRIBUTE, load_baseline
+
+
+if TYPE_CHECKING:
+    from alembicverify.registry import EngineRegistry
+
+
+def same_database(url: URL, target: URL) -> bool:
+    """Tell whether ``url`` and ``target`` point to the same database, whatever their driver,
+    user and options."""
+    return (url.get_backend_name(), url.host, url.port, url.database) == (
+        target.get_backend_name(),
+        target.host,
+        target.port,
+        target.database,
+    )
 
 
 def make_alembic_config(uri: str, folder: str) -> Config:
@@ -19,6 +39,36 @@ def make_alembic_config(uri: str, folder: str) -> Config:
     return config
 
 
+def config_from_ini(uri: str, alembic_ini_location: str | os.PathLike[str]) -> Config:
+    """Create a configured :class:`alembic.config.Config` object from an ``alembic.ini`` file.
+
+    Only the script location is taken from the file, as the alembic config fixtures do. The file
+    is parsed once per modification time, so creating many configs from it is cheap.
+    """
+    return make_alembic_config(uri, get_script_location(alembic_ini_location) or "")
+
+
+def get_script_location(alembic_ini_location: str | os.PathLike[str]) -> str | None:
+    """Read the script location from an ``alembic.ini`` file, caching it per modification time."""
+    try:
+        stat = os.stat(alembic_ini_location)
+    except OSError:
+        # let alembic report the missing file
+        return _read_script_location(alembic_ini_location)
+    return _cached_script_location(
+        os.path.abspath(alembic_ini_location), stat.st_mtime_ns, stat.st_size
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_script_location(path: str, mtime: int, size: int) -> str | None:
+    return _read_script_location(path)
+
+
+def _read_script_location(alembic_ini_location: str | os.PathLike[str]) -> str | None:
+    return Config(alembic_ini_location).get_section_option("alembic", "script_location")
+
+
 class _MigrationResult:
     """Provide backward compatibility for the `prepare_schema_from_migrations` function.
 
@@ -28,9 +78,10 @@ class _MigrationResult:
     This is an internal class and is not part of the public API.
     """
 
-    def __init__(self, engine: Engine, script: ScriptDirectory):
+    def __init__(self, engine: Engine, script: ScriptDirectory, dispose: bool = True):
         self.engine = engine
         self.script = script
+        self.dispose = dispose
 
     def __iter__(self) -> Any:
         """Support unpacking: engine, script = prepare_schema_from_migrations(...)"""
@@ -41,11 +92,16 @@ class _MigrationResult:
         return self.engine, self.script
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
-        self.engine.dispose()
+        if self.dispose:
+            self.engine.dispose()
 
 
 def prepare_schema_from_migrations(
-    uri: str, config: Config, revision: str = "head"
+    uri: str,
+    config: Config,
+    revision: str = "head",
+    registry: "EngineRegistry | None" = None,
+    baseline: str | os.PathLike[str] | None = None,
 ) -> _MigrationResult:
     """Applies migrations to a database.
 
@@ -57,12 +113,23 @@ def prepare_schema_from_migrations(
     As a context manager (which will dispose the engine on exit):
         with prepare_schema_from_migrations(uri, config, revision="head") as (engine, script):
             # use engine and script
+
+    When a ``registry`` is given, the engine is taken from it and is left for the registry to
+    dispose, also when used as a context manager.
+
+    When a ``baseline`` directory is given, or set in the ``alembic_verify_baseline`` attribute of
+    ``config``, as the alembic config fixtures do with ``--alembic-baseline``, an empty database
+    is loaded from the baseline recorded there, and only the later revisions are applied (see
+    :func:`~alembicverify.baseline.load_baseline`).
     """
-    engine = create_engine(uri)
+    engine = create_engine(uri) if registry is None else registry.get_engine(uri)
     script = ScriptDirectory.from_config(config)
+    baseline = baseline or config.attributes.get(BASELINE_ATTRIBUTE)
+    if baseline is not None:
+        load_baseline(uri, config, baseline, revision)
     command.upgrade(config, revision)
 
-    return _MigrationResult(engine, script)
+    return _MigrationResult(engine, script, dispose=registry is None)
 
 
 def get_current_revision(
@@ -94,16 +161,50 @@ def _get_revision(
 
 
 @contextmanager
-def session_for_engine(engine: Engine) -> Generator[Session, None, None]:
+def session_for_engine(
+    engine: Engine | Connection, registry: "EngineRegistry | None" = None
+) -> Generator[Session, None, None]:
     """Create a session for an engine.
 
     The session is closed when the context manager exits. This tool is useful for testing,
     for example to verify the application of a migration in detail. You might need to get two
     different session instances to use before and after the application of a migration.
+
+    When given a connection with a transaction in progress, the session joins the transaction
+    through a SAVEPOINT, so committing the session doesn't commit the transaction, which can be
+    rolled back at the end of a test.
+
+    When a ``registry`` is given, its cached sessionmaker for the engine is used.
     """
-    session_cls = sessionmaker(bind=engine)
-    session = session_cls()
+    if isinstance(engine, Connection):
+        factory = sessionmaker() if registry is None else registry.sessionmaker(engine.engine)
+        session = _savepoint_session(factory, engine)
+    elif registry is None:
+        session = sessionmaker(bind=engine)()
+    else:
+        session = registry.sessionmaker(engine)()
     try:
         yield session
     finally:
         session.close()
+
+
+_JOIN_TRANSACTION_MODE = "join_transaction_mode" in inspect.signature(Session).parameters
+
+
+def _savepoint_session(factory: sessionmaker, connection: Connection) -> Session:
+    if _JOIN_TRANSACTION_MODE:
+        return factory(bind=connection, join_transaction_mode="create_savepoint")
+
+    # SQLAlchemy 1.4: run the session in a SAVEPOINT of the connection, started again whenever
+    # the session ends it
+    session = factory(bind=connection)
+    savepoint = connection.begin_nested()
+
+    def restart_savepoint(session: Session, transaction: SessionTransaction) -> None:
+        nonlocal savepoint
+        if not savepoint.is_active:
+            savepoint = connection.begin_nested()
+
+    event.listen(session, "after_transaction_end", restart_savepoint)
+    return session
@@ -1,8 +1,8 @@
 import pytest
 from alembic import command
 
+from alembicverify import get_temporary_uri
 from alembicverify.util import get_current_revision, prepare_schema_from_migrations
-from test.integration.conftest import get_temporary_uri
 
 
 @pytest.fixture
@@ -1,9 +1,8 @@
 import pytest
 from alembic import command
 
-from alembicverify import alembic_config_factory, new_db_factory
+from alembicverify import alembic_config_factory, get_temporary_uri, new_db_factory
 from alembicverify.util import get_current_revision, prepare_schema_from_migrations
-from test.integration.conftest import get_temporary_uri
 
 
 @pytest.fixture
@@ -0,0 +1,124 @@
+from textwrap import dedent
+
+import pytest
+
+
+ENV_PY = """
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+
+config = context.config
+
+
+def run_migrations_offline():
+    context.configure(url=config.get_main_option("sqlalchemy.url"), literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section), prefix="sqlalchemy.", poolclass=pool.NullPool
+    )
+    with connectable.connect() as connection:
+        context.configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
+"""
+
+REVISION_TEMPLATE = '''
+"""{message}"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = {revision!r}
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+{upgrade}
+
+
+def downgrade():
+{downgrade}
+'''
+
+# A small linear migration tree that, unlike the example project, also runs on SQLite.
+REVISIONS = [
+    (
+        "aaaa00000001",
+        None,
+        "create companies",
+        'op.create_table("companies", sa.Column("id", sa.Integer(), primary_key=True), '
+        'sa.Column("name", sa.String(50), nullable=False))',
+        'op.drop_table("companies")',
+    ),
+    (
+        "bbbb00000002",
+        "aaaa00000001",
+        "create employees",
+        'op.create_table("employees", sa.Column("id", sa.Integer(), primary_key=True), '
+        'sa.Column("name", sa.String(50), nullable=False), '
+        'sa.Column("company_id", sa.Integer(), nullable=True))',
+        'op.drop_table("employees")',
+    ),
+    (
+        "cccc00000003",
+        "bbbb00000002",
+        "add employees age",
+        'op.add_column("employees", sa.Column("age", sa.Integer(), nullable=True))\n'
+        'op.execute("UPDATE employees SET age = 30")',
+        'with op.batch_alter_table("employees") as batch:\n    batch.drop_column("age")',
+    ),
+]
+
+
+def write_revision(versions, revision, down_revision, message, upgrade, downgrade):
+    path = versions / f"{revision}_{message.replace(' ', '_')}.py"
+    path.write_text(
+        REVISION_TEMPLATE.format(
+            message=message,
+            revision=revision,
+            down_revision=down_revision,
+            upgrade=indent(upgrade),
+            downgrade=indent(downgrade),
+        )
+    )
+    return path
+
+
+def indent(code):
+    return "\n".join(f"    {line}" for line in dedent(code).splitlines())
+
+
+@pytest.fixture
+def sqlite_migrations(tmp_path):
+    """Write a SQLite compatible migration tree and return the location of its alembic.ini."""
+    script_location = tmp_path / "migrations"
+    versions = script_location / "versions"
+    versions.mkdir(parents=True)
+    (script_location / "env.py").write_text(ENV_PY)
+    for revision in REVISIONS:
+        write_revision(versions, *revision)
+
+    ini = tmp_path / "alembic.ini"
+    ini.write_text(
+        f"[alembic]\nscript_location = {script_location.as_posix()}\n"
+        f"sqlalchemy.url = sqlite:///{(tmp_path / 'db.sqlite').as_posix()}\n"
+    )
+    return ini
+
+
+@pytest.fixture
+def sqlite_uri(tmp_path):
+    return f"sqlite:///{(tmp_path / 'test.sqlite').as_posix()}"
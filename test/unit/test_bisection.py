@@ -0,0 +1,131 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from alembicverify.bisection import BisectResult, bisect_migrations
+from alembicverify.registry import EngineRegistry
+from test.unit.conftest import write_revision
+
+
+TABLES = ["t4", "t5", "t6", "t7", "t8"]
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    """A linear tree of eight revisions, the last five of which each create a table."""
+    versions = sqlite_migrations.parent / "migrations" / "versions"
+    down_revision = "cccc00000003"
+    for table in TABLES:
+        revision = f"{table}00000000"
+        write_revision(
+            versions,
+            revision,
+            down_revision,
+            f"create {table}",
+            f'op.create_table("{table}", sa.Column("id", sa.Integer(), primary_key=True))',
+            f'op.drop_table("{table}")',
+        )
+        down_revision = revision
+
+    config = Config(sqlite_migrations)
+    config.set_main_option("sqlalchemy.url", sqlite_uri)
+    return config
+
+
+def lacks(table):
+    def check(engine):
+        return table not in inspect(engine).get_table_names()
+
+    return check
+
+
+@pytest.mark.parametrize("downgrade", [False, True])
+def test_bisect(config, sqlite_uri, tmp_path, downgrade):
+    result = bisect_migrations(sqlite_uri, config, lacks("t6"), downgrade=downgrade)
+
+    assert result == BisectResult(
+        first_bad="t600000000",
+        last_good="t500000000",
+        probes=(("t400000000", True), ("t600000000", False), ("t500000000", True)),
+    )
+    assert not (tmp_path / "test.sqlite").exists()
+
+
+def test_bisect_downgrades_instead_of_rebuilding(config, sqlite_uri):
+    with (
+        patch("alembicverify.bisection.command.downgrade") as downgrade_mock,
+        patch("alembicverify.bisection.drop_database") as drop_database_mock,
+    ):
+        bisect_migrations(sqlite_uri, config, lacks("t6"), good="t400000000", downgrade=True)
+
+    # t6 is probed first and is bad, t5 comes before it
+    downgrade_mock.assert_called_once_with(config, "t500000000")
+    drop_database_mock.assert_called_once_with(sqlite_uri)
+
+
+def test_bisect_first_revision_is_bad(config, sqlite_uri):
+    def check(engine):
+        assert "companies" not in inspect(engine).get_table_names()
+
+    result = bisect_migrations(sqlite_uri, config, check)
+
+    assert (result.first_bad, result.last_good) == ("aaaa00000001", None)
+    assert len(result.probes) == 3
+
+
+def test_bisect_between_revisions(config, sqlite_uri):
+    result = bisect_migrations(
+        sqlite_uri, config, lacks("t6"), good="bbbb00000002", bad="t700000000"
+    )
+
+    assert (result.first_bad, result.last_good) == ("t600000000", "t500000000")
+
+
+def test_bisect_reuses_registry(config, sqlite_uri):
+    with EngineRegistry() as registry:
+        bisect_migrations(sqlite_uri, config, lacks("t6"), registry=registry)
+
+        assert len(registry) == 0
+
+
+def test_bisect_stops_on_errors(config, sqlite_uri, tmp_path):
+    def check(engine):
+        raise RuntimeError("broken check")
+
+    with pytest.raises(RuntimeError, match="broken check"):
+        bisect_migrations(sqlite_uri, config, check)
+
+    assert not (tmp_path / "test.sqlite").exists()
+
+
+def test_bisect_rejects_the_empty_database_as_bad(config, sqlite_uri):
+    with pytest.raises(ValueError, match="The bad revision can't be the empty database"):
+        bisect_migrations(sqlite_uri, config, lacks("t6"), bad="base")
+
+
+@pytest.mark.parametrize("good", ["head", "aaaa00000001"])
+def test_bisect_rejects_good_after_bad(config, sqlite_uri, good):
+    with pytest.raises(ValueError, match=f"'{good}' is not an ancestor of 'aaaa00000001'"):
+        bisect_migrations(sqlite_uri, config, lacks("t6"), good=good, bad="aaaa00000001")
+
+
+def test_bisect_rejects_good_on_another_branch(config, sqlite_uri, tmp_path):
+    versions = Path(config.get_main_option("script_location")) / "versions"
+    write_revision(versions, "dddd", "t400000000", "side branch", "pass", "pass")
+
+    with pytest.raises(ValueError, match="'dddd' is not an ancestor of 't800000000'"):
+        bisect_migrations(sqlite_uri, config, lacks("t6"), good="dddd", bad="t800000000")
+    assert not (tmp_path / "test.sqlite").exists()
+
+
+def test_bisect_rejects_branches(config, sqlite_uri):
+    versions = Path(config.get_main_option("script_location")) / "versions"
+    write_revision(versions, "dddd", "t800000000", "branch one", "pass", "pass")
+    write_revision(versions, "eeee", "t800000000", "branch two", "pass", "pass")
+    write_revision(versions, "ffff", ("dddd", "eeee"), "merge", "pass", "pass")
+
+    with pytest.raises(ValueError, match="are not linear"):
+        bisect_migrations(sqlite_uri, config, lacks("t6"), good="t800000000")
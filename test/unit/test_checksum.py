@@ -0,0 +1,134 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, text
+from sqlalchemy.dialects import postgresql
+
+from alembicverify.checksum import (
+    TableChecksum,
+    _server_checksum,
+    diff_checksums,
+    table_checksums,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+        conn.execute(text("CREATE TABLE companies (id INTEGER PRIMARY KEY, name VARCHAR(50))"))
+        conn.execute(text("CREATE TABLE tags (name VARCHAR(50), data BLOB)"))
+        conn.execute(text("INSERT INTO alembic_version VALUES ('abc')"))
+        conn.execute(text("INSERT INTO companies VALUES (1, 'Acme'), (2, 'Initech'), (3, NULL)"))
+        conn.execute(text("INSERT INTO tags VALUES ('a', x'00ff'), ('b', NULL)"))
+    yield engine
+    engine.dispose()
+
+
+def test_table_checksums(engine):
+    checksums = table_checksums(engine, chunk_size=2)
+
+    assert set(checksums) == {"companies", "tags"}
+    assert checksums["companies"].row_count == 3
+    assert checksums["companies"].method == "client"
+    assert set(checksums["companies"].columns) == {"id", "name"}
+    assert checksums["tags"].row_count == 2
+
+
+def test_table_checksums_of_selected_tables(engine):
+    assert set(table_checksums(engine, ["tags"])) == {"tags"}
+
+
+def test_checksums_do_not_depend_on_row_order(engine):
+    before = table_checksums(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE reordered AS SELECT * FROM companies ORDER BY id DESC"))
+        conn.execute(text("DELETE FROM companies"))
+        conn.execute(text("INSERT INTO companies SELECT * FROM reordered"))
+        conn.execute(text("DROP TABLE reordered"))
+
+    assert diff_checksums(before, table_checksums(engine)) == {}
+
+
+def test_swapped_values_are_detected(engine):
+    before = table_checksums(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE companies SET name = 'Acme' WHERE id = 2"))
+        conn.execute(text("UPDATE companies SET name = 'Initech' WHERE id = 1"))
+
+    assert diff_checksums(before, table_checksums(engine)) == {
+        "companies": ["column 'name' changed"]
+    }
+
+
+def test_added_columns_and_lost_rows(engine):
+    before = table_checksums(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE companies ADD COLUMN country VARCHAR(2)"))
+        conn.execute(text("DELETE FROM companies WHERE id = 3"))
+        conn.execute(text("DROP TABLE tags"))
+        conn.execute(text("CREATE TABLE skills (slug VARCHAR(50) PRIMARY KEY)"))
+
+    assert diff_checksums(before, table_checksums(engine)) == {
+        "companies": [
+            "row count changed from 3 to 2",
+            "column 'id' changed",
+            "column 'name' changed",
+        ],
+        "skills": ["table is missing before"],
+        "tags": ["table is missing after"],
+    }
+
+
+def test_diff_of_different_methods():
+    before = {"t": TableChecksum("t", 1, {}, method="client")}
+    after = {"t": TableChecksum("t", 1, {}, method="server")}
+
+    with pytest.raises(ValueError, match="different methods"):
+        diff_checksums(before, after)
+
+
+def test_unknown_method(engine):
+    with pytest.raises(ValueError, match="Unknown checksum method 'fast'"):
+        table_checksums(engine, method="fast")
+
+
+def test_server_method_requires_postgresql(engine):
+    with pytest.raises(ValueError, match="not supported on sqlite"):
+        table_checksums(engine, method="server")
+
+
+def test_auto_method_uses_server_checksums_on_postgresql(engine, monkeypatch):
+    monkeypatch.setattr(engine.dialect, "name", "postgresql")
+    with patch("alembicverify.checksum._server_checksum") as server_checksum_mock:
+        checksums = table_checksums(engine, ["tags"])
+
+    assert checksums == {"tags": server_checksum_mock.return_value}
+
+
+def test_server_checksum():
+    table = Table(
+        "companies",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("name", String(50)),
+    )
+    session = MagicMock()
+    session.get_bind.return_value.dialect = postgresql.dialect()
+    session.execute.return_value.one.return_value = (2, 5, -1)
+
+    checksum = _server_checksum(session, table)
+
+    assert checksum == TableChecksum(
+        table="companies",
+        row_count=2,
+        columns={"id": "0000000000000005", "name": "ffffffffffffffff"},
+        method="server",
+    )
+    statement = str(session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "md5(CAST(ROW(id, name) AS text))" in statement
+    assert "FROM companies" in statement
@@ -0,0 +1,298 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from alembicverify.cli import main
+from alembicverify.runner import CHECKS, CheckResult
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def project(sqlite_migrations, tmp_path, monkeypatch):
+    (tmp_path / "checks.py").write_text(
+        "from sqlalchemy import inspect\n\n\n"
+        "def no_age(engine):\n"
+        "    columns = [c['name'] for c in inspect(engine).get_columns('employees')]\n"
+        "    assert 'age' not in columns\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    yield sqlite_migrations
+    sys.modules.pop("checks", None)
+
+
+class TestBisect:
+    def test_bisect(self, project, tmp_path, capsys):
+        exit_code = main(
+            ["bisect", "-c", str(project), "--check", "checks:no_age", "--good", "aaaa00000001"]
+        )
+
+        assert exit_code == 0
+        assert capsys.readouterr().out.splitlines() == [
+            "bbbb00000002 good",
+            "first bad revision: cccc00000003",
+            "last good revision: bbbb00000002",
+        ]
+        # the temporary database is created next to the one of the ini file, and dropped
+        assert not list(tmp_path.glob("*.db"))
+
+    def test_db_uri(self, project, tmp_path, capsys):
+        db_uri = f"sqlite:///{tmp_path / 'bisect.sqlite'}"
+        sys.path.insert(0, os.getcwd())
+
+        main(
+            [
+                "bisect",
+                *("-c", str(project), "--db-uri", db_uri),
+                *("--check", "checks:no_age", "--good", "aaaa00000001"),
+            ]
+        )
+
+        assert "first bad revision: cccc00000003" in capsys.readouterr().out
+
+    def test_no_db_uri(self, project, tmp_path, capsys):
+        project.write_text(project.read_text().split("sqlalchemy.url")[0])
+
+        with pytest.raises(SystemExit):
+            main(["bisect", "-c", str(project), "--check", "checks:no_age"])
+
+        assert "--db-uri is needed" in capsys.readouterr().err
+
+    @pytest.mark.parametrize(
+        ("check", "message"),
+        [
+            ("checks", "'checks' is not in the MODULE:FUNCTION form"),
+            ("missing:check", "Could not load 'missing:check'"),
+            ("checks:missing", "Could not load 'checks:missing'"),
+        ],
+    )
+    def test_bad_check(self, project, capsys, check, message):
+        with pytest.raises(SystemExit):
+            main(["bisect", "-c", str(project), "--check", check])
+
+        assert message in capsys.readouterr().err
+
+
+class TestRun:
+    @pytest.fixture
+    def verify_migrations_mock(self):
+        with patch("alembicverify.cli.verify_migrations") as m:
+            m.return_value = [
+                CheckResult("stairway[head]", "passed", 1.5, warning="Could not drop temp_1"),
+                CheckResult("models[heads]", "failed", 0.25, "AutogenerateDiffsDetected: drift"),
+            ]
+            yield m
+
+    def test_run(self, project, tmp_path, verify_migrations_mock, capsys):
+        exit_code = main(
+            [
+                "run",
+                *("-c", str(project), "--check", "stairway", "--check", "models", "-j", "4"),
+                *("--junit-xml", str(tmp_path / "report.xml")),
+                *("--json", str(tmp_path / "report.json")),
+            ]
+        )
+
+        assert exit_code == 1
+        verify_migrations_mock.assert_called_once_with(
+            str(project), f"sqlite:///{tmp_path / 'db.sqlite'}", ["stairway", "models"], 4, None
+        )
+        assert capsys.readouterr().out.splitlines() == [
+            "PASSED stairway[head] (1.50s)",
+            "       warning: Could not drop temp_1",
+            "FAILED models[heads] (0.25s)",
+            "       AutogenerateDiffsDetected: drift",
+        ]
+        assert (tmp_path / "report.xml").exists()
+        assert json.loads((tmp_path / "report.json").read_text())["passed"] is False
+
+    def test_run_passes(self, project, verify_migrations_mock):
+        verify_migrations_mock.return_value = verify_migrations_mock.return_value[:1]
+
+        assert main(["run", "-c", str(project), "--server-uri", "postgresql:///"]) == 0
+
+        verify_migrations_mock.assert_called_once_with(
+            str(project), "postgresql:///", CHECKS, 1, None
+        )
+
+    def test_revisions(self, project, verify_migrations_mock):
+        main(["run", "-c", str(project), "--revision", "bbbb", "--revision", "cccc"])
+
+        assert verify_migrations_mock.call_args.args[4] == ["bbbb", "cccc"]
+
+    def test_changed_from_golden(self, project, tmp_path, capsys):
+        golden = tmp_path / "golden"
+        main(["render", "-c", str(project), "--golden", str(golden), "--update"])
+        (golden / "cccc00000003.upgrade.sql").write_text("UPDATE employees SET age = 29;\n")
+        capsys.readouterr()
+
+        exit_code = main(
+            ["run", "-c", str(project), "--check", "stairway", "--changed-from-golden", str(golden)]
+        )
+
+        assert exit_code == 0
+        changed, passed = capsys.readouterr().out.splitlines()
+        assert changed == "changed revisions: cccc00000003"
+        assert passed.startswith("PASSED stairway[cccc00000003]")
+
+    def test_unchanged_from_golden(self, project, tmp_path, capsys):
+        golden = tmp_path / "golden"
+        main(["render", "-c", str(project), "--golden", str(golden), "--update"])
+        capsys.readouterr()
+
+        exit_code = main(
+            ["run", "-c", str(project), "--check", "stairway", "--changed-from-golden", str(golden)]
+        )
+
+        assert exit_code == 0
+        assert capsys.readouterr().out == "changed revisions: none\n"
+
+    def test_run_for_real(self, project, tmp_path, capsys):
+        exit_code = main(["run", "-c", str(project), "--check", "roundtrip"])
+
+        assert exit_code == 0
+        assert capsys.readouterr().out.startswith("PASSED roundtrip[cccc00000003]")
+
+
+class TestRender:
+    def test_update_and_compare(self, project, tmp_path, capsys):
+        golden = tmp_path / "golden"
+
+        assert main(["render", "-c", str(project), "--golden", str(golden), "--update"]) == 0
+        assert capsys.readouterr().out == f"wrote the SQL of 3 revisions to {golden}\n"
+        assert "sqlite" not in (golden / "aaaa00000001.upgrade.sql").read_text().lower()
+
+        assert main(["render", "-c", str(project), "--golden", str(golden)]) == 0
+        assert capsys.readouterr().out == "no changes\n"
+
+    def test_changes(self, project, tmp_path, capsys):
+        golden = tmp_path / "golden"
+        main(["render", "-c", str(project), "--golden", str(golden), "--update"])
+        capsys.readouterr()
+        (golden / "bbbb00000002.upgrade.sql").write_text("CREATE TABLE employees;\n")
+
+        exit_code = main(
+            ["render", "-c", str(project), "--golden", str(golden), "--dialect", "postgresql"]
+        )
+
+        assert exit_code == 1
+        out = capsys.readouterr().out
+        assert "-CREATE TABLE employees;\n" in out
+        assert "+    id SERIAL NOT NULL, \n" in out
+        assert out.endswith("changed revisions: aaaa00000001 bbbb00000002 cccc00000003\n")
+
+
+class TestLint:
+    def test_lint(self, project, capsys):
+        assert main(["lint", "-c", str(project)]) == 0
+
+        assert capsys.readouterr().out.splitlines() == [
+            "cccc00000003: warning: full-table-update: every row of the table is rewritten at once",
+            "    UPDATE employees SET age = 30",
+            "0 errors, 1 warnings",
+        ]
+
+    def test_errors(self, project, capsys):
+        versions = project.parent / "migrations" / "versions"
+        write_revision(
+            versions,
+            "dddd00000004",
+            "cccc00000003",
+            "index names",
+            'op.create_index("ix_employees_name", "employees", ["name"])',
+            "pass",
+        )
+
+        assert main(["lint", "-c", str(project), "--dialect", "postgresql", "-j", "2"]) == 1
+        assert capsys.readouterr().out.endswith("1 errors, 1 warnings\n")
+
+    def test_golden_files(self, project, tmp_path, capsys):
+        golden = tmp_path / "golden"
+        golden.mkdir()
+        (golden / "dddd.upgrade.sql").write_text("ALTER TABLE t ADD COLUMN c INTEGER NOT NULL;\n")
+        (golden / "eeee.upgrade.sql").write_text("-- could not render offline: CommandError\n")
+
+        assert main(["lint", "-c", str(project), "--golden", str(golden)]) == 1
+        assert capsys.readouterr().out.splitlines() == [
+            "dddd: error: not-null-without-default: adding a NOT NULL column without a default "
+            "fails on a table with rows",
+            "    ALTER TABLE t ADD COLUMN c INTEGER NOT NULL",
+            "eeee: warning: not-rendered: CommandError",
+            "1 errors, 1 warnings",
+        ]
+
+
+class TestBaseline:
+    def test_baseline(self, project, tmp_path, capsys):
+        exit_code = main(
+            ["baseline", "-c", str(project), "--revision", "bbbb", "--directory", "baseline"]
+        )
+
+        assert exit_code == 0
+        assert capsys.readouterr().out == (
+            f"recorded the baseline of bbbb00000002 in {os.path.join('baseline', 'sqlite.sql')}\n"
+        )
+        assert sorted(path.name for path in (tmp_path / "baseline").iterdir()) == [
+            "sqlite.json",
+            "sqlite.sql",
+        ]
+        assert not list(tmp_path.glob("temp_*.db"))
+
+
+class TestImports:
+    def test_imports(self, project, capsys):
+        assert main(["imports", "-c", str(project)]) == 0
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 4
+        assert "cccc00000003" in "".join(lines[:3])
+        assert lines[-1].startswith("imported 3 revision files in ")
+
+    def test_top(self, project, capsys):
+        assert main(["imports", "-c", str(project), "--top", "1"]) == 0
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == 2
+        assert lines[0].endswith(".py")
+
+
+class TestQueue:
+    def test_submit_work_collect(self, project, tmp_path, capsys):
+        queue = str(tmp_path / "queue.db")
+        server_uri = f"sqlite:///{tmp_path / 'server.db'}"
+
+        assert main(["submit", "--queue", queue, "-c", str(project), "--check", "roundtrip"]) == 0
+        assert main(["work", "--queue", queue, "--server-uri", server_uri]) == 0
+        exit_code = main(["collect", "--queue", queue, "--json", str(tmp_path / "report.json")])
+
+        assert exit_code == 0
+        assert capsys.readouterr().out.splitlines()[:2] == [
+            f"queued 1 checks of {project}",
+            "ran 1 checks",
+        ]
+        report = json.loads((tmp_path / "report.json").read_text())
+        assert [result["name"] for result in report["results"]] == [
+            f"{project}::roundtrip[cccc00000003]"
+        ]
+
+    def test_default_config(self, project, tmp_path, capsys):
+        (tmp_path / "alembic.ini").write_text(project.read_text())
+        queue = str(tmp_path / "queue.db")
+
+        assert main(["submit", "--queue", queue]) == 0
+
+        assert capsys.readouterr().out == "queued 3 checks of alembic.ini\n"
+
+    def test_collect_timeout(self, project, tmp_path, capsys):
+        queue = str(tmp_path / "queue.db")
+        main(["submit", "--queue", queue, "-c", str(project), "--check", "models"])
+
+        exit_code = main(["collect", "--queue", queue, "--timeout", "0", "--stale-after", "60"])
+
+        assert exit_code == 1
+        assert capsys.readouterr().out.splitlines()[-1] == (
+            "timed out: 1 pending and 0 running jobs left"
+        )
@@ -0,0 +1,208 @@
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+
+from alembicverify.cloning import (
+    CLONE_STRATEGIES,
+    CloneStrategy,
+    MySQLCopyStrategy,
+    PostgresTemplateStrategy,
+    ReplayStrategy,
+    SQLiteFileStrategy,
+    clone_migrated_database,
+    strategy_for,
+)
+
+
+def tables(uri):
+    engine = create_engine(uri)
+    try:
+        return sorted(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.parametrize(
+    ("uri", "strategy"),
+    [
+        ("postgresql://user@localhost/temp_db", PostgresTemplateStrategy),
+        ("mysql+pymysql://user@localhost/temp_db", MySQLCopyStrategy),
+        ("mariadb://user@localhost/temp_db", MySQLCopyStrategy),
+        ("sqlite:////tmp/temp_db.db", SQLiteFileStrategy),
+        ("sqlite://", ReplayStrategy),
+        ("sqlite:///:memory:", ReplayStrategy),
+        ("sqlite:///file:temp_db?mode=memory&uri=true", ReplayStrategy),
+        ("mssql+pyodbc://user@localhost/temp_db", ReplayStrategy),
+    ],
+)
+def test_strategy_for(uri, strategy):
+    assert type(strategy_for(uri)) is strategy
+
+
+def test_register_strategy():
+    class OracleStrategy(CloneStrategy):
+        name = "oracle"
+
+        def clone(self, source_uri, target_uri):
+            pass
+
+    class IncompleteStrategy(CloneStrategy):
+        name = "incomplete"
+
+    with patch.dict(CLONE_STRATEGIES, {"oracle": OracleStrategy()}):
+        assert strategy_for("oracle://user@localhost/temp_db").name == "oracle"
+    with pytest.raises(TypeError, match="abstract"):
+        IncompleteStrategy()
+
+
+class TestCloneMigratedDatabase:
+    def test_sqlite(self, sqlite_migrations, sqlite_uri, tmp_path):
+        first = f"sqlite:///{tmp_path / 'first.db'}"
+        second = f"sqlite:///{tmp_path / 'second.db'}"
+
+        with patch.object(command, "upgrade", wraps=command.upgrade) as upgrade_mock:
+            assert clone_migrated_database(first, sqlite_migrations).name == "file"
+            assert clone_migrated_database(second, sqlite_migrations, "head").name == "file"
+
+        # the migrations ran once, on the template
+        assert upgrade_mock.call_count == 1
+        (template,) = tmp_path.glob("tmpl_*_cccc00000003.db")
+        assert tables(first) == tables(second) == ["alembic_version", "companies", "employees"]
+        assert tables(f"sqlite:///{template}") == tables(first)
+
+    def test_worker(self, sqlite_migrations, sqlite_uri, tmp_path):
+        clone_migrated_database(sqlite_uri, sqlite_migrations, "aaaa00000001", worker_id="gw1")
+
+        assert list(tmp_path.glob("tmpl_*_aaaa00000001_gw1.db"))
+        assert tables(sqlite_uri) == ["alembic_version", "companies"]
+
+    def test_replay(self, sqlite_migrations, sqlite_uri, tmp_path):
+        strategy = clone_migrated_database(
+            sqlite_uri, sqlite_migrations, "bbbb00000002", ReplayStrategy()
+        )
+
+        assert isinstance(strategy, CloneStrategy)
+        assert strategy.name == "replay"
+        assert not list(tmp_path.glob("tmpl_*"))
+        assert tables(sqlite_uri) == ["alembic_version", "companies", "employees"]
+
+    def test_replay_failure(self, sqlite_migrations, sqlite_uri, tmp_path):
+        with pytest.raises(Exception, match="Can't locate revision"):
+            clone_migrated_database(sqlite_uri, sqlite_migrations, "ffff", ReplayStrategy())
+
+        assert not (tmp_path / "test.sqlite").exists()
+
+    def test_replay_has_no_template(self, sqlite_uri):
+        with pytest.raises(NotImplementedError, match="not copied from a template"):
+            ReplayStrategy().clone(sqlite_uri, sqlite_uri)
+
+
+def test_sqlite_copies_the_rows(sqlite_migrations, sqlite_uri, tmp_path):
+    clone_migrated_database(sqlite_uri, sqlite_migrations)
+    (template,) = tmp_path.glob("tmpl_*.db")
+    engine = create_engine(f"sqlite:///{template}")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO companies (name) VALUES ('acme')"))
+    engine.dispose()
+
+    copy = f"sqlite:///{tmp_path / 'copy.db'}"
+    SQLiteFileStrategy().clone(f"sqlite:///{template}", copy)
+
+    engine = create_engine(copy)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM companies")).scalars().all() == ["acme"]
+    engine.dispose()
+
+
+def test_postgresql_template():
+    with patch("alembicverify.cloning.create_database") as create_database_mock:
+        PostgresTemplateStrategy().clone(
+            "postgresql://user@localhost/tmpl_0123_aaaa", "postgresql://user@localhost/temp_db"
+        )
+
+    assert create_database_mock.call_args_list == [
+        call("postgresql://user@localhost/temp_db", template="tmpl_0123_aaaa")
+    ]
+
+
+class TestMySQLCopy:
+    source = "mysql://user@localhost/tmpl_0123_aaaa"
+    target = "mysql://user@localhost/temp_db"
+    SHOW_CREATE_VIEW = (
+        "CREATE ALGORITHM=UNDEFINED DEFINER=`migrator`@`%` SQL SECURITY DEFINER VIEW "
+        "`tmpl_0123_aaaa`.`staff` AS select `tmpl_0123_aaaa`.`employees`.`id` AS `id`,"
+        "`tmpl_0123_aaaa`.`companies`.`name` AS `company` from (`tmpl_0123_aaaa`.`employees` "
+        "join `tmpl_0123_aaaa`.`companies` on((`tmpl_0123_aaaa`.`companies`.`id` = "
+        "`tmpl_0123_aaaa`.`employees`.`company_id`)))"
+    )
+
+    @pytest.fixture
+    def create_database_mock(self):
+        with patch("alembicverify.cloning.create_database") as m:
+            yield m
+
+    @pytest.fixture
+    def drop_database_mock(self):
+        with patch("alembicverify.cloning.drop_database") as m:
+            yield m
+
+    @pytest.fixture
+    def conn(self):
+        conn = MagicMock()
+        conn.execute.return_value.all.return_value = [
+            ("companies", "BASE TABLE"),
+            ("employees", "BASE TABLE"),
+            ("staff", "VIEW"),
+        ]
+        conn.exec_driver_sql.return_value.one.side_effect = lambda: (
+            None,
+            self.SHOW_CREATE_VIEW
+            if "VIEW" in conn.exec_driver_sql.call_args.args[0]
+            else conn.exec_driver_sql.call_args.args[0].replace("SHOW", "CREATE"),
+        )
+        return conn
+
+    @pytest.fixture
+    def create_engine_mock(self, conn):
+        with patch("alembicverify.cloning.create_engine") as m:
+            preparer = m.return_value.dialect.identifier_preparer
+            preparer.quote = lambda name: f"`{name}`"
+            preparer.quote_identifier = lambda name: f"`{name}`"
+            m.return_value.connect.return_value.__enter__.return_value = conn
+            m.return_value.begin.return_value.__enter__.return_value = conn
+            yield m
+
+    @pytest.mark.usefixtures("create_engine_mock")
+    def test_copy(self, create_database_mock, drop_database_mock, conn):
+        MySQLCopyStrategy(jobs=1).clone(self.source, self.target)
+
+        assert create_database_mock.call_args_list == [call(self.target)]
+        assert conn.execute.call_args.args[1] == {"schema": "tmpl_0123_aaaa"}
+        statements = [c.args[0] for c in conn.exec_driver_sql.call_args_list]
+        assert statements == [
+            "SET FOREIGN_KEY_CHECKS = 0",
+            "SHOW CREATE TABLE `tmpl_0123_aaaa`.`companies`",
+            "CREATE CREATE TABLE `tmpl_0123_aaaa`.`companies`",
+            "INSERT INTO `companies` SELECT * FROM `tmpl_0123_aaaa`.`companies`",
+            "SET FOREIGN_KEY_CHECKS = 0",
+            "SHOW CREATE TABLE `tmpl_0123_aaaa`.`employees`",
+            "CREATE CREATE TABLE `tmpl_0123_aaaa`.`employees`",
+            "INSERT INTO `employees` SELECT * FROM `tmpl_0123_aaaa`.`employees`",
+            "SHOW CREATE VIEW `tmpl_0123_aaaa`.`staff`",
+            "CREATE ALGORITHM=UNDEFINED SQL SECURITY DEFINER VIEW `staff` AS select "
+            "`employees`.`id` AS `id`,`companies`.`name` AS `company` from (`employees` join "
+            "`companies` on((`companies`.`id` = `employees`.`company_id`)))",
+        ]
+        assert drop_database_mock.call_count == 0
+
+    @pytest.mark.usefixtures("create_database_mock")
+    def test_failure(self, create_engine_mock, drop_database_mock, conn):
+        conn.execute.side_effect = RuntimeError("denied")
+
+        with pytest.raises(RuntimeError, match="denied"):
+            MySQLCopyStrategy().clone(self.source, self.target)
+
+        assert drop_database_mock.call_args_list == [call(self.target)]
+        assert create_engine_mock.return_value.dispose.called
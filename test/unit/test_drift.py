@@ -0,0 +1,135 @@
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy as sa
+from alembic.config import Config
+
+from alembicverify.drift import DriftReport, detect_drift
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def models(age=True, extra_table=False):
+    metadata = sa.MetaData()
+    sa.Table(
+        "companies",
+        metadata,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False),
+    )
+    sa.Table(
+        "employees",
+        metadata,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("company_id", sa.Integer(), nullable=True),
+        *([sa.Column("age", sa.Integer(), nullable=True)] if age else []),
+    )
+    if extra_table:
+        sa.Table("projects", metadata, sa.Column("id", sa.Integer(), primary_key=True))
+    return metadata
+
+
+@pytest.fixture
+def uris(tmp_path):
+    return f"sqlite:///{tmp_path / 'migrations.db'}", f"sqlite:///{tmp_path / 'models.db'}"
+
+
+@pytest.fixture
+def config(sqlite_migrations, uris):
+    config = Config(sqlite_migrations)
+    config.set_main_option("sqlalchemy.url", uris[0])
+    return config
+
+
+def test_no_drift(config, uris):
+    report = detect_drift(uris[0], config, models(), uris[1])
+
+    assert report == DriftReport()
+    assert not report.has_drift
+
+
+def test_drift(config, uris):
+    report = detect_drift(uris[0], config, models(age=False, extra_table=True), uris[1])
+
+    assert report.has_drift
+    assert report.differences == {
+        "employees": ["unexpected column 'age'"],
+        "projects": ["table is missing"],
+    }
+    assert report.compared == ("employees",)
+
+
+def test_unexpected_table(config, uris):
+    metadata = models()
+    metadata.remove(metadata.tables["companies"])
+
+    report = detect_drift(uris[0], config, metadata, uris[1])
+
+    assert report.differences == {"companies": ["unexpected table"]}
+
+
+def test_cache(config, uris, tmp_path):
+    cache = DictCache()
+
+    first = detect_drift(uris[0], config, models(), uris[1], cache=cache)
+    assert (first.migrations_cached, first.models_cached) == (False, False)
+    assert len(cache) == 2
+
+    (tmp_path / "migrations.db").unlink()
+    (tmp_path / "models.db").unlink()
+    with patch("alembicverify.drift.prepare_schema_from_migrations") as prepare_mock:
+        second = detect_drift(uris[0], config, models(), uris[1], cache=cache)
+
+    # nothing changed, so neither database is touched
+    prepare_mock.assert_not_called()
+    assert not (tmp_path / "models.db").exists()
+    assert second == DriftReport(migrations_cached=True, models_cached=True)
+
+    # changing the models only reflects them again
+    third = detect_drift(uris[0], config, models(age=False), uris[1], cache=cache)
+    assert (third.migrations_cached, third.models_cached) == (True, False)
+    assert third.differences == {"employees": ["unexpected column 'age'"]}
+    assert len(cache) == 3
+
+
+def test_cache_is_keyed_by_migrations(config, uris, sqlite_migrations):
+    cache = DictCache()
+    detect_drift(uris[0], config, models(), uris[1], cache=cache)
+
+    revision = next((sqlite_migrations.parent / "migrations" / "versions").glob("cccc*.py"))
+    revision.write_text(revision.read_text() + "\n# edited\n")
+    (sqlite_migrations.parent / "migrations.db").unlink()
+    report = detect_drift(uris[0], config, models(), uris[1], cache=cache)
+
+    assert (report.migrations_cached, report.models_cached) == (False, True)
+
+
+def test_index_drift(config, uris):
+    metadata = models()
+    sa.Index("ix_employees_name", metadata.tables["employees"].c.name)
+
+    report = detect_drift(uris[0], config, metadata, uris[1])
+
+    assert report.differences == {"employees": ["indexes is [], expected ['(name)']"]}
+
+
+def test_column_order_is_not_drift(config, uris):
+    metadata = sa.MetaData()
+    models().tables["companies"].to_metadata(metadata)
+    sa.Table(
+        "employees",
+        metadata,
+        sa.Column("age", sa.Integer(), nullable=True),
+        sa.Column("company_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("id", sa.Integer(), primary_key=True),
+    )
+
+    report = detect_drift(uris[0], config, metadata, uris[1])
+
+    assert report.compared == ("employees",)
+    assert report.differences == {}
@@ -0,0 +1,106 @@
+from unittest.mock import Mock, call, patch
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from alembicverify.durability import relaxed_durability
+
+
+def pragmas(uri):
+    engine = create_engine(uri)
+    try:
+        with engine.connect() as conn:
+            return (
+                conn.execute(text("PRAGMA journal_mode")).scalar(),
+                conn.execute(text("PRAGMA synchronous")).scalar(),
+            )
+    finally:
+        engine.dispose()
+
+
+def test_sqlite(sqlite_uri, tmp_path):
+    other_uri = f"sqlite:///{tmp_path / 'other.sqlite'}"
+
+    with relaxed_durability(sqlite_uri) as settings:
+        assert settings == {"journal_mode": "MEMORY", "synchronous": "OFF"}
+        assert pragmas(sqlite_uri) == ("memory", 0)
+        assert pragmas(other_uri) == ("delete", 2)
+
+    assert pragmas(sqlite_uri) == ("delete", 2)
+
+
+def test_sqlite_pragmas_are_applied_once_per_connection(sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    with relaxed_durability(sqlite_uri):
+        with engine.connect() as conn:
+            conn.connection.info["alembicverify_relaxed"] = False
+            conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "memory"
+            conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    engine.dispose()
+
+
+def test_other_dialects_are_untouched():
+    with patch("alembicverify.durability.event") as event_mock:
+        with relaxed_durability("mysql://user@localhost/db") as settings:
+            assert settings == {}
+
+    assert event_mock.listen.call_count == 0
+
+
+class TestPostgresql:
+    uri = "postgresql://user@localhost:5432/temp_db"
+
+    @pytest.fixture
+    def create_engine_mock(self):
+        with patch("alembicverify.durability.create_engine") as m:
+            m.return_value.url = make_url(self.uri)
+            yield m
+
+    @pytest.fixture
+    def event_mock(self):
+        with patch("alembicverify.durability.event") as m:
+            yield m
+
+    @pytest.mark.usefixtures("event_mock")
+    def test_synchronous_commit(self, create_engine_mock):
+        with relaxed_durability(self.uri) as settings:
+            assert settings == {"synchronous_commit": "off"}
+
+        conn = create_engine_mock.return_value.begin.return_value.__enter__.return_value
+        conn.dialect.identifier_preparer.quote.assert_called_once_with("temp_db")
+        database = conn.dialect.identifier_preparer.quote.return_value
+        assert conn.exec_driver_sql.call_args_list == [
+            call(f"ALTER DATABASE {database} SET synchronous_commit = off")
+        ]
+        create_engine_mock.return_value.dispose.assert_called_once_with()
+
+    @pytest.mark.usefixtures("create_engine_mock")
+    def test_unlogged_tables(self, event_mock):
+        with relaxed_durability(self.uri, unlogged_tables=True) as settings:
+            assert settings == {"synchronous_commit": "off", "unlogged_tables": "on"}
+
+            [listen_call] = event_mock.listen.call_args_list
+            _, name, before_cursor_execute = listen_call.args
+            assert name == "before_cursor_execute"
+            assert listen_call.kwargs == {"retval": True}
+
+            connection = Mock()
+            connection.engine.url = make_url("postgresql+psycopg2://other@localhost:5432/temp_db")
+            assert before_cursor_execute(
+                connection, None, "\nCREATE TABLE employees (id INTEGER)", {}, None, False
+            ) == ("\nCREATE UNLOGGED TABLE employees (id INTEGER)", {})
+            assert before_cursor_execute(
+                connection, None, "INSERT INTO employees VALUES (1)", {}, None, False
+            ) == ("INSERT INTO employees VALUES (1)", {})
+
+            connection.engine.url = make_url("postgresql://user@localhost:5432/other_db")
+            assert before_cursor_execute(
+                connection, None, "CREATE TABLE employees (id INTEGER)", {}, None, False
+            ) == ("CREATE TABLE employees (id INTEGER)", {})
+
+        assert event_mock.remove.call_count == 1
@@ -0,0 +1,342 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from alembicverify.explain import (
+    RevisionPlan,
+    StatementPlan,
+    TableScan,
+    _is_dml,
+    _mysql_plan,
+    _plan,
+    _postgresql_plan,
+    _sqlite_plan,
+    explain_migrations,
+)
+from alembicverify.util import config_from_ini
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    return config_from_ini(sqlite_uri, sqlite_migrations)
+
+
+def seed(uri, employees):
+    engine = create_engine(uri)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO companies (id, name) VALUES (1, 'acme')"))
+        conn.execute(
+            text("INSERT INTO employees (name, company_id) VALUES (:name, 1)"),
+            [{"name": f"employee {n}"} for n in range(employees)],
+        )
+    engine.dispose()
+
+
+def query(uri, sql):
+    engine = create_engine(uri)
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql)).all()
+    engine.dispose()
+    return rows
+
+
+def test_explain_migrations(config, sqlite_uri):
+    command.upgrade(config, "bbbb00000002")
+    seed(sqlite_uri, 20)
+
+    plans = explain_migrations(sqlite_uri, config, large_table_rows=10)
+
+    assert plans == [
+        RevisionPlan(
+            "cccc00000003",
+            (
+                StatementPlan(
+                    "UPDATE employees SET age = 30",
+                    20,
+                    (TableScan("employees", 20, False),),
+                    ("rewrites every row of employees (~20 rows)",),
+                ),
+            ),
+        )
+    ]
+    assert plans[0].estimated_rows == 20
+    assert plans[0].warnings == ("rewrites every row of employees (~20 rows)",)
+    assert query(sqlite_uri, "SELECT age, count(*) FROM employees GROUP BY age") == [(30, 20)]
+    assert query(sqlite_uri, "SELECT version_num FROM alembic_version") == [("cccc00000003",)]
+
+
+def test_small_tables_are_not_reported(config, sqlite_uri):
+    plans = explain_migrations(sqlite_uri, config)
+
+    assert [plan.revision for plan in plans] == ["aaaa00000001", "bbbb00000002", "cccc00000003"]
+    assert plans[0].statements == ()
+    assert plans[2].estimated_rows == 0
+    assert plans[2].warnings == ()
+
+
+def test_scans_and_indexes(config, sqlite_migrations, sqlite_uri):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "backfill",
+        "op.execute(\"UPDATE employees SET age = 31 WHERE name = 'employee 1'\")\n"
+        'op.execute("UPDATE employees SET age = 32 WHERE id = 2")\n'
+        'op.execute("INSERT INTO companies (name) SELECT name FROM employees")\n'
+        'op.execute("DELETE FROM companies")',
+        "pass",
+    )
+    command.upgrade(config, "cccc00000003")
+    seed(sqlite_uri, 10)
+
+    (plan,) = explain_migrations(sqlite_uri, config, "dddd00000004", large_table_rows=10)
+
+    assert [statement.scans for statement in plan.statements] == [
+        (TableScan("employees", 10, True),),
+        (),
+        (TableScan("employees", 10, False),),
+        # the companies inserted by the previous statement are counted
+        (TableScan("companies", 11, False),),
+    ]
+    assert plan.estimated_rows == 11
+    assert plan.warnings == (
+        "sequential scan of employees (~10 rows): no index matches the filter",
+        "sequential scan of employees (~10 rows)",
+        "rewrites every row of companies (~11 rows)",
+    )
+
+
+def test_common_table_expressions(config, sqlite_migrations, sqlite_uri):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "backfill",
+        'op.execute("WITH young AS (SELECT id FROM employees) SELECT count(*) FROM young")\n'
+        'op.execute("WITH acme AS (SELECT 1) UPDATE employees SET age = 33")',
+        "pass",
+    )
+    command.upgrade(config, "cccc00000003")
+    seed(sqlite_uri, 10)
+
+    (plan,) = explain_migrations(sqlite_uri, config, "dddd00000004")
+
+    assert [statement.statement for statement in plan.statements] == [
+        "WITH acme AS (SELECT 1) UPDATE employees SET age = 33"
+    ]
+    assert query(sqlite_uri, "SELECT DISTINCT age FROM employees") == [(33,)]
+
+
+def test_backfill_before_constraint(config, sqlite_migrations, sqlite_uri):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "required level",
+        'op.add_column("employees", sa.Column("level", sa.Integer))\n'
+        'op.execute("UPDATE employees SET level = 1")\n'
+        'with op.batch_alter_table("employees") as batch_op:\n'
+        '    batch_op.alter_column("level", existing_type=sa.Integer, nullable=False)',
+        "pass",
+    )
+    command.upgrade(config, "cccc00000003")
+    seed(sqlite_uri, 5)
+
+    (plan,) = explain_migrations(sqlite_uri, config, "dddd00000004")
+
+    # the copy of the table recreated by the batch operation is not explained
+    assert [statement.statement for statement in plan.statements] == [
+        "UPDATE employees SET level = 1"
+    ]
+    assert query(sqlite_uri, "SELECT level, count(*) FROM employees GROUP BY level") == [(1, 5)]
+    assert query(sqlite_uri, "SELECT version_num FROM alembic_version") == [("dddd00000004",)]
+
+
+@pytest.mark.parametrize(
+    ("statement", "dml"),
+    [
+        ("INSERT INTO companies (name) VALUES ('acme')", True),
+        ("  update employees SET age = 30", True),
+        ("DELETE FROM companies", True),
+        ("WITH old AS (SELECT id FROM employees) DELETE FROM employees WHERE id IN old", True),
+        (
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION SELECT i + 1 FROM n) INSERT INTO t SELECT i",
+            True,
+        ),
+        ("WITH x AS (UPDATE employees SET age = 1 RETURNING id) SELECT * FROM x", False),
+        ('WITH "update" AS (SELECT \'delete\') SELECT * FROM "update"', False),
+        ("WITH x AS (SELECT 1) VALUES (1)", False),
+        ("WITH", False),
+        ("SELECT * FROM employees", False),
+        ("CREATE TRIGGER t AFTER UPDATE ON employees BEGIN DELETE FROM companies; END", False),
+    ],
+)
+def test_is_dml(statement, dml):
+    assert _is_dml(statement) is dml
+
+
+def test_multiple_current_heads(config, sqlite_migrations, sqlite_uri):
+    versions = sqlite_migrations.parent / "migrations" / "versions"
+    write_revision(versions, "dddd", "bbbb00000002", "branch", "pass", "pass")
+    command.upgrade(config, "heads")
+
+    assert explain_migrations(sqlite_uri, config, "cccc00000003") == []
+
+
+def test_unsupported_dialect(config):
+    with pytest.raises(ValueError, match="EXPLAIN is not supported on mssql"):
+        explain_migrations("mssql://user@localhost/db", config)
+
+
+POSTGRESQL_UPDATE = [
+    {
+        "Plan": {
+            "Node Type": "ModifyTable",
+            "Plan Rows": 0,
+            "Plans": [
+                {
+                    "Node Type": "Nested Loop",
+                    "Plan Rows": 5000,
+                    "Plans": [
+                        {"Node Type": "Seq Scan", "Relation Name": "employees", "Plan Rows": 5000},
+                        {
+                            "Node Type": "Seq Scan",
+                            "Relation Name": "companies",
+                            "Filter": "(name = 'acme')",
+                            "Plan Rows": 1,
+                        },
+                    ],
+                }
+            ],
+        }
+    }
+]
+
+
+SEQ_SCAN = [{"Plan": {"Node Type": "Seq Scan", "Relation Name": "employees", "Plan Rows": 3}}]
+
+
+def test_postgresql_plan():
+    expected = (5000, [("employees", False), ("companies", True)])
+
+    assert _postgresql_plan(POSTGRESQL_UPDATE) == expected
+    assert _postgresql_plan(json.dumps(POSTGRESQL_UPDATE)) == expected
+    assert _postgresql_plan([{"Plan": {"Node Type": "Result", "Plan Rows": 1}}]) == (1, [])
+
+
+def test_mysql_plan():
+    columns = ["id", "select_type", "table", "type", "rows", "Extra"]
+    rows = [
+        (1, "UPDATE", "employees", "ALL", 5000, "Using where"),
+        (1, "SIMPLE", "companies", "ref", 1, None),
+        (2, "DERIVED", "<derived2>", "ALL", None, None),
+        (1, "SIMPLE", "teams", "ALL", 20, None),
+    ]
+
+    assert _mysql_plan(columns, rows) == (5000, [("employees", True), ("teams", False)])
+
+
+def test_sqlite_plan():
+    rows = [
+        (2, 0, 0, "SCAN employees"),
+        (3, 0, 0, "SCAN TABLE companies"),
+        (4, 0, 0, "SEARCH teams USING INDEX ix_teams (id=?)"),
+        (5, 0, 0, "SCAN CONSTANT ROW"),
+        (6, 0, 0, "SCAN (subquery-1)"),
+    ]
+
+    assert _sqlite_plan(rows) == ["employees", "companies"]
+
+
+class TestTableRows:
+    def connection(self, dialect, *fetched):
+        connection = Mock()
+        connection.dialect.name = dialect
+        connection.dialect.identifier_preparer.quote = lambda name: f'"{name}"'
+        connection.dialect.identifier_preparer.quote_identifier = lambda name: f'"{name}"'
+        connection.connection.cursor.return_value.fetchone.side_effect = fetched
+        return connection
+
+    def scan_rows(self, connection, statement="UPDATE employees SET age = 30 WHERE age = 1"):
+        columns = ["table", "type", "rows", "Extra"]
+        rows = [("employees", "ALL", 9, "Using where")]
+        plan = _plan(connection, statement, columns, rows, 10, {})
+        return plan.scans[0].rows, plan.warnings
+
+    def executed(self, connection):
+        cursor = connection.connection.cursor.return_value
+        return [c.args[0] for c in cursor.execute.call_args_list]
+
+    def test_estimate(self):
+        connection = self.connection("mysql", (20_000,))
+
+        assert self.scan_rows(connection) == (
+            20_000,
+            ("sequential scan of employees (~20000 rows): no index matches the filter",),
+        )
+        (estimate,) = self.executed(connection)
+        assert "table_name = 'employees'" in estimate
+        connection.connection.cursor.return_value.close.assert_called_once_with()
+
+    def test_unknown_table(self):
+        connection = self.connection("mysql", None)
+
+        assert self.scan_rows(connection) == (
+            None,
+            ("sequential scan of employees (unknown size): no index matches the filter",),
+        )
+
+    def test_no_estimate(self):
+        connection = self.connection("mariadb", (-1,))
+
+        assert self.scan_rows(connection)[0] is None
+        assert len(self.executed(connection)) == 1
+
+    def test_analyze_when_not_analyzed(self):
+        connection = self.connection("postgresql", (-1,), (3,))
+        plan = _plan(connection, "DELETE FROM employees", ["QUERY PLAN"], [(SEQ_SCAN,)], 10, {})
+
+        assert plan.scans == (TableScan("employees", 3, False),)
+        estimate, analyze, again = self.executed(connection)
+        assert analyze == 'ANALYZE "employees"'
+        assert again == estimate
+        assert "count(*)" not in estimate
+
+    def test_count(self):
+        connection = self.connection("sqlite", (3,))
+        plan = _plan(connection, "DELETE FROM employees", [], [(2, 0, 0, "SCAN employees")], 10, {})
+
+        assert plan.scans == (TableScan("employees", 3, False),)
+        assert self.executed(connection) == ['SELECT count(*) FROM "employees"']
+
+    def test_postgresql(self):
+        connection = self.connection("postgresql", (7,), (7,))
+        plan = _plan(
+            connection, "DELETE FROM employees", ["QUERY PLAN"], [(POSTGRESQL_UPDATE,)], 10, {}
+        )
+
+        assert plan.estimated_rows == 5000
+        assert plan.scans == (TableScan("employees", 7, False), TableScan("companies", 7, True))
+        assert "to_regclass('\"employees\"')" in self.executed(connection)[0]
+
+    def test_sizes_are_cached(self):
+        connection = self.connection("postgresql", (7,))
+        table_rows = {"companies": 2}
+
+        for _ in range(2):
+            plan = _plan(
+                connection,
+                "DELETE FROM employees",
+                ["QUERY PLAN"],
+                [(POSTGRESQL_UPDATE,)],
+                10,
+                table_rows,
+            )
+
+        assert plan.scans == (TableScan("employees", 7, False), TableScan("companies", 2, True))
+        assert table_rows == {"companies": 2, "employees": 7}
+        assert len(self.executed(connection)) == 1
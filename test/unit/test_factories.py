@@ -0,0 +1,50 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import inspect
+
+from alembicverify._factories import (
+    _new_environments,
+    _savepoint_engine,
+)
+
+
+def test_new_environments_migrates_each_environment(sqlite_migrations, tmp_path):
+    environments = {
+        name: (f"sqlite:///{(tmp_path / f'{name}.sqlite').as_posix()}", sqlite_migrations)
+        for name in ("users", "orders", "billing")
+    }
+
+    with _new_environments(environments, "bbbb00000002", max_workers=None) as engines:
+        assert set(engines) == {"users", "orders", "billing"}
+        for engine in engines.values():
+            assert sorted(inspect(engine).get_table_names()) == [
+                "alembic_version",
+                "companies",
+                "employees",
+            ]
+
+    assert not list(tmp_path.glob("*.sqlite"))
+
+
+def test_new_environments_drops_databases_on_failure(sqlite_migrations, tmp_path):
+    environments = {
+        "good": (f"sqlite:///{(tmp_path / 'good.sqlite').as_posix()}", sqlite_migrations),
+        "bad": (f"sqlite:///{(tmp_path / 'bad.sqlite').as_posix()}", Path("missing.ini")),
+    }
+
+    with pytest.raises(Exception, match="No config file"):
+        with _new_environments(environments, "head", max_workers=2):
+            pass  # pragma: no cover
+
+    assert not list(tmp_path.glob("*.sqlite"))
+
+
+def test_savepoint_engine_leaves_other_dialects_alone():
+    with patch("alembicverify._factories.create_engine") as create_engine_mock:
+        create_engine_mock.return_value.dialect.name = "postgresql"
+        with patch("alembicverify._factories.event") as event_mock:
+            assert _savepoint_engine("postgresql:///db") is create_engine_mock.return_value
+
+    assert event_mock.listen.call_count == 0
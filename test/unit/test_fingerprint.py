@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from alembicverify.fingerprint import environment_fingerprint, revision_fingerprints
+from alembicverify.graph import RevisionGraph
+
+
+EXAMPLE_DIR = Path(__file__).parent.parent / "alembic_verify_example"
+
+
+@pytest.fixture
+def script_location(tmp_path):
+    location = tmp_path / "migrations"
+    shutil.copytree(EXAMPLE_DIR / "versions", location / "versions")
+    shutil.copy(EXAMPLE_DIR / "env.py", location / "env.py")
+    return location
+
+
+def load_script(script_location):
+    config = Config()
+    config.set_main_option("script_location", str(script_location))
+    return ScriptDirectory.from_config(config)
+
+
+def test_revision_fingerprints_cover_ancestry(script_location):
+    before = revision_fingerprints(load_script(script_location))
+
+    revision_file = next((script_location / "versions").glob("9182e2f9745a_*.py"))
+    revision_file.write_text(revision_file.read_text() + "\n# edited\n")
+    after = revision_fingerprints(load_script(script_location))
+
+    changed = {revision for revision in before if before[revision] != after[revision]}
+    assert changed == {"9182e2f9745a", "591a8001cae9", "44352f0a4052", "9331f5cd7f8a"}
+
+
+def test_revision_fingerprints_with_prebuilt_graph(script_location):
+    script = load_script(script_location)
+
+    fingerprints = revision_fingerprints(script, RevisionGraph.from_script(script))
+
+    assert fingerprints == revision_fingerprints(script)
+
+
+def test_environment_fingerprint(script_location):
+    script = load_script(script_location)
+
+    postgres = environment_fingerprint(script, "postgresql://user@host/db_one")
+
+    assert postgres == environment_fingerprint(script, "postgresql://other@host/db_two")
+    assert postgres != environment_fingerprint(script, "postgresql+psycopg://user@host/db_one")
+    assert postgres != environment_fingerprint(script, "sqlite:///db.sqlite")
+
+    (script_location / "env.py").write_text("# edited\n")
+    assert postgres != environment_fingerprint(script, "postgresql://user@host/db_one")
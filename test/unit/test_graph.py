@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from alembicverify.graph import RevisionGraph
+
+
+ALEMBIC_INI = Path(__file__).parent.parent.parent / "alembic.ini"
+
+
+@pytest.fixture
+def graph():
+    #      b - c
+    #     /     \
+    # a -+       e - f
+    #     \     /
+    #      d ---       g (depends on b)
+    return RevisionGraph(
+        {
+            "a": (),
+            "b": ("a",),
+            "c": ("b",),
+            "d": ("a",),
+            "e": ("c", "d"),
+            "f": ("e",),
+            "g": ("b",),
+        }
+    )
+
+
+def test_topological_order(graph):
+    assert graph.order == ("a", "b", "d", "c", "g", "e", "f")
+    assert len(graph) == 7
+    assert "e" in graph
+    assert "z" not in graph
+
+
+def test_heads_and_bases(graph):
+    assert graph.heads == ("g", "f")
+    assert graph.bases == ("a",)
+
+
+def test_ancestors_and_descendants(graph):
+    assert graph.ancestors("e") == ("a", "b", "d", "c")
+    assert graph.ancestors("a") == ()
+    assert graph.descendants("b") == ("c", "g", "e", "f")
+    assert graph.descendants("f") == ()
+    assert graph.down_revisions("e") == ("c", "d")
+
+
+def test_is_ancestor(graph):
+    assert graph.is_ancestor("a", "f")
+    assert graph.is_ancestor("d", "e")
+    assert not graph.is_ancestor("d", "c")
+    assert not graph.is_ancestor("e", "e")
+
+
+def test_heads_depending_on(graph):
+    assert graph.heads_depending_on("b") == ("g", "f")
+    assert graph.heads_depending_on("d") == ("f",)
+
+
+def test_upgrade_and_downgrade_paths(graph):
+    assert graph.upgrade_path(None, "e") == ("a", "b", "d", "c", "e")
+    assert graph.upgrade_path("c", "f") == ("d", "e", "f")
+    assert graph.downgrade_path("f", "c") == ("f", "e", "d")
+    assert graph.downgrade_path("c", "base") == ("c", "b", "a")
+
+
+def test_steps(graph):
+    assert graph.steps(None, "f") == 6
+    assert graph.steps("b", "e") == 3
+    assert graph.steps("e", "b") == -3
+    assert graph.steps("base", "base") == 0
+
+
+def test_steps_between_branches(graph):
+    with pytest.raises(ValueError, match="different branches"):
+        graph.steps("c", "d")
+
+
+def test_paths_to_verify(graph):
+    assert graph.paths_to_verify() == {
+        "g": ("a", "b", "g"),
+        "f": ("a", "b", "d", "c", "e", "f"),
+    }
+
+
+def test_unknown_revision(graph):
+    with pytest.raises(ValueError, match="Unknown revision 'z'"):
+        graph.ancestors("z")
+
+
+def test_unknown_down_revision():
+    with pytest.raises(ValueError, match="depends on unknown revision 'x'"):
+        RevisionGraph({"a": ("x",)})
+
+
+def test_cycle():
+    with pytest.raises(ValueError, match="cycle"):
+        RevisionGraph({"a": ("b",), "b": ("a",)})
+
+
+def test_from_script():
+    script = ScriptDirectory.from_config(Config(ALEMBIC_INI))
+
+    graph = RevisionGraph.from_script(script)
+
+    assert graph.heads == ("44352f0a4052", "9331f5cd7f8a")
+    assert graph.bases == ("3070a2ba5acc",)
+    assert graph.upgrade_path(None, "9331f5cd7f8a") == (
+        "3070a2ba5acc",
+        "6c4a48d80d8a",
+        "9182e2f9745a",
+        "591a8001cae9",
+        "9331f5cd7f8a",
+    )
+    assert graph.heads_depending_on("591a8001cae9") == ("44352f0a4052", "9331f5cd7f8a")
@@ -0,0 +1,212 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from alembicverify.jobqueue import Job, JobQueue, run_worker, wait_for_results
+from alembicverify.runner import CheckResult
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(tmp_path / "queue.db")
+
+
+@pytest.fixture
+def server_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'server.db'}"
+
+
+def test_submit_and_claim(queue, sqlite_migrations):
+    jobs = queue.submit(sqlite_migrations, ["stairway", "roundtrip"])
+
+    ini = str(sqlite_migrations)
+    assert jobs == [
+        Job(1, ini, "stairway", "cccc00000003"),
+        Job(2, ini, "roundtrip", "cccc00000003"),
+    ]
+    assert queue.claim("gw0") == replace(jobs[0], worker="gw0")
+    assert queue.counts() == {"pending": 1, "running": 1, "done": 0}
+    assert queue.claim("gw1") == replace(jobs[1], worker="gw1")
+    assert queue.claim("gw2") is None
+
+
+def test_unknown_check(queue, sqlite_migrations):
+    with pytest.raises(ValueError, match="Unknown checks: fast"):
+        queue.submit(sqlite_migrations, ["fast"])
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 0}
+
+
+def test_concurrent_claims(queue, sqlite_migrations):
+    for _ in range(5):
+        queue.submit(sqlite_migrations)
+
+    with ThreadPoolExecutor(4) as executor:
+        claims = list(executor.map(queue.claim, [f"gw{i}" for i in range(20)]))
+
+    claimed = [job.id for job in claims if job is not None]
+    assert sorted(claimed) == list(range(1, 16))
+
+
+def test_requeue_stale(queue, sqlite_migrations):
+    (job,) = queue.submit(sqlite_migrations, ["models"])
+    queue.claim("gw0")
+
+    assert queue.requeue_stale(60) == 0
+    time.sleep(0.01)
+    assert queue.requeue_stale(0) == 1
+    assert queue.claim("gw1") == replace(job, worker="gw1")
+
+
+def test_results(queue, sqlite_migrations):
+    queue.submit(sqlite_migrations, ["roundtrip", "models"])
+    first, second = queue.claim("gw0"), queue.claim("gw1")
+    queue.complete(second, CheckResult("models[heads]", "failed", 0.5, "drift", "details"))
+    queue.complete(first, CheckResult("roundtrip[cccc00000003]", "passed", 1.0))
+
+    assert queue.results() == [
+        CheckResult(f"{sqlite_migrations}::roundtrip[cccc00000003]", "passed", 1.0),
+        CheckResult(f"{sqlite_migrations}::models[heads]", "failed", 0.5, "drift", "details"),
+    ]
+
+
+def test_complete_checks_the_worker(queue, sqlite_migrations):
+    (job,) = queue.submit(sqlite_migrations, ["models"])
+    result = CheckResult("models[heads]", "passed", 0.5)
+
+    assert not queue.complete(job, result)
+    stale = queue.claim("gw0")
+    time.sleep(0.01)
+    queue.requeue_stale(0)
+    assert not queue.complete(stale, result)
+    current = queue.claim("gw1")
+
+    assert not queue.complete(stale, result)
+    assert queue.counts() == {"pending": 0, "running": 1, "done": 0}
+    assert queue.complete(current, result)
+    assert not queue.complete(current, result)
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 1}
+
+
+def test_claim_taken_by_another_worker(queue, sqlite_migrations, tmp_path):
+    first, second = queue.submit(sqlite_migrations, ["stairway", "roundtrip"])
+
+    def claim_first(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE alembicverify_jobs") and not taken:
+            # another worker claims the job between the query and the claim of gw0
+            taken.append(None)
+            taken[0] = JobQueue(tmp_path / "queue.db").claim("gw1")
+
+    taken: list[Job | None] = []
+    event.listen(Engine, "before_cursor_execute", claim_first)
+    try:
+        assert queue.claim("gw0") == replace(second, worker="gw0")
+    finally:
+        event.remove(Engine, "before_cursor_execute", claim_first)
+    assert taken == [replace(first, worker="gw1")]
+
+
+def test_server_uri(sqlite_migrations, tmp_path):
+    uri = f"sqlite:///{(tmp_path / 'queue.db').as_posix()}"
+    JobQueue(tmp_path / "queue.db").submit(sqlite_migrations, ["models"])
+
+    assert JobQueue(uri).claim("gw0") == Job(1, str(sqlite_migrations), "models", "heads", "gw0")
+
+
+def test_tables_created_concurrently(tmp_path):
+    create_all = MetaData.create_all
+    errors = [OperationalError("CREATE TABLE", {}, Exception("table already exists"))]
+
+    def create_after_another_process(metadata, bind):
+        if errors:
+            raise errors.pop()
+        create_all(metadata, bind)
+
+    with patch.object(
+        MetaData, "create_all", autospec=True, side_effect=create_after_another_process
+    ):
+        queue = JobQueue(tmp_path / "queue.db")
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 0}
+
+
+def test_sqlite_queue_on_another_host(queue, tmp_path):
+    JobQueue(tmp_path / "queue.db")
+
+    with patch("alembicverify.jobqueue.socket.gethostname", return_value="elsewhere"):
+        with pytest.raises(ValueError, match="was created on .*: use a database server"):
+            JobQueue(tmp_path / "queue.db")
+
+
+def test_server_queue_on_another_host(queue, tmp_path):
+    # only SQLite files are bound to the host that created them
+    with (
+        patch("alembicverify.jobqueue.make_url") as make_url,
+        patch("alembicverify.jobqueue.socket.gethostname", return_value="elsewhere"),
+    ):
+        make_url.return_value.get_backend_name.return_value = "postgresql"
+
+        assert JobQueue(tmp_path / "queue.db").counts()["pending"] == 0
+
+
+def test_run_worker(queue, sqlite_migrations, server_uri, tmp_path):
+    queue.submit(sqlite_migrations, ["stairway", "roundtrip"])
+
+    assert run_worker(queue, server_uri) == 2
+
+    assert queue.counts() == {"pending": 0, "running": 0, "done": 2}
+    assert [result.outcome for result in queue.results()] == ["passed", "passed"]
+    assert not list(tmp_path.glob("temp_*"))
+
+
+def test_run_worker_waits_for_jobs(queue, sqlite_migrations, server_uri):
+    assert run_worker(queue, server_uri, "gw0", idle_timeout=0.02, poll_interval=0.01) == 0
+
+
+def test_several_trees(queue, sqlite_migrations, server_uri, tmp_path):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "broken",
+        'op.execute("SELECT * FROM missing")',
+        "pass",
+    )
+    other = tmp_path / "other.ini"
+    other.write_text(sqlite_migrations.read_text())
+    queue.submit(sqlite_migrations, ["roundtrip"])
+    queue.submit(other, ["roundtrip"])
+
+    # alembic can't run migrations in several threads, so workers are processes
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        done = list(executor.map(run_worker, [queue] * 2, [server_uri] * 2, ["gw0", "gw1"]))
+    results = wait_for_results(queue, timeout=1)
+
+    assert sum(done) == 2
+    assert [(result.name, result.outcome) for result in results] == [
+        (f"{sqlite_migrations}::roundtrip[dddd00000004]", "failed"),
+        (f"{other}::roundtrip[dddd00000004]", "failed"),
+    ]
+
+
+def test_wait_for_results(queue, sqlite_migrations):
+    queue.submit(sqlite_migrations, ["models"])
+    queue.claim("gw0")
+
+    with pytest.raises(TimeoutError, match="0 pending and 1 running jobs left"):
+        wait_for_results(queue, timeout=0.02, poll_interval=0.01)
+
+    # the job of a dead worker is given back, and nobody picks it up
+    with pytest.raises(TimeoutError, match="1 pending and 0 running jobs left"):
+        wait_for_results(queue, timeout=0, stale_after=0)
+
+    queue.complete(queue.claim("gw1"), CheckResult("models[heads]", "passed", 0.5))
+    assert len(wait_for_results(queue)) == 1
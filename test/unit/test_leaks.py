@@ -0,0 +1,126 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, event, pool, text
+
+from alembicverify.leaks import Leak, LeakTracker
+
+
+def test_disposed_engines_do_not_leak(sqlite_uri):
+    with LeakTracker(sqlite_uri) as tracker:
+        engine = create_engine(sqlite_uri)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        engine.dispose()
+
+    assert tracker.leaks() == []
+    assert not event.contains(pool.Pool, "connect", tracker._on_connect)
+
+
+def test_engine_not_disposed(sqlite_uri):
+    with LeakTracker(sqlite_uri) as tracker:
+        engine = create_engine(sqlite_uri)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    (leak,) = tracker.leaks()
+    assert leak.kind == "engine"
+    assert leak.message == (
+        f"a connection to {engine.url.database} is still open in the pool of an engine that was "
+        "not disposed, opened at:"
+    )
+    assert "test_engine_not_disposed" in leak.stack
+    assert "sqlalchemy" not in leak.stack
+
+    tracker.close()
+    assert tracker.leaks() == []
+    engine.dispose()
+
+
+def test_connection_not_returned(sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    with LeakTracker(sqlite_uri) as tracker:
+        with engine.connect():
+            pass
+        conn = engine.connect()
+
+    (leak,) = tracker.leaks()
+    assert leak.kind == "checkout"
+    assert leak.message.endswith("was checked out and never returned, at:")
+    assert "conn = engine.connect()" in leak.stack
+    assert str(leak) == f"{leak.message}\n{leak.stack}"
+
+    tracker.close()
+    conn.invalidate()
+    engine.dispose()
+
+
+def test_connections_opened_before_are_ignored(sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    with engine.connect():
+        pass
+    with LeakTracker(sqlite_uri) as tracker:
+        engine.connect()
+
+    assert tracker.leaks() == []
+    engine.dispose()
+
+
+def test_detached_connections(sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    with LeakTracker(sqlite_uri) as tracker:
+        with engine.connect() as conn:
+            conn.connection.detach()
+            assert len(tracker.leaks()) == 1
+        assert tracker.leaks() == []
+    engine.dispose()
+
+
+def test_other_databases_are_ignored(sqlite_uri, tmp_path):
+    other = create_engine(f"sqlite:///{tmp_path / 'other.sqlite'}")
+    with LeakTracker(sqlite_uri) as tracker:
+        other.connect()
+        create_engine(sqlite_uri).raw_connection()
+
+    assert tracker.leaks() == []
+    other.dispose()
+
+
+def test_close_ignores_errors(sqlite_uri):
+    with LeakTracker(sqlite_uri) as tracker:
+        create_engine(sqlite_uri).connect()
+    (tracked,) = tracker._connections.values()
+    tracked.dbapi_connection = MagicMock()
+    tracked.dbapi_connection.close.side_effect = RuntimeError("gone")
+
+    tracker.close()
+
+    assert tracker.leaks() == []
+
+
+class TestServerSessions:
+    uri = "postgresql://user@localhost:5432/temp_db"
+
+    @pytest.fixture
+    def create_engine_mock(self):
+        with patch("alembicverify.leaks.create_engine") as m:
+            yield m
+
+    def sessions(self, create_engine_mock):
+        conn = create_engine_mock.return_value.connect.return_value.__enter__.return_value
+        return conn.exec_driver_sql.return_value.scalar
+
+    def test_other_sessions(self, create_engine_mock):
+        self.sessions(create_engine_mock).return_value = 2
+
+        assert LeakTracker(self.uri).leaks() == [
+            Leak("backend", "2 other sessions are connected to temp_db")
+        ]
+        conn = create_engine_mock.return_value.connect.return_value.__enter__.return_value
+        assert "pg_stat_activity" in conn.exec_driver_sql.call_args.args[0]
+        assert create_engine_mock.return_value.dispose.call_count == 1
+
+    def test_no_other_sessions(self, create_engine_mock):
+        self.sessions(create_engine_mock).return_value = 0
+
+        assert LeakTracker("mysql://user@localhost/temp_db").leaks() == []
@@ -0,0 +1,132 @@
+import pytest
+
+from alembicverify.lint import Hazard, lint_golden_files, lint_migrations, lint_sql
+from alembicverify.offline import render_migrations, write_golden_files
+from test.unit.conftest import write_revision
+
+
+@pytest.mark.parametrize(
+    ("sql", "rule", "severity"),
+    [
+        ("CREATE INDEX ix_name ON employees (name);", "create-index", "error"),
+        ("CREATE UNIQUE INDEX ix_name ON employees (name);", "create-index", "error"),
+        ("ALTER TABLE employees ADD INDEX ix_name (name);", "create-index", "error"),
+        ("ALTER TABLE employees ALTER COLUMN age TYPE BIGINT;", "alter-column-type", "error"),
+        ("ALTER TABLE employees MODIFY age BIGINT NULL;", "alter-column-type", "error"),
+        ("ALTER TABLE employees ALTER COLUMN age SET NOT NULL;", "set-not-null", "warning"),
+        (
+            "ALTER TABLE employees ADD COLUMN age INTEGER NOT NULL;",
+            "not-null-without-default",
+            "error",
+        ),
+        (
+            "ALTER TABLE employees ADD COLUMN nickname VARCHAR(20), "
+            "ADD COLUMN salary NUMERIC(10, 2) NOT NULL;",
+            "not-null-without-default",
+            "error",
+        ),
+        ("UPDATE employees SET age = 30;", "full-table-update", "warning"),
+        ("DELETE FROM employees;", "full-table-update", "warning"),
+    ],
+)
+def test_hazards(sql, rule, severity):
+    (hazard,) = lint_sql(sql, revision="aaaa")
+
+    assert (hazard.revision, hazard.rule, hazard.severity) == ("aaaa", rule, severity)
+    assert hazard.statement == sql.rstrip(";")
+    assert str(hazard).startswith(f"aaaa: {severity}: {rule}: ")
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "CREATE INDEX CONCURRENTLY ix_name ON employees (name);",
+        "ALTER TABLE employees ADD COLUMN age INTEGER;",
+        "ALTER TABLE employees ADD COLUMN age INTEGER DEFAULT 0 NOT NULL;",
+        "ALTER TABLE employees ADD CONSTRAINT uq_name UNIQUE (name);",
+        "ALTER TABLE employees ALTER COLUMN age DROP NOT NULL;",
+        "UPDATE employees\nSET age = 30\nWHERE age IS NULL;",
+        "DELETE FROM employees WHERE age > 100;",
+        "BEGIN;",
+        "UPDATE alembic_version SET version_num='bbbb' WHERE alembic_version.version_num = 'aaaa';",
+        "-- UPDATE employees SET age = 30;",
+    ],
+)
+def test_safe_statements(sql):
+    assert lint_sql(sql) == []
+
+
+def test_index_on_other_dialects():
+    (hazard,) = lint_sql("CREATE INDEX ix_name ON employees (name);", "mysql")
+
+    assert hazard.severity == "warning"
+
+
+def test_tables_created_in_the_revision():
+    sql = """
+CREATE TABLE "Employees" (
+    id SERIAL NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_employees_name ON "Employees" (name);
+ALTER TABLE "Employees" ADD COLUMN age INTEGER NOT NULL;
+ALTER TABLE "Employees" ALTER COLUMN name SET NOT NULL;
+ALTER TABLE "Employees" ALTER COLUMN age TYPE BIGINT;
+CREATE INDEX ix_companies_name ON companies (name);
+CREATE TEMPORARY TABLE IF NOT EXISTS staging (id INTEGER);
+ALTER TABLE staging ADD INDEX ix_staging_id (id);
+"""
+
+    hazards = lint_sql(sql)
+
+    assert [(hazard.rule, hazard.statement) for hazard in hazards] == [
+        ("alter-column-type", 'ALTER TABLE "Employees" ALTER COLUMN age TYPE BIGINT'),
+        ("create-index", "CREATE INDEX ix_companies_name ON companies (name)"),
+    ]
+
+
+def test_not_rendered():
+    sql = "-- could not render offline: CommandError: batch mode needs a connection\n"
+
+    assert lint_sql(sql, revision="aaaa") == [
+        Hazard("aaaa", "not-rendered", "warning", "CommandError: batch mode needs a connection")
+    ]
+
+
+@pytest.fixture
+def migrations(sqlite_migrations):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "index names",
+        'op.create_index("ix_employees_name", "employees", ["name"])\n'
+        'op.create_index("ix_companies_name", "companies", ["name"], '
+        "postgresql_concurrently=True)\n"
+        'op.create_table("teams", sa.Column("id", sa.Integer(), nullable=False))\n'
+        'op.create_index("ix_teams_id", "teams", ["id"], unique=True)',
+        'op.drop_index("ix_employees_name", "employees")',
+    )
+    return sqlite_migrations
+
+
+def test_lint_migrations(migrations):
+    hazards = lint_migrations(migrations, "postgresql+psycopg2://")
+
+    assert [(hazard.revision, hazard.rule, hazard.severity) for hazard in hazards] == [
+        ("cccc00000003", "full-table-update", "warning"),
+        ("dddd00000004", "create-index", "error"),
+    ]
+    assert hazards[1].statement == "CREATE INDEX ix_employees_name ON employees (name)"
+
+
+def test_lint_golden_files(migrations, tmp_path):
+    write_golden_files(render_migrations(migrations, "sqlite"), tmp_path)
+
+    hazards = lint_golden_files(tmp_path, "sqlite")
+
+    assert [(hazard.revision, hazard.rule, hazard.severity) for hazard in hazards] == [
+        ("cccc00000003", "full-table-update", "warning"),
+        ("dddd00000004", "create-index", "warning"),
+        ("dddd00000004", "create-index", "warning"),
+    ]
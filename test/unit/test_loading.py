@@ -0,0 +1,223 @@
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.script import Script, ScriptDirectory
+from sqlalchemy import create_engine, inspect
+
+from alembicverify.loading import (
+    _LOADER,
+    ImportProfile,
+    LazyModule,
+    LazyRevisionLoader,
+    profile_imports,
+    read_headers,
+)
+from alembicverify.util import config_from_ini
+
+
+HEAVY_REVISION = '''
+"""add employees email"""
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic import op
+
+
+Path({marker!r}).write_text("imported")
+
+revision: str = "dddd00000004"
+down_revision: str = {down_revision}
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("employees", sa.Column("email", sa.String(50), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("employees") as batch:
+        batch.drop_column("email")
+'''
+
+
+@pytest.fixture
+def versions(sqlite_migrations):
+    return sqlite_migrations.parent / "migrations" / "versions"
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    return config_from_ini(sqlite_uri, sqlite_migrations)
+
+
+@pytest.fixture
+def marker(tmp_path):
+    return tmp_path / "imported"
+
+
+def write_heavy_revision(versions, marker, down_revision='"cccc00000003"'):
+    path = versions / "dddd00000004_add_employees_email.py"
+    path.write_text(HEAVY_REVISION.format(marker=str(marker), down_revision=down_revision))
+    return path
+
+
+class TestReadHeaders:
+    def test_headers(self, versions):
+        headers = read_headers(versions / "bbbb00000002_create_employees.py")
+
+        assert headers == {
+            "__doc__": "create employees",
+            "revision": "bbbb00000002",
+            "down_revision": "aaaa00000001",
+            "branch_labels": None,
+            "depends_on": None,
+        }
+
+    def test_annotated_headers(self, versions, marker):
+        headers = read_headers(write_heavy_revision(versions, marker))
+
+        assert headers is not None
+        assert headers["revision"] == "dddd00000004"
+        assert headers["down_revision"] == "cccc00000003"
+        assert not marker.exists()
+
+    def test_not_literal(self, versions, marker):
+        path = write_heavy_revision(versions, marker, down_revision='"cccc" + "00000003"')
+
+        assert read_headers(path) is None
+
+    def test_optional_headers(self, versions, marker):
+        path = write_heavy_revision(versions, marker)
+        path.write_text(path.read_text().replace("branch_labels = None\ndepends_on = None\n", ""))
+
+        headers = read_headers(path)
+
+        assert headers is not None
+        assert headers["branch_labels"] is None
+        assert headers["depends_on"] is None
+
+    def test_no_revision(self, tmp_path):
+        path = tmp_path / "helpers.py"
+        path.write_text("x: int\ny = 1\n\n\ndef helper():\n    pass\n")
+
+        assert read_headers(path) is None
+
+
+class TestLazyModule:
+    def test_imported_on_first_use(self, versions, marker):
+        path = write_heavy_revision(versions, marker)
+        module = LazyModule(path, read_headers(path) or {})
+
+        assert module.revision == "dddd00000004"
+        assert module.__doc__ == "add employees email"
+        assert module.__file__ == str(path)
+        assert not hasattr(module, "_alembic_source_encoding")
+        assert not module.is_loaded
+        assert not marker.exists()
+
+        assert module.upgrade.__name__ == "upgrade"
+        assert module.downgrade.__name__ == "downgrade"
+        assert module.is_loaded
+        assert marker.read_text() == "imported"
+
+    def test_missing_attribute(self, versions):
+        path = versions / "aaaa00000001_create_companies.py"
+        module = LazyModule(path, read_headers(path) or {})
+
+        with pytest.raises(AttributeError):
+            module.upgrade_engine1  # noqa: B018
+
+
+class TestLazyRevisionLoader:
+    def test_lazy_loading(self, config, versions, marker, sqlite_uri):
+        write_heavy_revision(versions, marker)
+        original = Script.__dict__[_LOADER]
+
+        with LazyRevisionLoader():
+            script = ScriptDirectory.from_config(config)
+            assert script.get_heads() == ["dddd00000004"]
+            assert script.get_revision("dddd00000004").doc == "add employees email"
+            command.upgrade(config, "cccc00000003")
+            assert not marker.exists()
+
+            command.upgrade(config, "head")
+            assert marker.exists()
+
+        assert Script.__dict__[_LOADER] is original
+        engine = create_engine(sqlite_uri)
+        try:
+            columns = [column["name"] for column in inspect(engine).get_columns("employees")]
+        finally:
+            engine.dispose()
+        assert "email" in columns
+
+    def test_optional_headers_left_out(self, config, versions, marker):
+        path = write_heavy_revision(versions, marker)
+        path.write_text(path.read_text().replace("branch_labels = None\ndepends_on = None\n", ""))
+
+        with LazyRevisionLoader():
+            script = ScriptDirectory.from_config(config)
+            assert script.get_heads() == ["dddd00000004"]
+            assert script.get_revision("dddd00000004").branch_labels == set()
+
+        assert not marker.exists()
+
+    def test_headers_not_literal(self, config, versions, marker):
+        write_heavy_revision(versions, marker, down_revision='"cccc" + "00000003"')
+
+        with LazyRevisionLoader():
+            script = ScriptDirectory.from_config(config)
+            assert script.get_heads() == ["dddd00000004"]
+
+        assert marker.exists()
+
+    def test_skipped_files(self, config, versions):
+        (versions / "__init__.py").write_text("")
+
+        with LazyRevisionLoader():
+            heads = ScriptDirectory.from_config(config).get_heads()
+
+        assert heads == ["cccc00000003"]
+
+    def test_stop_without_start(self):
+        original = Script.__dict__[_LOADER]
+
+        LazyRevisionLoader().stop()
+
+        assert Script.__dict__[_LOADER] is original
+
+
+class TestProfileImports:
+    def test_profile_imports(self, config, versions, marker):
+        write_heavy_revision(versions, marker)
+        original = Script.__dict__[_LOADER]
+        (versions / "__init__.py").write_text("")
+
+        profiles = profile_imports(config)
+
+        assert Script.__dict__[_LOADER] is original
+        assert not tracemalloc.is_tracing()
+        assert sorted(profile.revision for profile in profiles) == [
+            "aaaa00000001",
+            "bbbb00000002",
+            "cccc00000003",
+            "dddd00000004",
+        ]
+        assert profiles == sorted(profiles, key=lambda profile: profile.seconds, reverse=True)
+        heavy = next(profile for profile in profiles if profile.revision == "dddd00000004")
+        assert isinstance(heavy, ImportProfile)
+        assert Path(heavy.path).name == "dddd00000004_add_employees_email.py"
+        assert heavy.seconds > 0
+        assert heavy.memory > 0
+        assert marker.exists()
+
+    def test_already_tracing(self, config):
+        tracemalloc.start()
+        try:
+            profile_imports(config)
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
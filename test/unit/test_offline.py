@@ -0,0 +1,99 @@
+import pytest
+
+from alembicverify.offline import (
+    RenderedRevision,
+    diff_golden_files,
+    render_migrations,
+    write_golden_files,
+)
+from test.unit.conftest import write_revision
+
+
+def test_render_migrations(sqlite_migrations):
+    rendered = render_migrations(sqlite_migrations, "postgresql")
+
+    assert [revision.revision for revision in rendered] == [
+        "aaaa00000001",
+        "bbbb00000002",
+        "cccc00000003",
+    ]
+    first, _, last = rendered
+    assert "CREATE TABLE alembic_version" in first.upgrade
+    assert "id SERIAL NOT NULL" in first.upgrade
+    assert "DROP TABLE companies;" in first.downgrade
+    assert "-- Running upgrade bbbb00000002 -> cccc00000003" in last.upgrade
+    assert "ALTER TABLE employees ADD COLUMN age INTEGER;" in last.upgrade
+    assert "UPDATE employees SET age = 30;" in last.upgrade
+    assert "ALTER TABLE employees DROP COLUMN age;" in last.downgrade
+
+
+def test_render_error(sqlite_migrations):
+    (rendered,) = render_migrations(sqlite_migrations, "sqlite", ["cccc00000003"])
+
+    assert "ALTER TABLE employees ADD COLUMN age INTEGER;" in rendered.upgrade
+    assert rendered.downgrade.startswith(
+        "-- could not render offline: CommandError: This operation cannot proceed in --sql mode"
+    )
+
+
+def test_render_merges(sqlite_migrations):
+    versions = sqlite_migrations.parent / "migrations" / "versions"
+    write_revision(versions, "dddd", "bbbb00000002", "branch", "pass", "pass")
+    write_revision(versions, "eeee", ("cccc00000003", "dddd"), "merge", "pass", "pass")
+
+    (merge,) = render_migrations(sqlite_migrations, "sqlite:///app.db", ["eeee"])
+
+    assert "-- Running upgrade cccc00000003, dddd -> eeee" in merge.upgrade
+    assert "-- Running downgrade eeee -> cccc00000003, dddd" in merge.downgrade
+
+
+def test_render_in_parallel(sqlite_migrations):
+    rendered = render_migrations(sqlite_migrations, "postgresql", jobs=2)
+
+    assert rendered == render_migrations(sqlite_migrations, "postgresql")
+
+
+@pytest.fixture
+def rendered():
+    return [
+        RenderedRevision("aaaa", "CREATE TABLE a;\n", "DROP TABLE a;\n"),
+        RenderedRevision("bbbb", "CREATE TABLE b;\n", "DROP TABLE b;\n"),
+    ]
+
+
+def test_golden_files(rendered, tmp_path):
+    (tmp_path / "golden").mkdir()
+    (tmp_path / "golden" / "zzzz.upgrade.sql").write_text("stale")
+    write_golden_files(rendered, tmp_path / "golden")
+
+    assert sorted(path.name for path in (tmp_path / "golden").iterdir()) == [
+        "aaaa.downgrade.sql",
+        "aaaa.upgrade.sql",
+        "bbbb.downgrade.sql",
+        "bbbb.upgrade.sql",
+    ]
+    assert diff_golden_files(rendered, tmp_path / "golden") == {}
+
+
+def test_diff_golden_files(rendered, tmp_path):
+    write_golden_files(rendered, tmp_path)
+    (tmp_path / "README").write_text("not a golden file")
+    (tmp_path / "notes.sql").write_text("not a golden file either")
+    changed = [
+        RenderedRevision("bbbb", "CREATE TABLE b (id INTEGER);\n", "DROP TABLE b;\n"),
+        RenderedRevision("cccc", "CREATE TABLE c;\n", "DROP TABLE c;\n"),
+    ]
+
+    diffs = diff_golden_files(changed, tmp_path)
+
+    assert list(diffs) == ["aaaa", "bbbb", "cccc"]
+    assert "-CREATE TABLE a;\n" in diffs["aaaa"]
+    assert diffs["bbbb"].splitlines() == [
+        "--- a/bbbb.upgrade.sql",
+        "+++ b/bbbb.upgrade.sql",
+        "@@ -1 +1 @@",
+        "-CREATE TABLE b;",
+        "+CREATE TABLE b (id INTEGER);",
+    ]
+    assert "+++ b/cccc.downgrade.sql" in diffs["cccc"]
+    assert "+++ b/cccc.upgrade.sql" in diffs["cccc"]
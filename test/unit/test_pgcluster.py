@@ -0,0 +1,140 @@
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from alembicverify.pgcluster import EphemeralPostgres, _ram_dir, _run, find_postgres_bindir
+
+
+@pytest.fixture
+def run_mock():
+    with patch("alembicverify.pgcluster._run") as m:
+
+        def run(*args):
+            if Path(args[0]).name == "initdb":
+                (Path(args[2]) / "postgresql.conf").parent.mkdir(parents=True)
+                (Path(args[2]) / "postgresql.conf").write_text("# defaults\n")
+
+        m.side_effect = run
+        yield m
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    return EphemeralPostgres(bindir="/opt/pg/bin", base_dir=tmp_path, settings={"fsync": "on"})
+
+
+def test_start_and_stop(cluster, run_mock, tmp_path):
+    with cluster:
+        directory = cluster.directory
+        assert directory is not None
+        assert directory.parent == tmp_path
+        assert directory.exists()
+
+        conf = (directory / "data" / "postgresql.conf").read_text()
+        assert "fsync = on\n" in conf
+        assert "synchronous_commit = off\n" in conf
+        assert "listen_addresses = ''\n" in conf
+        assert f"unix_socket_directories = '{directory}'\n" in conf
+
+        host = str(directory).replace("/", "%2F")
+        assert cluster.uri == f"postgresql://postgres@/postgres?host={host}&port=5432"
+        assert cluster.database_uri("temp_1") == (
+            f"postgresql://postgres@/temp_1?host={host}&port=5432"
+        )
+
+    assert [c.args[0] for c in run_mock.call_args_list] == [
+        Path("/opt/pg/bin/initdb"),
+        Path("/opt/pg/bin/pg_ctl"),
+        Path("/opt/pg/bin/pg_ctl"),
+    ]
+    assert run_mock.call_args_list[1].args[-1] == "start"
+    assert run_mock.call_args_list[2].args[-3:] == ("immediate", "--wait", "stop")
+    assert not directory.exists()
+    assert cluster.directory is None
+
+
+def test_failed_start_cleans_up(cluster, run_mock, tmp_path):
+    run_mock.side_effect = RuntimeError("initdb failed")
+
+    with pytest.raises(RuntimeError, match="initdb failed"):
+        cluster.start()
+
+    assert cluster.directory is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_start_twice(cluster, run_mock):
+    with cluster:
+        with pytest.raises(RuntimeError, match="already running"):
+            cluster.start()
+
+
+def test_not_running(cluster):
+    with pytest.raises(RuntimeError, match="not running"):
+        cluster.uri  # noqa: B018
+
+    cluster.stop()
+
+
+def test_run():
+    _run("true")
+
+
+def test_run_reports_errors():
+    with pytest.raises(RuntimeError, match="false failed with exit code 1"):
+        _run("false")
+
+
+class TestFindPostgresBindir:
+    @pytest.fixture
+    def which_mock(self):
+        with patch("alembicverify.pgcluster.shutil.which") as m:
+            m.return_value = None
+            yield m
+
+    @pytest.fixture
+    def glob_mock(self):
+        with patch("alembicverify.pgcluster.glob.glob") as m:
+            m.return_value = []
+            yield m
+
+    def test_on_path(self, which_mock):
+        which_mock.side_effect = {"pg_ctl": "/usr/local/bin/pg_ctl"}.get
+
+        assert find_postgres_bindir() == Path("/usr/local/bin")
+
+    @pytest.mark.usefixtures("glob_mock")
+    def test_from_pg_config(self, which_mock, tmp_path):
+        which_mock.side_effect = {"pg_config": "/usr/bin/pg_config"}.get
+        (tmp_path / "pg_ctl").touch()
+
+        with patch("alembicverify.pgcluster.subprocess.check_output") as check_output_mock:
+            check_output_mock.return_value = f"{tmp_path}\n"
+            assert find_postgres_bindir() == tmp_path
+
+        check_output_mock.assert_called_once_with(["/usr/bin/pg_config", "--bindir"], text=True)
+
+    def test_pg_config_without_server(self, which_mock, glob_mock, tmp_path):
+        which_mock.side_effect = {"pg_config": "/usr/bin/pg_config"}.get
+        glob_mock.return_value = [
+            "/usr/lib/postgresql/9/bin/pg_ctl",
+            "/usr/lib/postgresql/16/bin/pg_ctl",
+        ]
+
+        with patch("alembicverify.pgcluster.subprocess.check_output", return_value=str(tmp_path)):
+            assert find_postgres_bindir() == Path("/usr/lib/postgresql/16/bin")
+
+    @pytest.mark.usefixtures("which_mock", "glob_mock")
+    def test_not_found(self):
+        with pytest.raises(FileNotFoundError, match="PostgreSQL server binaries"):
+            find_postgres_bindir()
+
+
+def test_ram_dir():
+    assert _ram_dir(EphemeralPostgres(base_dir="/some/dir")) == "/some/dir"
+    with patch("alembicverify.pgcluster.os.access", return_value=True):
+        with patch("alembicverify.pgcluster.os.path.isdir", return_value=True):
+            assert _ram_dir(EphemeralPostgres()) == "/dev/shm"
+        with patch("alembicverify.pgcluster.os.path.isdir", return_value=False):
+            assert _ram_dir(EphemeralPostgres()) is None
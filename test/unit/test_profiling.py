@@ -0,0 +1,120 @@
+import pstats
+import tracemalloc
+
+import pytest
+from alembic import command
+from alembic.runtime.migration import MigrationStep
+
+from alembicverify.profiling import MigrationProfiler, RevisionProfile
+from alembicverify.util import config_from_ini
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    return config_from_ini(sqlite_uri, sqlite_migrations)
+
+
+def test_profile_migrations(config, tmp_path):
+    original = MigrationStep.__dict__["upgrade_from_script"]
+
+    with MigrationProfiler(tmp_path / "profiles") as profiler:
+        command.upgrade(config, "head")
+        command.downgrade(config, "bbbb00000002")
+        command.upgrade(config, "head")
+
+    assert MigrationStep.__dict__["upgrade_from_script"] is original
+    assert not tracemalloc.is_tracing()
+    assert sorted(profiler.profiles) == [
+        ("aaaa00000001", "upgrade"),
+        ("bbbb00000002", "upgrade"),
+        ("cccc00000003", "downgrade"),
+        ("cccc00000003", "upgrade"),
+    ]
+    profile = profiler.profiles["cccc00000003", "upgrade"]
+    assert profile.calls == 2
+    assert profile.seconds > 0
+    assert profile.peak_memory > 0
+
+    assert sorted(path.name for path in (tmp_path / "profiles").iterdir()) == [
+        "aaaa00000001.upgrade.prof",
+        "bbbb00000002.upgrade.prof",
+        "cccc00000003.downgrade.prof",
+        "cccc00000003.upgrade.prof",
+        "summary.txt",
+    ]
+    stats = pstats.Stats(str(tmp_path / "profiles" / "cccc00000003.upgrade.prof"))
+    assert any(function[2] == "upgrade" for function in stats.stats)  # type: ignore[attr-defined]
+    summary = (tmp_path / "profiles" / "summary.txt").read_text()
+    assert "slowest revisions:" in summary
+    assert "cccc00000003.upgrade (2 calls)" in summary
+    assert "largest memory peaks:" in summary
+
+
+def test_failing_revision_is_profiled(config, sqlite_migrations, tmp_path):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "broken",
+        'op.execute("SELECT * FROM missing")',
+        "pass",
+    )
+
+    with MigrationProfiler(tmp_path, memory=False) as profiler:
+        with pytest.raises(Exception, match="no such table"):
+            command.upgrade(config, "head")
+
+    assert profiler.profiles["dddd00000004", "upgrade"].calls == 1
+    assert profiler.profiles["dddd00000004", "upgrade"].peak_memory == 0
+    assert "largest memory peaks" not in profiler.summary()
+
+
+def test_memory_is_traced_during_steps_only(config, sqlite_migrations, tmp_path):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "cccc00000003",
+        "traced",
+        'assert __import__("tracemalloc").is_tracing()',
+        "pass",
+    )
+
+    with MigrationProfiler(tmp_path) as profiler:
+        assert not tracemalloc.is_tracing()
+        command.upgrade(config, "head")
+        assert not tracemalloc.is_tracing()
+
+    assert profiler.profiles["dddd00000004", "upgrade"].calls == 1
+
+
+def test_tracemalloc_already_tracing(config, tmp_path):
+    tracemalloc.start()
+    try:
+        allocated = bytearray(2**20)
+        del allocated
+        peak = tracemalloc.get_traced_memory()[1]
+        with MigrationProfiler(tmp_path) as profiler:
+            command.upgrade(config, "aaaa00000001")
+
+        # the tracing of the process is left alone
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[1] >= peak >= 2**20
+        assert profiler.profiles["aaaa00000001", "upgrade"].peak_memory == 0
+    finally:
+        tracemalloc.stop()
+
+
+def test_summary_order(tmp_path):
+    profiler = MigrationProfiler(tmp_path)
+    profiler.profiles = {
+        ("aaaa", "upgrade"): RevisionProfile("aaaa", "upgrade", 1, 0.5, 3 * 2**20),
+        ("bbbb", "upgrade"): RevisionProfile("bbbb", "upgrade", 1, 2.0, 2**20),
+    }
+
+    assert profiler.summary(top=1) == (
+        "slowest revisions:\n"
+        "     2.000s  bbbb.upgrade (1 calls)\n"
+        "largest memory peaks:\n"
+        "       3.0 MiB  aaaa.upgrade\n"
+    )
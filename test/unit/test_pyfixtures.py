@@ -1,6 +1,12 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import call, patch
 
 import pytest
+from alembic import command
+
+from alembicverify.baseline import record_baseline
+from alembicverify.util import config_from_ini
 
 
 pytest_plugins = "pytester"
@@ -20,6 +26,10 @@ def conftest(pytester):
         def alembic_ini_location():
             return "alembic.ini"
 
+        @pytest.fixture
+        def alembic_environments():
+            return {"users": ("users_uri", "users.ini"), "orders": ("orders_uri", "orders.ini")}
+
         # Deprecated fixtures
 
         @pytest.fixture
@@ -35,13 +45,13 @@ def conftest(pytester):
 
 @pytest.fixture
 def make_alembic_config_mock():
-    with patch("alembicverify._factories.make_alembic_config") as m:
+    with patch("alembicverify.util.make_alembic_config") as m:
         yield m
 
 
 @pytest.fixture
 def Config_mock():
-    with patch("alembicverify._factories.Config") as m:
+    with patch("alembicverify.util.Config") as m:
         yield m
 
 
@@ -87,6 +97,735 @@ def test_alembic_new_db(drop_database_mock, create_database_mock, pytester):
     assert drop_database_mock.call_args_list == [call("db_uri")]
 
 
+def test_alembic_engine_registry(pytester):
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def engine(alembic_engine_registry):
+            return alembic_engine_registry.get_engine("sqlite://")
+
+        def test_first(alembic_engine_registry, engine):
+            assert alembic_engine_registry.get_engine("sqlite://") is engine
+
+        def test_second(alembic_engine_registry, engine):
+            assert alembic_engine_registry.get_engine("sqlite://") is engine
+        """
+    )
+    with patch("alembicverify.registry.EngineRegistry.dispose") as dispose_mock:
+        result = pytester.runpytest()
+    assert result.ret == 0
+
+    dispose_mock.assert_called_once_with()
+
+
+def test_alembic_new_db_releases_registry_engines(
+    drop_database_mock, create_database_mock, pytester
+):
+    pytester.makepyfile(
+        """
+        def test_with_registry(alembic_engine_registry, alembic_new_db):
+            pass
+
+        def test_without_registry(alembic_new_db):
+            pass
+        """
+    )
+    calls = []
+    drop_database_mock.side_effect = lambda uri: calls.append(("drop", uri))
+    with patch(
+        "alembicverify.registry.EngineRegistry.release",
+        side_effect=lambda uri: calls.append(("release", uri)),
+    ):
+        result = pytester.runpytest()
+    assert result.ret == 0
+
+    assert calls == [("release", "db_uri"), ("drop", "db_uri"), ("drop", "db_uri")]
+
+
+def test_alembic_postgres_cluster(pytester):
+    pytester.makepyfile(
+        """
+        from alembicverify import ephemeral_db_uri_factory
+
+        alembic_db_uri = ephemeral_db_uri_factory()
+
+        def test_first(alembic_postgres_cluster, alembic_db_uri):
+            assert alembic_db_uri.startswith("postgresql:///temp_")
+
+        def test_second(alembic_postgres_cluster, alembic_db_uri):
+            assert alembic_db_uri.startswith("postgresql:///temp_")
+        """
+    )
+    with patch("alembicverify.pyfixtures.EphemeralPostgres") as EphemeralPostgres_mock:
+        cluster = EphemeralPostgres_mock.return_value.__enter__.return_value
+        cluster.database_uri.side_effect = lambda name: f"postgresql:///{name}"
+        result = pytester.runpytest()
+    assert result.ret == 0
+
+    # the cluster is started once for the whole session
+    EphemeralPostgres_mock.assert_called_once_with()
+    assert EphemeralPostgres_mock.return_value.__exit__.call_count == 1
+    first, second = (c.args[0] for c in cluster.database_uri.call_args_list)
+    assert first != second
+
+
+class TestAlembicTemporaryUris:
+    @pytest.fixture
+    def test_file(self, pytester):
+        pytester.makepyfile(
+            """
+            from sqlalchemy.engine import make_url
+
+            from alembicverify import temporary_db_uri_factory
+
+            alembic_db_uri = temporary_db_uri_factory()
+            seen = []
+
+            def test_first(alembic_db_uri):
+                seen.append(make_url(alembic_db_uri).database)
+
+            def test_second(alembic_db_uri):
+                seen.append(make_url(alembic_db_uri).database)
+                first, second = seen
+                assert first != second
+                assert first.rsplit("_", 1)[0] == second.rsplit("_", 1)[0]
+                print("NAME", first)
+            """
+        )
+
+    @pytest.fixture
+    def server_uri(self, pytester):
+        (pytester.path / "temp_old.db").touch()
+        return f"sqlite:///{pytester.path / 'app.db'}"
+
+    def test_option(self, test_file, server_uri, pytester):
+        result = pytester.runpytest("-s", "--alembic-server-uri", server_uri)
+        assert result.ret == 0
+
+        result.stdout.re_match_lines([r".*NAME .*/temp_[0-9a-f]{8}_main_[0-9a-f]{12}\.db"])
+        assert (pytester.path / "temp_old.db").exists()
+
+    def test_ini(self, test_file, server_uri, pytester):
+        pytester.makeini(f"[pytest]\nalembic_server_uris =\n    {server_uri}\n")
+        result = pytester.runpytest("-s")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(["*NAME */temp_*_main_*.db"])
+
+    def test_no_servers(self, test_file, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 1
+
+        result.stdout.fnmatch_lines(["*No database server configured*"])
+
+    def test_sweep_orphans(self, test_file, server_uri, pytester):
+        result = pytester.runpytest("--alembic-server-uri", server_uri, "--alembic-sweep-orphans")
+        assert result.ret == 0
+
+        assert not (pytester.path / "temp_old.db").exists()
+
+    def test_xdist_worker(self, test_file, server_uri, pytester):
+        pytester.makeconftest(
+            """
+            import pytest
+
+            @pytest.hookimpl(tryfirst=True)
+            def pytest_configure(config):
+                config.workerinput = {"workerid": "gw1", "testrun_uid": "feedbeef" * 4}
+            """
+        )
+        result = pytester.runpytest(
+            "-s", "--alembic-server-uri", server_uri, "--alembic-sweep-orphans"
+        )
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(["*NAME */temp_feedbeef_gw1_*.db"])
+        # only the first worker sweeps
+        assert (pytester.path / "temp_old.db").exists()
+
+
+class TestAlembicEngines:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester):
+        pytester.makepyfile(
+            """
+            def test_engines(alembic_engines):
+                assert set(alembic_engines) == {"users", "orders"}
+            """
+        )
+
+    @pytest.fixture(autouse=True)
+    def migration_executor_mock(self):
+        with patch(
+            "alembicverify._factories._migration_executor", side_effect=ThreadPoolExecutor
+        ) as m:
+            yield m
+
+    @pytest.fixture
+    def command_mock(self):
+        with patch("alembicverify._factories.command") as m:
+            yield m
+
+    @pytest.fixture
+    def create_engine_mock(self):
+        with patch("alembicverify._factories.create_engine") as m:
+            yield m
+
+    def test_alembic_engines(
+        self,
+        Config_mock,
+        make_alembic_config_mock,
+        command_mock,
+        create_engine_mock,
+        drop_database_mock,
+        create_database_mock,
+        pytester,
+    ):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        uris = [call("orders_uri"), call("users_uri")]
+        assert sorted(create_database_mock.call_args_list) == uris
+        assert sorted(Config_mock.call_args_list) == [call("orders.ini"), call("users.ini")]
+        assert command_mock.upgrade.call_args_list == [
+            call(make_alembic_config_mock.return_value, "head"),
+            call(make_alembic_config_mock.return_value, "head"),
+        ]
+        assert sorted(create_engine_mock.call_args_list) == uris
+        assert create_engine_mock.return_value.dispose.call_count == 2
+        assert sorted(drop_database_mock.call_args_list) == uris
+
+    @pytest.mark.usefixtures("Config_mock", "make_alembic_config_mock", "create_engine_mock")
+    def test_alembic_engines_migration_failure(
+        self, command_mock, drop_database_mock, create_database_mock, pytester
+    ):
+        command_mock.upgrade.side_effect = [None, RuntimeError("Migration failed")]
+
+        result = pytester.runpytest()
+        assert result.ret == 1
+        result.stdout.fnmatch_lines(["*RuntimeError: Migration failed*"])
+
+        # both databases were created, and both were dropped
+        assert len(create_database_mock.call_args_list) == 2
+        assert sorted(drop_database_mock.call_args_list) == [call("orders_uri"), call("users_uri")]
+
+
+class TestAlembicNewDbFast:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester):
+        pytester.makepyfile(
+            """
+            def test_new_db(alembic_new_db):
+                pass
+            """
+        )
+
+    @pytest.fixture
+    def relaxed_durability_mock(self):
+        with patch("alembicverify._factories.relaxed_durability") as m:
+            m.return_value.__enter__.return_value = {"synchronous_commit": "off"}
+            yield m
+
+    @pytest.mark.usefixtures("drop_database_mock", "create_database_mock")
+    def test_fast_db_is_disabled_by_default(self, relaxed_durability_mock, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert relaxed_durability_mock.call_count == 0
+        assert "fast temporary databases" not in result.stdout.str()
+
+    @pytest.mark.usefixtures("drop_database_mock", "create_database_mock")
+    def test_fast_db(self, relaxed_durability_mock, pytester):
+        result = pytester.runpytest("--alembic-fast-db", "--junitxml=report.xml")
+        assert result.ret == 0
+
+        assert relaxed_durability_mock.call_args_list == [call("db_uri", False)]
+        result.stdout.fnmatch_lines(["alembic-verify: fast temporary databases"])
+        report = (pytester.path / "report.xml").read_text()
+        assert '<property name="alembic_fast_db" value="synchronous_commit=off" />' in report
+
+    @pytest.mark.usefixtures("drop_database_mock", "create_database_mock")
+    def test_fast_db_with_unlogged_tables(self, relaxed_durability_mock, pytester):
+        result = pytester.runpytest("--alembic-fast-db", "--alembic-unlogged-tables")
+        assert result.ret == 0
+
+        assert relaxed_durability_mock.call_args_list == [call("db_uri", True)]
+        result.stdout.fnmatch_lines(
+            ["alembic-verify: fast temporary databases with unlogged tables"]
+        )
+
+    @pytest.mark.usefixtures("drop_database_mock", "create_database_mock")
+    def test_fast_db_from_factory(self, relaxed_durability_mock, pytester):
+        pytester.makepyfile(
+            """
+            from alembicverify import new_db_factory
+
+            alembic_new_db = new_db_factory(fast=True, name="alembic_new_db")
+
+            def test_new_db(alembic_new_db):
+                pass
+            """
+        )
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert relaxed_durability_mock.call_args_list == [call("db_uri", False)]
+
+
+class TestAlembicReuseDb:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        pytester.makeconftest(
+            f"""
+            import pytest
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return "sqlite:///{pytester.path / "app.db"}"
+
+            @pytest.fixture
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+        pytester.makepyfile(
+            """
+            import pytest
+            from sqlalchemy import create_engine, inspect
+
+            @pytest.mark.alembic_db_revision("bbbb00000002")
+            def test_reused(alembic_new_db, alembic_config):
+                assert alembic_config.get_main_option("sqlalchemy.url") == alembic_new_db
+                engine = create_engine(alembic_new_db)
+                assert "employees" in inspect(engine).get_table_names()
+                engine.dispose()
+
+            def test_not_marked(alembic_new_db, alembic_config):
+                assert alembic_new_db.endswith("app.db")
+            """
+        )
+
+    def properties(self, pytester):
+        report = (pytester.path / "report.xml").read_text()
+        return re.findall(r'name="alembic_reuse_db" value="(\w+)"', report)
+
+    def test_reuse_db(self, pytester):
+        result = pytester.runpytest("--alembic-reuse-db", "--junitxml=report.xml")
+        assert result.ret == 0
+        result.stdout.fnmatch_lines(["alembic-verify: reusing migrated databases"])
+        assert self.properties(pytester) == ["created"]
+        (database,) = pytester.path.glob("reuse_*_bbbb00000002.db")
+
+        result = pytester.runpytest("--alembic-reuse-db", "--junitxml=report.xml")
+        assert result.ret == 0
+        assert self.properties(pytester) == ["reused"]
+        assert database.exists()
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest("-k", "not_marked")
+        assert result.ret == 0
+        assert "reusing migrated databases" not in result.stdout.str()
+        assert not list(pytester.path.glob("reuse_*"))
+
+    def test_fast_db_is_not_applied_to_kept_databases(self, pytester):
+        with patch("alembicverify._factories.relaxed_durability") as relaxed_durability_mock:
+            relaxed_durability_mock.return_value.__enter__.return_value = {"synchronous": "OFF"}
+            result = pytester.runpytest(
+                "--alembic-reuse-db", "--alembic-fast-db", "--junitxml=report.xml"
+            )
+        assert result.ret == 0
+
+        # only the database of the unmarked test is thrown away
+        assert relaxed_durability_mock.call_args_list == [
+            call(f"sqlite:///{pytester.path / 'app.db'}", False)
+        ]
+        report = (pytester.path / "report.xml").read_text()
+        assert report.count('name="alembic_fast_db"') == 1
+
+
+class TestAlembicCloneDb:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        pytester.makeconftest(
+            f"""
+            import pytest
+            from uuid import uuid4
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return f"sqlite:///{pytester.path}/temp_{{uuid4().hex}}.db"
+
+            @pytest.fixture
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+        pytester.makepyfile(
+            """
+            import pytest
+            from sqlalchemy import create_engine, inspect
+
+            @pytest.mark.alembic_db_revision("bbbb00000002")
+            @pytest.mark.parametrize("n", [1, 2])
+            def test_cloned(alembic_new_db, n):
+                engine = create_engine(alembic_new_db)
+                assert "employees" in inspect(engine).get_table_names()
+                engine.dispose()
+
+            def test_not_marked(alembic_new_db):
+                engine = create_engine(alembic_new_db)
+                assert inspect(engine).get_table_names() == []
+                engine.dispose()
+            """
+        )
+
+    def test_clone_db(self, pytester):
+        with patch.object(command, "upgrade", wraps=command.upgrade) as upgrade_mock:
+            result = pytester.runpytest("--alembic-clone-db", "--junitxml=report.xml")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(["alembic-verify: cloning migrated databases"])
+        assert upgrade_mock.call_count == 1
+        report = (pytester.path / "report.xml").read_text()
+        assert re.findall(r'name="alembic_clone_db" value="(\w+)"', report) == ["file", "file"]
+        assert [path.name for path in pytester.path.glob("*.db")] == [
+            next(pytester.path.glob("tmpl_*_bbbb00000002.db")).name
+        ]
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest("-k", "not_marked")
+        assert result.ret == 0
+
+        assert "cloning" not in result.stdout.str()
+        assert not list(pytester.path.glob("tmpl_*"))
+
+
+class TestAlembicBaseline:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        uri = f"sqlite:///{pytester.path / 'baseline.db'}"
+        baseline = record_baseline(
+            uri, config_from_ini(uri, sqlite_migrations), "bbbb00000002", pytester.path / "base"
+        )
+        with baseline.path.open("a") as dump:
+            dump.write("CREATE TABLE from_baseline (id INTEGER);\n")
+        pytester.makeconftest(
+            f"""
+            import pytest
+            from uuid import uuid4
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return f"sqlite:///{pytester.path}/temp_{{uuid4().hex}}.db"
+
+            @pytest.fixture
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+        pytester.makepyfile(
+            test_with_baseline="""
+            import pytest
+            from sqlalchemy import create_engine, inspect
+
+            from alembicverify import prepare_schema_from_migrations
+
+            def tables(uri):
+                engine = create_engine(uri)
+                try:
+                    return inspect(engine).get_table_names()
+                finally:
+                    engine.dispose()
+
+            @pytest.mark.alembic_db_revision("cccc00000003")
+            def test_marked(alembic_new_db, alembic_config, request):
+                baseline = request.config.getoption("alembic_baseline")
+                assert ("from_baseline" in tables(alembic_new_db)) is bool(baseline)
+                assert ("employees" in tables(alembic_new_db)) is bool(baseline)
+
+            def test_prepare_schema(alembic_new_db, alembic_config, request):
+                baseline = request.config.getoption("alembic_baseline")
+                with prepare_schema_from_migrations(alembic_new_db, alembic_config):
+                    pass
+                assert ("from_baseline" in tables(alembic_new_db)) is bool(baseline)
+                assert "employees" in tables(alembic_new_db)
+            """
+        )
+
+    def test_baseline(self, pytester):
+        result = pytester.runpytest("--alembic-baseline", "base")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(
+            ["alembic-verify: starting migrations from the baseline in base"]
+        )
+        assert not list(pytester.path.glob("temp_*.db"))
+
+    def test_failure(self, pytester):
+        pytester.makepyfile(
+            test_failure="""
+            import pytest
+
+            @pytest.mark.alembic_db_revision("ffff00000006")
+            def test_unknown_revision(alembic_new_db):
+                pass
+            """
+        )
+        result = pytester.runpytest("--alembic-baseline", "base", "test_failure.py")
+
+        result.assert_outcomes(errors=1)
+        assert not list(pytester.path.glob("temp_*.db"))
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert "starting migrations" not in result.stdout.str()
+
+
+class TestAlembicConnection:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        pytester.makeconftest(
+            f"""
+            import pytest
+
+            @pytest.fixture(scope="module")
+            def alembic_migrated_db_uri():
+                return "sqlite:///{pytester.path / "migrated.db"}"
+
+            @pytest.fixture(scope="session")
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+
+    def test_rolled_back_after_each_test(self, pytester):
+        pytester.makepyfile(
+            """
+            import pytest
+            from sqlalchemy import text
+            from alembicverify import session_for_engine
+
+            @pytest.mark.parametrize("name", ["acme", "initech"])
+            def test_commit(alembic_connection, name):
+                with session_for_engine(alembic_connection) as session:
+                    session.execute(text("INSERT INTO companies (name) VALUES (:n)"), {"n": name})
+                    session.commit()
+                    session.execute(text("INSERT INTO companies (name) VALUES ('umbrella')"))
+                    session.rollback()
+                query = text("SELECT name FROM companies")
+                assert alembic_connection.execute(query).scalars().all() == [name]
+
+            def test_rolled_back_by_the_test(alembic_connection):
+                alembic_connection.rollback()
+
+            def test_migrated_once(alembic_migrated_db, alembic_connection):
+                assert alembic_connection.engine is alembic_migrated_db
+                query = text("SELECT version_num FROM alembic_version")
+                assert alembic_connection.execute(query).scalar() == "cccc00000003"
+            """
+        )
+        with patch.object(command, "upgrade", wraps=command.upgrade) as upgrade_mock:
+            result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert upgrade_mock.call_count == 1
+        assert not (pytester.path / "migrated.db").exists()
+
+    def test_revision_and_scope_from_factory(self, pytester):
+        pytester.makepyfile(
+            """
+            from sqlalchemy import inspect
+            from alembicverify import migrated_db_factory
+
+            employees_db = migrated_db_factory(
+                revision="aaaa00000001", scope="function", name="employees_db"
+            )
+
+            def test_revision(employees_db):
+                assert inspect(employees_db).get_table_names() == ["alembic_version", "companies"]
+            """
+        )
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+
+class TestAlembicDetectLeaks:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester):
+        pytester.makeconftest(
+            f"""
+            import pytest
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return "sqlite:///{pytester.path / "app.db"}"
+            """
+        )
+        pytester.makepyfile(
+            """
+            import pytest
+            from sqlalchemy import create_engine
+
+            def test_leak(alembic_new_db):
+                engine = create_engine(alembic_new_db)
+                pytest.connection = engine.connect()
+
+            def test_no_leak(alembic_new_db):
+                engine = create_engine(alembic_new_db)
+                with engine.connect():
+                    pass
+                engine.dispose()
+            """
+        )
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert "leak" not in result.stdout.str().replace("test_leak", "")
+
+    def test_warn(self, pytester):
+        result = pytester.runpytest("--alembic-detect-leaks=warn")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(
+            [
+                "alembic-verify: detecting connection leaks (warn)",
+                "*UserWarning: 1 connection leaks on sqlite:///*app.db:",
+                "*a connection to *app.db was checked out and never returned, at:",
+                "*test_leak",
+                "*pytest.connection = engine.connect()",
+            ]
+        )
+        assert not (pytester.path / "app.db").exists()
+
+    def test_fail(self, pytester):
+        result = pytester.runpytest("--alembic-detect-leaks=fail")
+        assert result.ret == 1
+
+        result.assert_outcomes(passed=2, errors=1)
+        result.stdout.fnmatch_lines(
+            ["*ERROR at teardown of test_leak*", "1 connection leaks on sqlite:///*"]
+        )
+
+
+class TestAlembicProfile:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        pytester.makeconftest(
+            f"""
+            import pytest
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return "sqlite:///{pytester.path / "app.db"}"
+
+            @pytest.fixture
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+        pytester.makepyfile(
+            """
+            from alembicverify import prepare_schema_from_migrations
+
+            def test_upgrade(alembic_new_db, alembic_config):
+                with prepare_schema_from_migrations(alembic_new_db, alembic_config):
+                    pass
+            """
+        )
+
+    def test_profile(self, pytester):
+        result = pytester.runpytest("--alembic-profile", "profiles")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(
+            [
+                "alembic-verify: profiling migrations to profiles",
+                "*alembic-verify migration profile*",
+                "slowest revisions:",
+                "*cccc00000003.upgrade (1 calls)",
+                "*writing the profiles to profiles",
+            ]
+        )
+        assert (pytester.path / "profiles" / "cccc00000003.upgrade.prof").exists()
+        assert (pytester.path / "profiles" / "summary.txt").exists()
+
+    def test_xdist_worker(self, pytester):
+        pytester.makeconftest(
+            """
+            import pytest
+
+            @pytest.hookimpl(tryfirst=True)
+            def pytest_configure(config):
+                config.workerinput = {"workerid": "gw1"}
+            """
+        )
+        pytester.makepyfile("def test_nothing(): pass")
+        result = pytester.runpytest("--alembic-profile", "profiles")
+        assert result.ret == 0
+
+        assert "migration profile" not in result.stdout.str()
+        assert (pytester.path / "profiles" / "gw1" / "summary.txt").exists()
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert "profil" not in result.stdout.str()
+        assert not (pytester.path / "profiles").exists()
+
+
+class TestAlembicLazyRevisions:
+    @pytest.fixture(autouse=True)
+    def create_test_file(self, pytester, sqlite_migrations):
+        pytester.makeconftest(
+            f"""
+            import pytest
+
+            @pytest.fixture
+            def alembic_db_uri():
+                return "sqlite:///{pytester.path / "app.db"}"
+
+            @pytest.fixture
+            def alembic_ini_location():
+                return {str(sqlite_migrations)!r}
+            """
+        )
+        pytester.makepyfile(
+            """
+            from alembic.script import ScriptDirectory
+
+            from alembicverify import prepare_schema_from_migrations
+            from alembicverify.loading import LazyModule
+
+            def test_upgrade(alembic_new_db, alembic_config, request):
+                lazy = request.config.getoption("alembic_lazy_revisions")
+                script = ScriptDirectory.from_config(alembic_config)
+                module = script.get_revision("cccc00000003").module
+                assert isinstance(module, LazyModule) is lazy
+                with prepare_schema_from_migrations(alembic_new_db, alembic_config, "bbbb00000002"):
+                    pass
+            """
+        )
+
+    def test_lazy_revisions(self, pytester):
+        result = pytester.runpytest("--alembic-lazy-revisions")
+        assert result.ret == 0
+
+        result.stdout.fnmatch_lines(["alembic-verify: loading revision files lazily"])
+
+    def test_disabled_by_default(self, pytester):
+        result = pytester.runpytest()
+        assert result.ret == 0
+
+        assert "lazily" not in result.stdout.str()
+
+
 # TESTS FOR DEPRECATED FIXTURES
 
 
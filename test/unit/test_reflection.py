@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
+
+from alembicverify.reflection import (
+    ColumnDescriptor,
+    TableDescriptor,
+    compare_table_descriptors,
+    iter_table_descriptors,
+)
+
+
+@pytest.fixture
+def engine(sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE companies (id INTEGER PRIMARY KEY, name VARCHAR(50))")
+        conn.exec_driver_sql(
+            "CREATE TABLE employees (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL, "
+            "age INTEGER DEFAULT 30, company_id INTEGER REFERENCES companies (id), "
+            "UNIQUE (name, company_id))"
+        )
+        conn.exec_driver_sql("CREATE INDEX ix_employees_age ON employees (age)")
+        conn.exec_driver_sql("CREATE TABLE alembic_version (version_num VARCHAR(32))")
+    yield engine
+    engine.dispose()
+
+
+EMPLOYEES = TableDescriptor(
+    name="employees",
+    columns=(
+        ColumnDescriptor("id", "INTEGER", True),
+        ColumnDescriptor("name", "VARCHAR(50)", False),
+        ColumnDescriptor("age", "INTEGER", True, "30"),
+        ColumnDescriptor("company_id", "INTEGER", True),
+    ),
+    primary_key=("id",),
+    foreign_keys=("(company_id) -> companies(id)",),
+    indexes=("(age)",),
+    unique_constraints=("(name, company_id)",),
+)
+
+
+@pytest.mark.parametrize("batch_size", [1, 200])
+def test_iter_table_descriptors(engine, batch_size):
+    companies, employees = iter_table_descriptors(engine, batch_size=batch_size)
+
+    assert companies.name == "companies"
+    assert employees == EMPLOYEES
+
+
+def test_iter_table_descriptors_one_inspector_per_batch(engine):
+    with patch("alembicverify.reflection.inspect", wraps=inspect) as inspect_mock:
+        list(iter_table_descriptors(engine, batch_size=1))
+
+    # one to list the tables, then one for each batch
+    assert inspect_mock.call_count == 3
+
+
+def test_iter_table_descriptors_without_multi_reflection(engine):
+    class LegacyInspector:
+        def __init__(self, inspector):
+            self._inspector = inspector
+
+        def __getattr__(self, name):
+            if name.startswith("get_multi_"):
+                raise AttributeError(name)
+            return getattr(self._inspector, name)
+
+    with patch(
+        "alembicverify.reflection.inspect", side_effect=lambda conn: LegacyInspector(inspect(conn))
+    ):
+        descriptors = list(iter_table_descriptors(engine, batch_size=1))
+
+    assert descriptors == list(iter_table_descriptors(engine))
+
+
+def test_iter_table_descriptors_exclude(engine):
+    descriptors = iter_table_descriptors(engine, exclude=["companies"])
+
+    assert [d.name for d in descriptors] == ["alembic_version", "employees"]
+
+
+def test_fingerprint():
+    assert EMPLOYEES.fingerprint == TableDescriptor(**vars(EMPLOYEES)).fingerprint
+    assert EMPLOYEES.fingerprint != TableDescriptor("employees", EMPLOYEES.columns).fingerprint
+
+
+def test_compare_identical(engine):
+    assert (
+        compare_table_descriptors(iter_table_descriptors(engine), iter_table_descriptors(engine))
+        == {}
+    )
+
+
+def test_compare():
+    changed = TableDescriptor(
+        name="employees",
+        columns=(
+            ColumnDescriptor("id", "INTEGER", True),
+            ColumnDescriptor("name", "VARCHAR(100)", True),
+            ColumnDescriptor("age", "INTEGER", True),
+            ColumnDescriptor("email", "VARCHAR(50)", True),
+        ),
+        primary_key=("id",),
+        foreign_keys=("(company_id) -> companies(id)",),
+        indexes=("(age)",),
+    )
+    reordered = TableDescriptor("projects", tuple(reversed(EMPLOYEES.columns)))
+    actual = [TableDescriptor("addresses", ()), changed, reordered]
+    expected = [
+        TableDescriptor("companies", ()),
+        EMPLOYEES,
+        TableDescriptor("projects", EMPLOYEES.columns),
+        TableDescriptor("teams", ()),
+    ]
+
+    assert compare_table_descriptors(actual, expected) == {
+        "addresses": ["unexpected table"],
+        "companies": ["table is missing"],
+        "employees": [
+            "column 'age' default is None, expected '30'",
+            "column 'company_id' is missing",
+            "column 'name' nullable is True, expected False",
+            "column 'name' type is 'VARCHAR(100)', expected 'VARCHAR(50)'",
+            "unexpected column 'email'",
+            "unique constraints is [], expected ['(name, company_id)']",
+        ],
+        "teams": ["table is missing"],
+    }
+
+
+def test_compare_migrated_databases(sqlite_migrations, tmp_path):
+    engines = {}
+    for revision in ("bbbb00000002", "cccc00000003"):
+        uri = f"sqlite:///{tmp_path / f'{revision}.sqlite'}"
+        config = Config(sqlite_migrations)
+        config.set_main_option("sqlalchemy.url", uri)
+        command.upgrade(config, revision)
+        engines[revision] = create_engine(uri)
+
+    differences = compare_table_descriptors(
+        iter_table_descriptors(engines["bbbb00000002"], batch_size=1),
+        iter_table_descriptors(engines["cccc00000003"], batch_size=1),
+    )
+
+    assert differences == {"employees": ["column 'age' is missing"]}
+    for engine in engines.values():
+        engine.dispose()
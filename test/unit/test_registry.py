@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from alembicverify.registry import EngineRegistry
+
+
+@pytest.fixture
+def registry():
+    with EngineRegistry() as registry:
+        yield registry
+
+
+def test_get_engine_reuses_engines(registry, sqlite_uri):
+    engine = registry.get_engine(sqlite_uri)
+
+    assert registry.get_engine(sqlite_uri) is engine
+    assert registry.get_engine(sqlite_uri, echo=True) is not engine
+    assert registry.get_engine(sqlite_uri, echo=True) is registry.get_engine(sqlite_uri, echo=True)
+    assert len(registry) == 2
+
+
+def test_get_engine_with_unhashable_options(registry, sqlite_uri):
+    engine = registry.get_engine(sqlite_uri, connect_args={"timeout": 1})
+
+    assert registry.get_engine(sqlite_uri, connect_args={"timeout": 1}) is engine
+
+
+def test_sessionmaker_is_cached_per_engine(registry, sqlite_uri):
+    engine = registry.get_engine(sqlite_uri)
+    factory = registry.sessionmaker(engine)
+
+    assert registry.sessionmaker(engine) is factory
+    assert registry.sessionmaker(registry.get_engine(sqlite_uri, echo=True)) is not factory
+
+    with factory() as session:
+        assert session.get_bind() is engine
+        assert session.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_sessionmakers_of_other_engines_are_not_cached(registry, sqlite_uri):
+    engine = create_engine(sqlite_uri)
+    factory = registry.sessionmaker(engine)
+
+    assert registry.sessionmaker(engine) is not factory
+    assert len(registry._sessionmakers) == 0
+    with factory() as session:
+        assert session.get_bind() is engine
+    engine.dispose()
+
+
+def test_release(registry, sqlite_uri, tmp_path):
+    other_uri = f"sqlite:///{tmp_path / 'other.sqlite'}"
+    engine = registry.get_engine(sqlite_uri)
+    registry.sessionmaker(engine)
+    other = registry.get_engine(other_uri)
+
+    with patch.object(engine, "dispose") as dispose_mock:
+        registry.release(sqlite_uri)
+
+    dispose_mock.assert_called_once_with()
+    assert len(registry) == 1
+    assert engine not in registry._sessionmakers
+    assert registry.get_engine(other_uri) is other
+    assert registry.get_engine(sqlite_uri) is not engine
+
+
+def test_dispose(sqlite_uri):
+    registry = EngineRegistry()
+    engine = registry.get_engine(sqlite_uri)
+
+    with patch.object(engine, "dispose") as dispose_mock:
+        with registry:
+            pass
+
+    dispose_mock.assert_called_once_with()
+    assert len(registry) == 0
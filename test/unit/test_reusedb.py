@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from alembicverify.reusedb import ensure_migrated, reusable_uri
+from alembicverify.util import config_from_ini
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    return config_from_ini(sqlite_uri, sqlite_migrations)
+
+
+class TestReusableUri:
+    def test_name(self, config, sqlite_uri, tmp_path):
+        uri = reusable_uri(sqlite_uri, config, "head")
+
+        assert uri.startswith(f"sqlite:///{tmp_path / 'reuse_'}")
+        assert uri.endswith("_cccc00000003.db")
+        assert reusable_uri(sqlite_uri, config, "cccc00000003") == uri
+
+    def test_worker(self, config, sqlite_uri):
+        assert reusable_uri(sqlite_uri, config, "head", "gw1").endswith("_cccc00000003_gw1.db")
+
+    def test_changes_with_the_migrations(self, config, sqlite_migrations, sqlite_uri):
+        before = reusable_uri(sqlite_uri, config, "bbbb00000002")
+        (revision,) = (sqlite_migrations.parent / "migrations" / "versions").glob("aaaa*")
+        revision.write_text(revision.read_text() + "\n# edited\n")
+
+        assert reusable_uri(sqlite_uri, config, "bbbb00000002") != before
+
+    def test_unknown_revision(self, config, sqlite_uri):
+        with pytest.raises(ValueError, match="Unknown revision 'base'"):
+            reusable_uri(sqlite_uri, config, "base")
+
+
+class TestEnsureMigrated:
+    @pytest.fixture
+    def uri(self, config, sqlite_uri):
+        return reusable_uri(sqlite_uri, config, "head")
+
+    @pytest.fixture
+    def reused_config(self, sqlite_migrations, uri):
+        return config_from_ini(uri, sqlite_migrations)
+
+    def test_created_then_reused(self, reused_config, uri):
+        assert ensure_migrated(uri, reused_config, "head") is False
+        engine = create_engine(uri)
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO companies (name) VALUES ('acme')"))
+        engine.dispose()
+
+        with patch("alembicverify.reusedb.command") as command_mock:
+            assert ensure_migrated(uri, reused_config, "head") is True
+
+        assert command_mock.upgrade.call_count == 0
+
+    def test_recreated_at_another_revision(self, reused_config, uri):
+        ensure_migrated(uri, reused_config, "head")
+        command.downgrade(reused_config, "bbbb00000002")
+
+        assert ensure_migrated(uri, reused_config, "head") is False
+        engine = create_engine(uri)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT version_num FROM alembic_version")).all() == [
+                ("cccc00000003",)
+            ]
+        engine.dispose()
+
+    def test_failed_migration(self, reused_config, sqlite_migrations, uri, tmp_path):
+        write_revision(
+            sqlite_migrations.parent / "migrations" / "versions",
+            "dddd00000004",
+            "cccc00000003",
+            "broken",
+            'op.execute("SELECT * FROM missing")',
+            "pass",
+        )
+
+        with pytest.raises(Exception, match="no such table: missing"):
+            ensure_migrated(uri, reused_config, "dddd00000004")
+
+        assert not list(tmp_path.glob("reuse_*"))
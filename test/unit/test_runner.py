@@ -0,0 +1,237 @@
+import json
+import xml.etree.ElementTree as ET
+from unittest.mock import patch
+
+import pytest
+
+from alembicverify.runner import (
+    CheckResult,
+    plan_checks,
+    run_check,
+    verify_migrations,
+    write_json,
+    write_junit_xml,
+)
+from test.unit.conftest import write_revision
+
+
+MODELS = """
+import sqlalchemy as sa
+
+target_metadata = sa.MetaData()
+sa.Table(
+    "companies",
+    target_metadata,
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("name", sa.String(50), nullable=False),
+)
+sa.Table(
+    "employees",
+    target_metadata,
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("name", sa.String(50), nullable=False),
+    sa.Column("company_id", sa.Integer(), nullable=True),
+    sa.Column("age", sa.Integer(), nullable=True),
+)
+"""
+
+
+@pytest.fixture
+def migrations(sqlite_migrations):
+    """The SQLite migrations, with models matching their head in env.py."""
+    env_py = sqlite_migrations.parent / "migrations" / "env.py"
+    env_py.write_text(
+        env_py.read_text()
+        .replace("config = context.config", f"config = context.config\n{MODELS}")
+        .replace(
+            "context.configure(connection=connection)",
+            "context.configure(connection=connection, target_metadata=target_metadata)",
+        )
+    )
+    return sqlite_migrations
+
+
+@pytest.fixture
+def server_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'server.db'}"
+
+
+def test_verify_migrations(migrations, server_uri, tmp_path):
+    results = verify_migrations(migrations, server_uri)
+
+    assert [(result.name, result.outcome) for result in results] == [
+        ("stairway[cccc00000003]", "passed"),
+        ("roundtrip[cccc00000003]", "passed"),
+        ("models[heads]", "passed"),
+    ]
+    assert not list(tmp_path.glob("temp_*"))
+
+
+def test_verify_migrations_in_parallel(migrations, server_uri):
+    results = verify_migrations(migrations, server_uri, checks=["roundtrip", "models"], jobs=2)
+
+    assert [(result.name, result.outcome) for result in results] == [
+        ("roundtrip[cccc00000003]", "passed"),
+        ("models[heads]", "passed"),
+    ]
+
+
+def test_verify_migrations_unknown_check(migrations, server_uri):
+    with pytest.raises(ValueError, match="Unknown checks: fast, slow"):
+        verify_migrations(migrations, server_uri, checks=["roundtrip", "slow", "fast"])
+
+
+def test_stairway_catches_incomplete_downgrades(migrations, server_uri):
+    versions = migrations.parent / "migrations" / "versions"
+    write_revision(
+        versions,
+        "dddd00000004",
+        "cccc00000003",
+        "create projects",
+        'op.create_table("projects", sa.Column("id", sa.Integer(), primary_key=True))',
+        "pass",
+    )
+
+    (stairway,) = verify_migrations(migrations, server_uri, checks=["stairway"])
+
+    assert stairway.outcome == "failed"
+    assert "table projects already exists" in stairway.message
+    assert "Traceback" in stairway.details
+
+
+def test_stairway_steps_down_merges(migrations, server_uri):
+    versions = migrations.parent / "migrations" / "versions"
+    for revision, table in (("dddd", "projects"), ("eeee", "teams")):
+        write_revision(
+            versions,
+            revision,
+            "cccc00000003",
+            f"create {table}",
+            f'op.create_table("{table}", sa.Column("id", sa.Integer(), primary_key=True))',
+            f'op.drop_table("{table}")',
+        )
+    write_revision(versions, "ffff", ("dddd", "eeee"), "merge", "pass", "pass")
+
+    (stairway,) = verify_migrations(migrations, server_uri, checks=["stairway"])
+
+    assert (stairway.name, stairway.outcome) == ("stairway[ffff]", "passed")
+
+
+class TestRevisionSubset:
+    @pytest.fixture
+    def versions(self, migrations):
+        versions = migrations.parent / "migrations" / "versions"
+        # a downgrade that does not undo its upgrade, caught only when the revision is stepped
+        write_revision(
+            versions,
+            "dddd00000004",
+            "cccc00000003",
+            "create projects",
+            'op.create_table("projects", sa.Column("id", sa.Integer(), primary_key=True))',
+            "pass",
+        )
+        return versions
+
+    @pytest.mark.usefixtures("versions")
+    def test_only_given_revisions_are_stepped(self, migrations, server_uri):
+        (stairway,) = verify_migrations(
+            migrations, server_uri, checks=["stairway"], revisions=["cccc00000003"]
+        )
+        assert (stairway.name, stairway.outcome) == ("stairway[dddd00000004]", "passed")
+
+        (stairway,) = verify_migrations(
+            migrations, server_uri, checks=["stairway"], revisions=["dddd00000004"]
+        )
+        assert stairway.outcome == "failed"
+        assert "table projects already exists" in stairway.message
+
+    def test_heads_of_the_revisions(self, migrations, versions):
+        write_revision(versions, "eeee", "bbbb00000002", "branch", "pass", "pass")
+
+        assert plan_checks(migrations, revisions={"eeee", "ffff"}) == [
+            ("stairway", "eeee"),
+            ("roundtrip", "eeee"),
+            ("models", "heads"),
+        ]
+        assert plan_checks(migrations, ["stairway"], {"bbbb00000002"}) == [
+            ("stairway", "eeee"),
+            ("stairway", "dddd00000004"),
+        ]
+
+    def test_no_revisions(self, migrations, server_uri):
+        results = verify_migrations(migrations, server_uri, revisions=[])
+
+        assert [result.name for result in results] == ["models[heads]"]
+
+
+def test_models_catches_drift(migrations, server_uri):
+    env_py = migrations.parent / "migrations" / "env.py"
+    env_py.write_text(
+        env_py.read_text().replace('sa.Column("age", sa.Integer(), nullable=True),', "")
+    )
+
+    (models,) = verify_migrations(migrations, server_uri, checks=["models"])
+
+    assert models.outcome == "failed"
+    assert "AutogenerateDiffsDetected" in models.message
+
+
+def test_run_check_database_error(migrations):
+    with patch("alembicverify.runner.create_database", side_effect=RuntimeError("no server")):
+        result = run_check("roundtrip", "head", "sqlite://", str(migrations))
+
+    assert (result.outcome, result.message) == ("error", "RuntimeError: no server")
+
+
+@pytest.mark.parametrize(("target", "outcome"), [("cccc00000003", "passed"), ("ffff", "failed")])
+def test_run_check_drop_error(migrations, target, outcome, tmp_path):
+    database = tmp_path / "temp_db.sqlite"
+    with patch("alembicverify.runner.drop_database", side_effect=RuntimeError("in use")):
+        result = run_check("roundtrip", target, f"sqlite:///{database}", str(migrations))
+
+    assert result.outcome == outcome
+    assert result.warning == f"Could not drop the database {database}: RuntimeError: in use"
+
+
+@pytest.fixture
+def results():
+    return [
+        CheckResult("stairway[head]", "passed", 1.5, warning="Could not drop temp_1"),
+        CheckResult("roundtrip[head]", "failed", 0.25, "AssertionError: boom", "Traceback..."),
+        CheckResult("models[heads]", "error", 0.125, "RuntimeError: no server", "Traceback..."),
+    ]
+
+
+def test_write_junit_xml(results, tmp_path):
+    write_junit_xml(results, tmp_path / "report.xml")
+
+    suite = ET.parse(tmp_path / "report.xml").getroot()
+    assert suite.attrib == {
+        "name": "alembic-verify",
+        "tests": "3",
+        "failures": "1",
+        "errors": "1",
+        "time": "1.875",
+    }
+    passed, failed, error = suite
+    assert passed.attrib["name"] == "stairway[head]"
+    assert passed.find("system-err").text == "Could not drop temp_1"
+    assert passed.find("failure") is None
+    assert failed.find("failure").attrib["message"] == "AssertionError: boom"
+    assert failed.find("failure").text == "Traceback..."
+    assert error.find("error").attrib["message"] == "RuntimeError: no server"
+
+
+def test_write_json(results, tmp_path):
+    write_json(results, tmp_path / "report.json")
+
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["passed"] is False
+    assert report["results"][1] == {
+        "name": "roundtrip[head]",
+        "outcome": "failed",
+        "duration": 0.25,
+        "message": "AssertionError: boom",
+        "details": "Traceback...",
+        "warning": "",
+    }
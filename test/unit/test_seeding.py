@@ -0,0 +1,119 @@
+import pytest
+from alembic.util import CommandError
+from sqlalchemy import text
+
+from alembicverify.seeding import SeedRegistry, walk_migrations
+from alembicverify.util import config_from_ini
+from test.unit.conftest import write_revision
+
+
+@pytest.fixture
+def config(sqlite_migrations, sqlite_uri):
+    return config_from_ini(sqlite_uri, sqlite_migrations)
+
+
+@pytest.fixture
+def seeds():
+    seeds = SeedRegistry()
+    seeds.seed("bbbb00000002", "companies", [{"name": "Acme"}])
+    seeds.seed(
+        "cccc", "employees", [{"name": "Ann", "company_id": 1}, {"name": "Bob", "company_id": None}]
+    )
+    seeds.seed("cccc", "employees", [])
+    return seeds
+
+
+def test_walk(config, sqlite_uri, seeds):
+    calls = []
+
+    @seeds.before("cccc00000003")
+    def no_age_yet(connection):
+        calls.append("before")
+        assert "age" not in connection.execute(text("SELECT * FROM employees")).keys()
+
+    @seeds.after("cccc00000003")
+    def ages_are_backfilled(connection):
+        calls.append("after")
+        ages = connection.execute(text("SELECT name, age FROM employees ORDER BY id")).all()
+        assert ages == [("Ann", 30), ("Bob", 30)]
+
+    assert walk_migrations(sqlite_uri, config, seeds) == (
+        "aaaa00000001",
+        "bbbb00000002",
+        "cccc00000003",
+    )
+    assert calls == ["before", "after"]
+
+
+def test_failed_checks_are_reported_together(config, sqlite_uri, seeds):
+    @seeds.after("bbbb00000002")
+    def no_employees(connection):
+        assert connection.execute(text("SELECT count(*) FROM employees")).scalar() == 1
+
+    @seeds.after("cccc00000003")
+    def wrong_ages(connection):
+        assert connection.execute(text("SELECT max(age) FROM employees")).scalar() == 40
+
+    with pytest.raises(AssertionError) as excinfo:
+        walk_migrations(sqlite_uri, config, seeds)
+
+    message = str(excinfo.value)
+    assert message.startswith("Data migration checks failed:\nbbbb00000002 no_employees: ")
+    assert "\ncccc00000003 wrong_ages: assert 30 == 40" in message
+
+
+def test_other_errors_stop_the_walk(config, sqlite_uri):
+    seeds = SeedRegistry()
+    seeds.seed("bbbb00000002", "missing", [{"name": "Acme"}])
+
+    with pytest.raises(Exception, match="missing"):
+        walk_migrations(sqlite_uri, config, seeds)
+
+
+def test_walk_to_a_revision(config, sqlite_uri):
+    seeds = SeedRegistry()
+    seeds.seed("bbbb00000002", "companies", [{"name": "Acme"}])
+
+    assert walk_migrations(sqlite_uri, config, seeds, "bbbb") == ("aaaa00000001", "bbbb00000002")
+    assert walk_migrations(sqlite_uri, config, SeedRegistry(), "base") == ()
+
+
+def test_walk_branches(config, sqlite_migrations, sqlite_uri):
+    write_revision(
+        sqlite_migrations.parent / "migrations" / "versions",
+        "dddd00000004",
+        "bbbb00000002",
+        "branch",
+        'op.execute("UPDATE companies SET name = upper(name)")',
+        "pass",
+    )
+    seeds = SeedRegistry()
+    seeds.seed("dddd00000004", "companies", [{"name": "acme"}])
+
+    @seeds.after("dddd00000004")
+    def upper_names(connection):
+        assert connection.execute(text("SELECT name FROM companies")).scalar() == "ACME"
+
+    assert set(walk_migrations(sqlite_uri, config, seeds)) == {
+        "aaaa00000001",
+        "bbbb00000002",
+        "cccc00000003",
+        "dddd00000004",
+    }
+
+
+def test_revisions_not_on_the_walk(config, sqlite_uri, seeds):
+    with pytest.raises(ValueError, match="Revisions not on the walk to 'aaaa00000001': bbbb"):
+        walk_migrations(sqlite_uri, config, seeds, "aaaa00000001")
+
+
+def test_unknown_revisions(config, sqlite_uri):
+    seeds = SeedRegistry()
+    seeds.before("base")(print)
+    with pytest.raises(ValueError, match="Unknown revision 'base'"):
+        walk_migrations(sqlite_uri, config, seeds)
+
+    seeds = SeedRegistry()
+    seeds.after("ffff")(print)
+    with pytest.raises(CommandError):
+        walk_migrations(sqlite_uri, config, seeds)
@@ -1,13 +1,24 @@
+import os
 from unittest.mock import MagicMock, Mock, call, patch
 
 import pytest
+from alembic.config import Config
+from alembic.util import CommandError
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 
+from alembicverify._factories import _savepoint_engine
+from alembicverify.registry import EngineRegistry
 from alembicverify.util import (
     _get_revision,
+    config_from_ini,
     get_current_revision,
     get_head_revision,
+    get_script_location,
     make_alembic_config,
     prepare_schema_from_migrations,
+    same_database,
+    session_for_engine,
 )
 
 
@@ -18,6 +29,55 @@ def test_make_alembic_config():
     assert config.get_main_option("sqlalchemy.url") == "sqlite:///:memory:"
 
 
+@pytest.mark.parametrize(
+    ("url", "same"),
+    [
+        ("postgresql+psycopg2://admin:secret@db:5432/app?sslmode=require", True),
+        ("postgresql://user@db:5432/other", False),
+        ("postgresql://user@db:5433/app", False),
+        ("mysql://user@db:5432/app", False),
+    ],
+)
+def test_same_database(url, same):
+    assert same_database(make_url(url), make_url("postgresql://user@db:5432/app")) is same
+
+
+class TestConfigFromIni:
+    @pytest.fixture
+    def ini(self, tmp_path):
+        ini = tmp_path / "alembic.ini"
+        ini.write_text("[alembic]\nscript_location = migrations\n")
+        return ini
+
+    def test_config_from_ini(self, ini):
+        config = config_from_ini("sqlite://", ini)
+
+        assert config.get_main_option("script_location") == "migrations"
+        assert config.get_main_option("sqlalchemy.url") == "sqlite://"
+
+    def test_ini_is_parsed_once(self, ini):
+        with patch("alembicverify.util.Config", wraps=Config) as Config_mock:
+            first = config_from_ini("sqlite:///first", ini)
+            second = config_from_ini("sqlite:///second", str(ini))
+
+        # one parse of the ini, then one in-memory config per call
+        assert Config_mock.call_args_list == [call(str(ini)), call(), call()]
+        assert first is not second
+        assert second.get_main_option("sqlalchemy.url") == "sqlite:///second"
+
+    def test_ini_is_parsed_again_when_modified(self, ini):
+        assert get_script_location(ini) == "migrations"
+
+        ini.write_text("[alembic]\nscript_location = other_migrations\n")
+        os.utime(ini, ns=(0, 0))
+
+        assert get_script_location(ini) == "other_migrations"
+
+    def test_missing_ini(self, tmp_path):
+        with pytest.raises(CommandError, match="No config file"):
+            get_script_location(tmp_path / "missing.ini")
+
+
 class TestPrepareSchemaFromMigrations:
     @pytest.fixture
     def create_engine_mock(self):
@@ -27,6 +87,7 @@ class TestPrepareSchemaFromMigrations:
     @pytest.fixture
     def Config_mock(self):
         with patch("alembicverify.util.Config") as m:
+            m.return_value.attributes = {}
             yield m
 
     @pytest.fixture
@@ -112,6 +173,110 @@ class TestPrepareSchemaFromMigrations:
         assert engine.dispose.call_count == 1
         create_engine_mock.assert_called_once_with(uri)
 
+    def test_with_registry(
+        self, Config_mock, create_engine_mock, script_directory_mock, command_mock
+    ):
+        uri = "Migrations URI"
+        config = Config_mock()
+        registry = Mock()
+
+        with prepare_schema_from_migrations(uri, config, registry=registry) as (engine, script):
+            assert registry.get_engine.return_value == engine
+            assert script_directory_mock.from_config.return_value == script
+
+        # the engine is owned by the registry, so it is not disposed on exit
+        assert engine.dispose.call_count == 0
+        registry.get_engine.assert_called_once_with(uri)
+        assert create_engine_mock.call_count == 0
+        command_mock.upgrade.assert_called_once_with(config, "head")
+
+
+class TestSessionForEngine:
+    @pytest.fixture
+    def sessionmaker_mock(self):
+        with patch("alembicverify.util.sessionmaker") as m:
+            yield m
+
+    def test_session_for_engine(self, sessionmaker_mock):
+        engine = Mock()
+
+        with session_for_engine(engine) as session:
+            assert sessionmaker_mock.return_value.return_value == session
+
+        sessionmaker_mock.assert_called_once_with(bind=engine)
+        session.close.assert_called_once_with()
+
+    def test_session_for_engine_with_registry(self, sessionmaker_mock):
+        engine, registry = Mock(), Mock()
+
+        with session_for_engine(engine, registry=registry) as session:
+            assert registry.sessionmaker.return_value.return_value == session
+
+        registry.sessionmaker.assert_called_once_with(engine)
+        registry.sessionmaker.return_value.assert_called_once_with()
+        assert sessionmaker_mock.call_count == 0
+        session.close.assert_called_once_with()
+
+
+class TestSessionForConnection:
+    @pytest.fixture
+    def engine(self, sqlite_uri):
+        engine = _savepoint_engine(sqlite_uri)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE companies (name VARCHAR(50))")
+        yield engine
+        engine.dispose()
+
+    def names(self, engine):
+        with engine.connect() as conn:
+            return conn.exec_driver_sql("SELECT name FROM companies").scalars().all()
+
+    def commit_and_roll_back(self, engine, registry=None):
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            with session_for_engine(connection, registry=registry) as session:
+                session.execute(text("INSERT INTO companies VALUES ('acme')"))
+                session.commit()
+                session.execute(text("INSERT INTO companies VALUES ('initech')"))
+                session.rollback()
+                assert session.execute(text("SELECT name FROM companies")).scalars().all() == [
+                    "acme"
+                ]
+            transaction.rollback()
+
+    def test_savepoint(self, engine):
+        self.commit_and_roll_back(engine)
+
+        assert self.names(engine) == []
+
+    def test_savepoint_with_registry(self, engine):
+        with EngineRegistry() as registry:
+            with patch.object(registry, "sessionmaker", wraps=registry.sessionmaker) as m:
+                self.commit_and_roll_back(engine, registry)
+
+        m.assert_called_once_with(engine)
+        assert self.names(engine) == []
+
+    def test_savepoint_without_join_transaction_mode(self, engine):
+        with patch("alembicverify.util._JOIN_TRANSACTION_MODE", False):
+            self.commit_and_roll_back(engine)
+
+        assert self.names(engine) == []
+
+    def test_savepoint_restarted_without_join_transaction_mode(self, engine):
+        with patch("alembicverify.util._JOIN_TRANSACTION_MODE", False):
+            with engine.connect() as connection:
+                transaction = connection.begin()
+                with session_for_engine(connection) as session:
+                    connection.get_nested_transaction().rollback()
+                    session.commit()
+                    assert connection.get_nested_transaction().is_active
+                    session.execute(text("INSERT INTO companies VALUES ('acme')"))
+                    session.commit()
+                transaction.rollback()
+
+        assert self.names(engine) == []
+
 
 class TestGetRevision:
     @pytest.fixture
@@ -0,0 +1,166 @@
+import shutil
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from alembic.script import ScriptDirectory
+
+from alembicverify._cache import VerificationCache
+from alembicverify.util import make_alembic_config
+
+
+pytest_plugins = "pytester"
+
+EXAMPLE_DIR = Path(__file__).parent.parent / "alembic_verify_example"
+
+
+@pytest.fixture(autouse=True)
+def migrations(pytester):
+    versions = pytester.path / "migrations" / "versions"
+    shutil.copytree(EXAMPLE_DIR / "versions", versions)
+    shutil.copy(EXAMPLE_DIR / "env.py", versions.parent / "env.py")
+
+    pytester.makeconftest(
+        f"""
+        import pytest
+
+        @pytest.fixture
+        def alembic_db_uri():
+            return "postgresql://localhost/db"
+
+        @pytest.fixture
+        def alembic_ini_location(tmp_path):
+            ini = tmp_path / "alembic.ini"
+            ini.write_text("[alembic]\\nscript_location = {versions.parent.as_posix()}\\n")
+            return str(ini)
+        """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.alembic_revision("591a8001cae9")
+        def test_revision_04(alembic_config):
+            pass
+
+        @pytest.mark.alembic_revision("44352f0a4052")
+        def test_revision_05a(alembic_config):
+            pass
+
+        @pytest.mark.alembic_revision("9331f5cd7f8a")
+        def test_revision_05b(alembic_config):
+            pass
+
+        def test_unmarked():
+            pass
+        """
+    )
+    return versions
+
+
+def test_cache_is_disabled_by_default(pytester):
+    pytester.runpytest().assert_outcomes(passed=4)
+    pytester.runpytest().assert_outcomes(passed=4)
+
+
+def test_unchanged_revisions_are_skipped(pytester):
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=1, skipped=3)
+
+
+def test_edited_revision_and_descendants_are_verified_again(pytester, migrations):
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+    revision_file = next(migrations.glob("591a8001cae9_*.py"))
+    revision_file.write_text(revision_file.read_text() + "\n# edited\n")
+
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+
+def test_edited_sibling_branch_is_not_verified_again(pytester, migrations):
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+    revision_file = next(migrations.glob("9331f5cd7f8a_*.py"))
+    revision_file.write_text(revision_file.read_text() + "\n# edited\n")
+
+    result = pytester.runpytest("--alembic-verify-cache", "-rs")
+    result.assert_outcomes(passed=2, skipped=2)
+
+
+def test_edited_env_is_verified_again(pytester, migrations):
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+    env_file = migrations.parent / "env.py"
+    env_file.write_text(env_file.read_text() + "\n# edited\n")
+
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+
+def test_edited_test_is_verified_again(pytester):
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+    test_file = pytester.path / "test_edited_test_is_verified_again.py"
+    test_file.write_text(test_file.read_text() + "\n# stricter\n")
+
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4)
+
+
+def test_source_files_are_read_once(tmp_path):
+    cache = VerificationCache(MagicMock(get=MagicMock(return_value={})))
+    config = make_alembic_config("postgresql://localhost/db", str(EXAMPLE_DIR))
+    test_file = tmp_path / "test_migrations.py"
+    test_file.write_text("def test_revision():\n    pass\n")
+
+    first = cache.key(config, "591a8001cae9", test_file)
+    test_file.write_text("def test_revision():\n    assert False\n")
+
+    assert cache.key(config, "591a8001cae9", test_file) == first
+    assert cache.key(config, "591a8001cae9") != first
+
+
+def test_failed_verification_is_not_cached(pytester):
+    pytester.makepyfile(
+        test_failing="""
+        import pytest
+
+        @pytest.mark.alembic_revision("3070a2ba5acc")
+        def test_revision_01(alembic_config):
+            assert False
+        """
+    )
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=4, failed=1)
+    pytester.runpytest("--alembic-verify-cache").assert_outcomes(passed=1, skipped=3, failed=1)
+
+
+def test_unknown_revision(pytester):
+    pytester.makepyfile(
+        test_unknown="""
+        import pytest
+
+        @pytest.mark.alembic_revision("deadbeef")
+        def test_unknown(alembic_config):
+            pass
+
+        @pytest.mark.alembic_revision("base")
+        def test_base(alembic_config):
+            pass
+        """
+    )
+    result = pytester.runpytest("--alembic-verify-cache")
+    result.assert_outcomes(passed=4, errors=2)
+    result.stdout.fnmatch_lines(["*ValueError: Unknown revision 'base'*"])
+
+
+def test_fingerprints_are_shared_by_databases_of_the_same_driver(tmp_path):
+    cache = VerificationCache(MagicMock(get=MagicMock(return_value={})))
+    folder = str(EXAMPLE_DIR)
+    configs = [make_alembic_config(f"postgresql://localhost/temp_{n}", folder) for n in range(3)]
+
+    with patch(
+        "alembicverify._cache.ScriptDirectory.from_config", wraps=ScriptDirectory.from_config
+    ) as from_config_mock:
+        keys = {cache.key(config, "591a8001cae9") for config in configs}
+        cache.key(make_alembic_config("sqlite:///temp.db", folder), "591a8001cae9")
+
+    assert len(keys) == 1
+    assert from_config_mock.call_count == 2